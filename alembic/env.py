@@ -3,8 +3,9 @@ from logging.config import fileConfig
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
-from src.hpc_dispatch_management.database import Base
-from src.hpc_dispatch_management.settings import settings
+from src.hpc_dispatch_management.core.settings import settings
+from src.hpc_dispatch_management.db import models  # noqa: F401 (fills Base.metadata)
+from src.hpc_dispatch_management.db.database import Base
 
 from alembic import context
 
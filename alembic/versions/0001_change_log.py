@@ -0,0 +1,120 @@
+"""Change log of delta sync, with its sequence and per-user tombstones
+
+Databases created by `create_all` before the change log get its tables;
+ones created with an earlier change log get the `user_id` column. Every
+dispatch without a logged change gets one upsert, so that a full sync
+(`since=0`) returns it, and the sequence starts after the last change.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:00:00
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: str | Sequence[str] | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    if "dispatch_changes" not in tables:
+        op.create_table(
+            "dispatch_changes",
+            sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column("dispatch_id", sa.Integer(), nullable=False),
+            sa.Column("entity", sa.String(length=20), nullable=False),
+            sa.Column("entity_id", sa.Integer(), nullable=False),
+            sa.Column("operation", sa.String(length=20), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column(
+                "changed_at",
+                sa.DateTime(timezone=True),
+                server_default=sa.func.now(),
+                nullable=False,
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_dispatch_changes_dispatch_id", "dispatch_changes", ["dispatch_id"]
+        )
+        op.create_index("ix_dispatch_changes_user_id", "dispatch_changes", ["user_id"])
+    elif "user_id" not in {
+        c["name"] for c in inspector.get_columns("dispatch_changes")
+    }:
+        op.add_column(
+            "dispatch_changes", sa.Column("user_id", sa.Integer(), nullable=True)
+        )
+        op.create_index("ix_dispatch_changes_user_id", "dispatch_changes", ["user_id"])
+
+    if "change_sequence" not in tables:
+        op.create_table(
+            "change_sequence",
+            sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column("last_value", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+
+    # Backfill, then start the sequence after every logged change. Run with
+    # the service stopped: nothing else takes ids meanwhile.
+    bind = op.get_bind()
+    logged = bind.execute(sa.text("SELECT MAX(id) FROM dispatch_changes")).scalar()
+    sequenced = bind.execute(
+        sa.text("SELECT MAX(last_value) FROM change_sequence")
+    ).scalar()
+    last = max(logged or 0, sequenced or 0)
+    missing = (
+        bind.execute(
+            sa.text(
+                "SELECT d.id FROM dispatches d WHERE NOT EXISTS"
+                " (SELECT 1 FROM dispatch_changes c WHERE c.dispatch_id = d.id)"
+                " ORDER BY d.id"
+            )
+        )
+        .scalars()
+        .all()
+    )
+    changes = sa.table(
+        "dispatch_changes",
+        sa.column("id"),
+        sa.column("dispatch_id"),
+        sa.column("entity"),
+        sa.column("entity_id"),
+        sa.column("operation"),
+    )
+    if missing:
+        op.bulk_insert(
+            changes,
+            [
+                {
+                    "id": change_id,
+                    "dispatch_id": dispatch_id,
+                    "entity": "DISPATCH",
+                    "entity_id": dispatch_id,
+                    "operation": "UPSERT",
+                }
+                for change_id, dispatch_id in enumerate(missing, last + 1)
+            ],
+        )
+    op.execute("DELETE FROM change_sequence")
+    op.bulk_insert(
+        sa.table("change_sequence", sa.column("id"), sa.column("last_value")),
+        [{"id": 1, "last_value": last + len(missing)}],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("change_sequence")
+    op.drop_table("dispatch_changes")
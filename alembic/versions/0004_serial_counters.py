@@ -0,0 +1,105 @@
+"""Counters of server-allocated serial numbers, per prefix and year
+
+Each counter starts at the highest number already used for its prefix and
+year (serial numbers written with SERIAL_NUMBER_FORMAT, typed in by hand
+until now), so the first allocated numbers don't collide with them.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 09:30:00
+
+"""
+
+import re
+import string
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+from src.hpc_dispatch_management.core.settings import settings
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: str | Sequence[str] | None = "0003"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Only prefixes the API accepts (DispatchCreate.serial_prefix) get a counter
+_FIELD_PATTERNS = {
+    "prefix": r"(?P<prefix>[A-Z0-9]{1,20})",
+    "number": r"(?P<number>\d+)",
+    "year": r"(?P<year>\d{4})",
+}
+
+
+def _serial_pattern(serial_format: str) -> re.Pattern:
+    """Regex of the serial numbers written with `serial_format`."""
+    parts = []
+    for literal, field, _, _ in string.Formatter().parse(serial_format):
+        parts.append(re.escape(literal))
+        if field is not None:
+            parts.append(_FIELD_PATTERNS[field])
+    return re.compile("".join(parts))
+
+
+def _highest_numbers(bind: sa.Connection) -> dict[tuple[str, int], int]:
+    """(prefix, year) -> highest number among the existing serial numbers."""
+    pattern = _serial_pattern(settings.SERIAL_NUMBER_FORMAT)
+    highest: dict[tuple[str, int], int] = {}
+    rows = bind.execute(
+        sa.text("SELECT serial_number FROM dispatches").execution_options(
+            stream_results=True
+        )
+    )
+    for (serial_number,) in rows:
+        match = pattern.fullmatch(serial_number or "")
+        if match is None:
+            continue
+        key = (match["prefix"], int(match["year"]))
+        highest[key] = max(highest.get(key, 0), int(match["number"]))
+    return highest
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if "serial_counters" not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            "serial_counters",
+            sa.Column("prefix", sa.String(length=20), nullable=False),
+            sa.Column("year", sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column("last_value", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("prefix", "year"),
+        )
+
+    counters = sa.table(
+        "serial_counters",
+        sa.column("prefix"),
+        sa.column("year"),
+        sa.column("last_value"),
+    )
+    # Counters created by create_all may already be in use: only raised
+    existing = {
+        (prefix, year): last_value
+        for prefix, year, last_value in bind.execute(
+            sa.select(counters.c.prefix, counters.c.year, counters.c.last_value)
+        )
+    }
+    missing = []
+    for (prefix, year), number in _highest_numbers(bind).items():
+        if (prefix, year) not in existing:
+            missing.append({"prefix": prefix, "year": year, "last_value": number})
+        elif existing[(prefix, year)] < number:
+            op.execute(
+                counters.update()
+                .where(counters.c.prefix == prefix, counters.c.year == year)
+                .values(last_value=number)
+            )
+    if missing:
+        op.bulk_insert(counters, missing)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("serial_counters")
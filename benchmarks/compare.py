@@ -0,0 +1,72 @@
+"""
+Compares two benchmark result files (e.g. from two commits).
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+
+Exits with status 1 when a latency percentile got slower, or throughput
+dropped, by more than the threshold (in percent).
+"""
+
+import argparse
+import json
+import sys
+
+# (metric, True when a higher value is worse)
+METRICS = [("p50_ms", True), ("p99_ms", True), ("rps", False)]
+
+
+def _change(before: float, after: float) -> float:
+    """Relative change in percent."""
+    if before == 0:
+        return 0.0
+    return (after - before) / before * 100
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list[str]:
+    """Prints a comparison table and returns the regressions found."""
+    regressions = []
+    rows = [("total", baseline, candidate)] + [
+        (name, baseline["operations"][name], candidate["operations"][name])
+        for name in sorted(baseline.get("operations", {}))
+        if name in candidate.get("operations", {})
+    ]
+
+    print(f"baseline {baseline.get('commit')} -> candidate {candidate.get('commit')}")
+    for name, before, after in rows:
+        for metric, higher_is_worse in METRICS:
+            if metric not in before or metric not in after:
+                continue
+            change = _change(before[metric], after[metric])
+            worse = change > threshold if higher_is_worse else change < -threshold
+            flag = "  REGRESSION" if worse else ""
+            print(
+                f"{name:>10} {metric:>7}: {before[metric]:>10} -> "
+                f"{after[metric]:>10} ({change:+.1f}%){flag}"
+            )
+            if worse:
+                regressions.append(f"{name} {metric} {change:+.1f}%")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark results")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument(
+        "--threshold", type=float, default=10.0, help="Allowed change in percent"
+    )
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    regressions = compare(baseline, candidate, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Shared plumbing for the end-to-end benchmarks: serving the stand-ins,
+starting the dispatch service against a local database, minting JWTs
+and summarizing latencies.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import uvicorn
+from jose import jwt
+
+from .stand_ins import (
+    DRIVE_SERVICE_PATH,
+    NOTIFICATION_SERVICE_PATH,
+    USER_SERVICE_PATH,
+    StandInConfig,
+    StandInStats,
+    create_drive_service,
+    create_notification_gateway,
+    create_user_service,
+)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+JWT_SECRET = "benchmark-secret"
+JWT_ALGO = "HS256"
+
+
+def free_port() -> int:
+    """Asks the OS for a free TCP port on localhost."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> str | None:
+    """Current commit, so results can be compared across commits."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# region Users & Tokens
+
+
+def bench_lecturers(count: int) -> list[dict]:
+    """Lecturers known to the User Service stand-in."""
+    return [
+        {
+            "id": 1000 + i,
+            "username": f"bench_lecturer_{i}",
+            "email": f"bench_lecturer_{i}@example.com",
+            "full_name": f"Giảng viên {i}",
+            "department_id": i % 8,
+            "is_admin": False,
+        }
+        for i in range(count)
+    ]
+
+
+def mint_token(lecturer: dict) -> str:
+    """Signs a JWT shaped like the ones issued by the System Service."""
+    payload = {
+        "sub": lecturer["id"],
+        "full_name": lecturer["full_name"],
+        "user_type": "lecturer",
+        "username": lecturer["username"],
+        "email": lecturer["email"],
+        "is_admin": lecturer.get("is_admin", False),
+        "department_id": lecturer.get("department_id"),
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGO)
+
+
+# endregion
+
+# region Stand-ins
+
+
+@dataclass
+class StandIns:
+    """Base URLs and counters of the running stand-in services."""
+
+    user_url: str
+    drive_url: str
+    notification_url: str
+    stats: dict[str, StandInStats] = field(default_factory=dict)
+
+
+@asynccontextmanager
+async def serve_asgi(app, port: int) -> AsyncIterator[None]:
+    """Serves an ASGI app with uvicorn inside the current event loop."""
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"
+    )
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()  # Surface the startup error
+        await asyncio.sleep(0.01)
+    try:
+        yield
+    finally:
+        server.should_exit = True
+        await task
+
+
+@asynccontextmanager
+async def run_stand_ins(
+    lecturers: list[dict],
+    user: StandInConfig,
+    drive: StandInConfig,
+    notification: StandInConfig,
+) -> AsyncIterator[StandIns]:
+    """Starts the User, Drive and Notification stand-ins on free ports."""
+    stats = {name: StandInStats() for name in ("user", "drive", "notification")}
+    ports = {name: free_port() for name in stats}
+
+    async with (
+        serve_asgi(create_user_service(user, lecturers, stats["user"]), ports["user"]),
+        serve_asgi(create_drive_service(drive, stats["drive"]), ports["drive"]),
+        serve_asgi(
+            create_notification_gateway(notification, stats["notification"]),
+            ports["notification"],
+        ),
+    ):
+        yield StandIns(
+            user_url=f"http://127.0.0.1:{ports['user']}{USER_SERVICE_PATH}",
+            drive_url=f"http://127.0.0.1:{ports['drive']}{DRIVE_SERVICE_PATH}",
+            notification_url=(
+                f"http://127.0.0.1:{ports['notification']}{NOTIFICATION_SERVICE_PATH}"
+            ),
+            stats=stats,
+        )
+
+
+# endregion
+
+# region Service Under Test
+
+
+def service_env(stand_ins: StandIns, database_url: str, **extra: str) -> dict:
+    """Environment for the dispatch service pointed at the stand-ins."""
+    env = dict(os.environ)
+    env.update(
+        {
+            "APP_ENV": "local",  # Creates the tables on startup
+            "LOG_LEVEL": "WARNING",
+            "DATABASE_URL": database_url,
+            "JWT_SECRET": JWT_SECRET,
+            "JWT_ALGO": JWT_ALGO,
+            "HPC_USER_SERVICE_URL": stand_ins.user_url,
+            "HPC_DRIVE_SERVICE_URL": stand_ins.drive_url,
+            "NOTIFICATION_SERVICE_URL": stand_ins.notification_url,
+            # A handful of virtual users drive the whole load, their buckets
+            # would run dry and measure the limiter instead of the service
+            "RATE_LIMIT_ENABLED": "false",
+        }
+    )
+    env.update(extra)
+    return env
+
+
+def configure_in_process_service(stand_ins: StandIns):
+    """
+    Lets a benchmark import the service modules in its own process, pointed
+    at the stand-ins. Settings are read once, at the first import, so the
+    URLs are also set on the settings object (every run of a benchmark may
+    get stand-ins on new ports). Returns the settings.
+    """
+    for key, value in service_env(stand_ins, "sqlite://").items():
+        os.environ.setdefault(key, value)
+    if str(REPO_ROOT / "src") not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT / "src"))
+    # Per-request INFO logs would cost more than the calls being measured
+    logging.disable(logging.INFO)
+
+    from hpc_dispatch_management.core.settings import settings
+
+    settings.HPC_USER_SERVICE_URL = stand_ins.user_url
+    settings.HPC_DRIVE_SERVICE_URL = stand_ins.drive_url
+    settings.NOTIFICATION_SERVICE_URL = stand_ins.notification_url
+    return settings
+
+
+@contextmanager
+def temporary_sqlite_url() -> Iterator[str]:
+    """A throwaway SQLite database file, used when no --database-url is given."""
+    with tempfile.TemporaryDirectory(prefix="dispatch-bench-") as tmp_dir:
+        yield f"sqlite:///{tmp_dir}/bench.db"
+
+
+@asynccontextmanager
+async def run_service(env: dict, startup_timeout: float = 30.0) -> AsyncIterator[str]:
+    """
+    Starts the dispatch service with uvicorn in a child process and waits
+    until it answers. Yields its base URL.
+    """
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "--app-dir",
+            str(REPO_ROOT / "src"),
+            "hpc_dispatch_management.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        deadline = time.monotonic() + startup_timeout
+        async with httpx.AsyncClient() as client:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError("Dispatch service exited during startup")
+                try:
+                    if (await client.get(f"{base_url}/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Dispatch service did not start in time")
+                await asyncio.sleep(0.1)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# endregion
+
+# region Results
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+@dataclass
+class LatencyRecorder:
+    """Collects latencies (seconds) and failures per operation."""
+
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    errors: dict[str, int] = field(default_factory=dict)
+
+    def record(self, operation: str, seconds: float, ok: bool) -> None:
+        self.latencies.setdefault(operation, []).append(seconds)
+        if not ok:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        """Machine-readable summary: rps and latency percentiles (ms)."""
+        operations = {}
+        total = 0
+        for operation, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            total += len(values)
+            operations[operation] = {
+                "count": len(values),
+                "errors": self.errors.get(operation, 0),
+                "rps": round(len(values) / elapsed, 2),
+                "mean_ms": round(sum(values) / len(values) * 1000, 3),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p90_ms": round(percentile(values, 90) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+            }
+
+        all_values = sorted(v for values in self.latencies.values() for v in values)
+        return {
+            "total_requests": total,
+            "total_errors": sum(self.errors.values()),
+            "rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(all_values, 50) * 1000, 3),
+            "p99_ms": round(percentile(all_values, 99) * 1000, 3),
+            "operations": operations,
+        }
+
+
+def result_envelope(name: str, config: dict, summary: dict) -> dict:
+    """Wraps a summary with what is needed to compare runs across commits."""
+    return {
+        "benchmark": name,
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": config,
+        **summary,
+    }
+
+
+# endregion
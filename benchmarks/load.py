@@ -0,0 +1,274 @@
+"""
+End-to-end load benchmark for the dispatch service.
+
+Starts local stand-ins for the User, Drive and Notification services,
+starts the service against a local database (a throwaway SQLite file by
+default), then drives a realistic mix of list / search / create / assign /
+review traffic and prints latency percentiles and throughput as JSON.
+
+    python -m benchmarks.load --duration 30 --concurrency 32 --output before.json
+    python -m benchmarks.compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+
+import httpx
+
+from .harness import (
+    LatencyRecorder,
+    bench_lecturers,
+    mint_token,
+    result_envelope,
+    run_service,
+    run_stand_ins,
+    service_env,
+    temporary_sqlite_url,
+)
+from .stand_ins import StandInConfig
+
+SEARCH_TERMS = ["Kế hoạch", "Quyết định", "thi", "#1", "2026", "Thông báo", "KH-"]
+DEFAULT_MIX = "list=45,search=20,create=15,assign=10,review=10"
+
+
+@dataclass
+class Workload:
+    """State shared by the virtual users (what can be assigned/reviewed)."""
+
+    lecturers: list[dict]
+    drive_url: str
+    rng: random.Random
+    # author id -> draft dispatch ids
+    drafts: dict[int, list[int]] = field(default_factory=dict)
+    # assignee id -> dispatch ids waiting for their review
+    pending_reviews: dict[int, list[int]] = field(default_factory=dict)
+    serial_counter: int = 0
+
+    def next_serial(self) -> str:
+        self.serial_counter += 1
+        return f"BENCH-{self.serial_counter:06d}/2026"
+
+
+def parse_mix(raw: str) -> dict[str, int]:
+    """Parses 'list=45,search=20,...' into operation weights."""
+    mix = {}
+    for item in raw.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = int(weight)
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown operations in mix: {sorted(unknown)}")
+    return mix
+
+
+# region Operations
+# Each operation returns the name it should be recorded under and the
+# response, or None when it could not run (e.g. nothing to review yet).
+
+
+async def op_list(client: httpx.AsyncClient, user: dict, work: Workload):
+    params = {
+        "limit": 20,
+        "skip": work.rng.choice([0, 0, 0, 20, 40]),
+        "dispatch_type": work.rng.choice(["all", "all", "incoming", "outgoing"]),
+    }
+    return "list", await client.get("/dispatches/", params=params)
+
+
+async def op_search(client: httpx.AsyncClient, user: dict, work: Workload):
+    params = {"search": work.rng.choice(SEARCH_TERMS), "limit": 20}
+    return "search", await client.get("/dispatches/", params=params)
+
+
+async def op_create(client: httpx.AsyncClient, user: dict, work: Workload):
+    response = await client.post(
+        "/dispatches/",
+        json={
+            "title": f"Kế hoạch công tác số {work.serial_counter}",
+            "serial_number": work.next_serial(),
+            "description": "Nội dung công văn dùng cho benchmark. " * 8,
+            "file_url": f"{work.drive_url}/items/{uuid.uuid4()}",
+        },
+    )
+    if response.status_code == 201:
+        work.drafts.setdefault(user["id"], []).append(response.json()["id"])
+    return "create", response
+
+
+async def op_assign(client: httpx.AsyncClient, user: dict, work: Workload):
+    drafts = work.drafts.get(user["id"])
+    if not drafts:
+        return None
+    dispatch_id = drafts.pop()
+    others = [lecturer for lecturer in work.lecturers if lecturer["id"] != user["id"]]
+    assignees = work.rng.sample(others, k=min(work.rng.randint(1, 3), len(others)))
+
+    response = await client.post(
+        f"/dispatches/{dispatch_id}/assign",
+        json={
+            "assignee_usernames": [a["username"] for a in assignees],
+            "action_required": "Vui lòng xem xét và phê duyệt.",
+        },
+    )
+    if response.status_code == 200:
+        for assignee in assignees:
+            work.pending_reviews.setdefault(assignee["id"], []).append(dispatch_id)
+    return "assign", response
+
+
+async def op_review(client: httpx.AsyncClient, user: dict, work: Workload):
+    pending = work.pending_reviews.get(user["id"])
+    if not pending:
+        return None
+    dispatch_id = pending.pop()
+    response = await client.put(
+        f"/dispatches/{dispatch_id}/status",
+        json={
+            "status": work.rng.choice(["approved", "rejected"]),
+            "review_comment": "Đã xem.",
+        },
+    )
+    return "review", response
+
+
+OPERATIONS = {
+    "list": op_list,
+    "search": op_search,
+    "create": op_create,
+    "assign": op_assign,
+    "review": op_review,
+}
+
+# endregion
+
+
+async def virtual_user(
+    base_url: str,
+    user: dict,
+    work: Workload,
+    mix: dict[str, int],
+    recorder: LatencyRecorder,
+    record_after: float,
+    stop_at: float,
+) -> None:
+    """Loops over weighted operations as one lecturer until stop_at."""
+    names, weights = list(mix), list(mix.values())
+    headers = {"Authorization": f"Bearer {mint_token(user)}"}
+
+    async with httpx.AsyncClient(
+        base_url=base_url, headers=headers, timeout=30.0
+    ) as client:
+        while time.monotonic() < stop_at:
+            name = work.rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                outcome = await OPERATIONS[name](client, user, work)
+                if outcome is None:
+                    # Nothing to assign/review yet: create something instead
+                    start = time.perf_counter()
+                    outcome = await op_create(client, user, work)
+                recorded_name, response = outcome
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                recorded_name, ok = name, False
+
+            if time.monotonic() >= record_after:
+                recorder.record(recorded_name, time.perf_counter() - start, ok)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    lecturers = bench_lecturers(args.users)
+    mix = parse_mix(args.mix)
+    recorder = LatencyRecorder()
+
+    def stand_in(latency: float) -> StandInConfig:
+        return StandInConfig(
+            latency_ms=latency, jitter_ms=args.jitter_ms, error_rate=args.error_rate
+        )
+
+    async with run_stand_ins(
+        lecturers,
+        user=stand_in(args.user_latency_ms),
+        drive=stand_in(args.drive_latency_ms),
+        notification=stand_in(args.notification_latency_ms),
+    ) as stand_ins:
+        with temporary_sqlite_url() as sqlite_url:
+            env = service_env(stand_ins, args.database_url or sqlite_url)
+            async with run_service(env) as base_url:
+                work = Workload(
+                    lecturers=lecturers,
+                    drive_url=stand_ins.drive_url,
+                    rng=random.Random(args.seed),
+                )
+                now = time.monotonic()
+                record_after = now + args.warmup
+                stop_at = record_after + args.duration
+
+                await asyncio.gather(
+                    *(
+                        virtual_user(
+                            base_url,
+                            lecturers[i % len(lecturers)],
+                            work,
+                            mix,
+                            recorder,
+                            record_after,
+                            stop_at,
+                        )
+                        for i in range(args.concurrency)
+                    )
+                )
+
+        summary = recorder.summary(args.duration)
+        summary["upstreams"] = {
+            name: stats.as_dict() for name, stats in stand_ins.stats.items()
+        }
+
+    config = {key: value for key, value in vars(args).items() if key not in {"output"}}
+    return result_envelope("load", config, summary)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds measured")
+    parser.add_argument(
+        "--warmup", type=float, default=5.0, help="Seconds not measured"
+    )
+    parser.add_argument("--concurrency", type=int, default=16, help="Virtual users")
+    parser.add_argument("--users", type=int, default=20, help="Distinct lecturers")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--database-url",
+        default=None,
+        help="Local database to run against (default: throwaway SQLite file)",
+    )
+    parser.add_argument("--user-latency-ms", type=float, default=20.0)
+    parser.add_argument("--drive-latency-ms", type=float, default=30.0)
+    parser.add_argument("--notification-latency-ms", type=float, default=10.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Upstream 503 probability"
+    )
+    parser.add_argument("--output", default=None, help="Write the JSON result here")
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    result = asyncio.run(run(args))
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
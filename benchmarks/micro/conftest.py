@@ -0,0 +1,30 @@
+"""
+Micro-benchmarks of the service's hot functions, with pytest-benchmark.
+See "Micro-benchmarks" in docs/project-guide.md for saving and comparing
+results.
+"""
+
+import pytest
+
+from ..harness import configure_in_process_service
+from ..query_compilation import NO_UPSTREAMS
+
+# Before any service module is imported: settings are read at import time
+configure_in_process_service(NO_UPSTREAMS)
+
+
+@pytest.fixture
+def run_sync():
+    """
+    Runs a coroutine that never actually awaits (e.g. get_current_user)
+    without an event loop, whose start-up would dwarf what is measured.
+    """
+
+    def run(coroutine):
+        try:
+            coroutine.send(None)
+        except StopIteration as done:
+            return done.value
+        raise RuntimeError("The coroutine awaited something")
+
+    return run
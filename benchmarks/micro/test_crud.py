@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from hpc_dispatch_management import schemas
+from hpc_dispatch_management.db import crud, models
+from hpc_dispatch_management.db.database import Base
+
+from ..query_compilation import seed
+
+USERS = 20
+
+
+@pytest.fixture(scope="module", params=[100, 1000, 5000], ids=lambda n: f"{n}rows")
+def db(request):
+    """An in-memory SQLite database holding `param` dispatches."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, schemas, models, request.param, USERS)
+        yield session
+    engine.dispose()
+
+
+@pytest.mark.benchmark(group="crud.get_dispatches_with_filters")
+@pytest.mark.parametrize("search", [None, "#1"], ids=["list", "search"])
+def test_get_dispatches_with_filters(benchmark, db, search):
+    def query():
+        dispatches = crud.get_dispatches_with_filters(
+            db,
+            user_id=2,
+            dispatch_type=schemas.DispatchTypeSearch.ALL,
+            status=None,
+            search=search,
+            skip=0,
+            limit=20,
+        )
+        # Like a new request: nothing is served from the identity map
+        db.expunge_all()
+        return dispatches
+
+    assert benchmark(query)
@@ -0,0 +1,18 @@
+import pytest
+
+from hpc_dispatch_management.external_services.drive_service import (
+    _extract_item_id_from_url,
+)
+
+URLS = {
+    "item": "http://localhost:7777/api/v1/drive/items/"
+    "3f2b8c1e-9d4a-4c6b-8e2f-1a7d5c9b0e34",
+    "trailing_slash": "http://localhost:7777/api/v1/drive/items/"
+    "3f2b8c1e-9d4a-4c6b-8e2f-1a7d5c9b0e34/",
+}
+
+
+@pytest.mark.benchmark(group="drive_service._extract_item_id_from_url")
+@pytest.mark.parametrize("url", URLS.values(), ids=URLS.keys())
+def test_extract_item_id_from_url(benchmark, url):
+    assert benchmark(_extract_item_id_from_url, url)
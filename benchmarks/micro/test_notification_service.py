@@ -0,0 +1,38 @@
+from hpc_dispatch_management import schemas
+from hpc_dispatch_management.db import models
+from hpc_dispatch_management.external_services.notification_service import (
+    NotificationPublisher,
+    send_new_dispatch_notification,
+)
+
+
+class DumpingPublisher(NotificationPublisher):
+    """Dumps the message like the gateway publisher, then drops it."""
+
+    async def publish(self, message: schemas.KafkaMessage) -> None:
+        self.body = message.model_dump(mode="json")
+
+
+def test_new_dispatch_message(benchmark, run_sync):
+    """KafkaMessage construction and dumping, once per assignee."""
+    author = models.User(
+        id=1, full_name="Giảng viên 1", user_type=schemas.UserType.LECTURER
+    )
+    assignee = models.User(
+        id=2, full_name="Giảng viên 2", user_type=schemas.UserType.LECTURER
+    )
+    dispatch = models.Dispatch(
+        title="Kế hoạch tổ chức thi kết thúc học phần",
+        serial_number="KH-001/2026",
+        file_url="http://drive.local/api/v1/drive/items/00000001",
+    )
+    publisher = DumpingPublisher()
+
+    benchmark(
+        lambda: run_sync(
+            send_new_dispatch_notification(
+                dispatch, author, assignee, "Vui lòng phê duyệt.", publisher
+            )
+        )
+    )
+    assert publisher.body["payload"]["document_serial_number"] == "KH-001/2026"
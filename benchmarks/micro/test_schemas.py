@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pydantic import TypeAdapter
+
+from hpc_dispatch_management import schemas
+from hpc_dispatch_management.db import models
+
+CREATED_AT = datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc)
+
+
+def _user(user_id: int) -> models.User:
+    return models.User(
+        id=user_id,
+        username=f"lecturer{user_id}",
+        email=f"lecturer{user_id}@hpc.vn",
+        full_name=f"Giảng viên {user_id}",
+        user_type=schemas.UserType.LECTURER,
+    )
+
+
+def _page(size: int) -> list[models.Dispatch]:
+    """Dispatches as loaded for the list endpoint, each with 3 assignees."""
+    users = [_user(user_id) for user_id in range(1, 11)]
+    return [
+        models.Dispatch(
+            id=number,
+            title=f"Kế hoạch tổ chức thi kết thúc học phần số {number}",
+            serial_number=f"KH-{number:03d}/2026",
+            description="Nội dung công văn. " * 20,
+            file_url=f"http://drive.local/api/v1/drive/items/{number:08d}",
+            author_id=users[0].id,
+            author=users[0],
+            status=schemas.DispatchStatus.PENDING,
+            created_at=CREATED_AT + timedelta(minutes=number),
+            updated_at=None,
+            version=2,
+            assignments=[
+                models.DispatchAssignment(
+                    id=number * 10 + offset,
+                    assignee_id=users[offset].id,
+                    assignee=users[offset],
+                    action_required="Vui lòng xem xét và phê duyệt.",
+                    review_comment=None,
+                    assigned_at=CREATED_AT,
+                    seen_at=None,
+                )
+                for offset in (1, 2, 3)
+            ],
+        )
+        for number in range(1, size + 1)
+    ]
+
+
+@pytest.mark.benchmark(group="schemas.Dispatch page")
+@pytest.mark.parametrize("size", [20, 100, 500])
+def test_dispatch_page_serialization(benchmark, size):
+    """What FastAPI does with a list response: validate from attributes, dump."""
+    adapter = TypeAdapter(list[schemas.Dispatch])
+    page = _page(size)
+
+    body = benchmark(
+        lambda: adapter.dump_json(adapter.validate_python(page, from_attributes=True))
+    )
+    assert body.startswith(b"[{")
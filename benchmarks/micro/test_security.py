@@ -0,0 +1,31 @@
+from fastapi import Request
+from fastapi.security.http import HTTPAuthorizationCredentials
+from jose import jwt
+
+from hpc_dispatch_management.core.security import get_current_user
+from hpc_dispatch_management.core.settings import settings
+
+
+def test_get_current_user(benchmark, run_sync):
+    """JWT signature check, claims validation, User model: every request."""
+    token = jwt.encode(
+        {
+            "sub": 1001,
+            "full_name": "Giảng viên 1",
+            "user_type": "lecturer",
+            "username": "bench_lecturer_1",
+            "email": "bench_lecturer_1@example.com",
+            "is_admin": False,
+            "department_id": 1,
+        },
+        settings.JWT_SECRET,
+        algorithm=settings.JWT_ALGO,
+    )
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    def authenticate():
+        request = Request({"type": "http", "headers": []})
+        return run_sync(get_current_user(request, credentials))
+
+    user = benchmark(authenticate)
+    assert user.sub == 1001
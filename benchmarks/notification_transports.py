@@ -0,0 +1,182 @@
+"""
+Throughput of the notification transports: HTTP gateway vs. direct Kafka.
+
+Publishes the same notifications from concurrent senders (like concurrent
+assignments do) through:
+
+- http:  GatewayPublisher, one POST per message to the gateway stand-in,
+- kafka: KafkaPublisher, batched by the producer (linger, size limit).
+         Against the in-memory broker by default, whose produce requests
+         cost the same round trip as a gateway call; with
+         --bootstrap-servers against a real local Kafka (needs aiokafka).
+
+    python -m benchmarks.notification_transports --messages 5000 --concurrency 50
+
+Prints messages per second, the time a sender waits in `publish`, and how
+many requests reached the gateway / broker.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from .harness import (
+    LatencyRecorder,
+    bench_lecturers,
+    configure_in_process_service,
+    result_envelope,
+    run_stand_ins,
+)
+from .stand_ins import InMemoryKafka, StandInConfig
+
+TRANSPORTS = ("http", "kafka")
+
+
+def build_messages(schemas, notification_service, count: int) -> list:
+    """New-dispatch notifications for `count` (dispatch, assignee) pairs."""
+    now = datetime.now(timezone.utc)
+    return [
+        schemas.KafkaMessage(
+            topic=notification_service.NEW_DISPATCH_TOPIC,
+            payload=schemas.KafkaNewDispatchPayload(
+                user_id=1000 + i % 50,
+                user_type=schemas.UserType.LECTURER,
+                document_title=f"Kế hoạch công tác số {i}",
+                document_url="http://hpc-system.com/dispatch-not-found",
+                document_serial_number=f"BENCH-{i:06d}/2026",
+                assigner_name="Giảng viên 0",
+                assignee_name=f"Giảng viên {i % 50}",
+                action_required="Vui lòng xem xét và phê duyệt.",
+                date=now,
+                sender_id=1000,
+                sender_type=schemas.UserType.LECTURER,
+            ),
+            key=f"dispatch_new_BENCH-{i:06d}/2026_{1000 + i % 50}",
+        )
+        for i in range(count)
+    ]
+
+
+async def publish_all(publisher, messages: list, concurrency: int) -> dict:
+    """Publishes from `concurrency` senders; returns the timing summary."""
+    recorder = LatencyRecorder()
+    queue = list(reversed(messages))
+
+    async def sender():
+        while queue:
+            message = queue.pop()
+            start = time.perf_counter()
+            await publisher.publish(message)
+            recorder.record("publish", time.perf_counter() - start, True)
+
+    await publisher.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(concurrency)))
+    # Lingering records are only delivered once the producer is flushed
+    await publisher.close()
+    elapsed = time.perf_counter() - started
+
+    summary = recorder.summary(elapsed)
+    summary["elapsed_s"] = round(elapsed, 3)
+    summary["messages_per_s"] = round(len(messages) / elapsed, 1)
+    return summary
+
+
+async def run_transport(transport: str, args: argparse.Namespace) -> dict:
+    gateway = StandInConfig(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    async with run_stand_ins(
+        bench_lecturers(1), user=gateway, drive=gateway, notification=gateway
+    ) as stand_ins:
+        settings = configure_in_process_service(stand_ins)
+
+        from hpc_dispatch_management import schemas
+        from hpc_dispatch_management.external_services import (
+            http_client,
+            notification_service,
+        )
+
+        messages = build_messages(schemas, notification_service, args.messages)
+
+        if transport == "http":
+            client = http_client.create_upstream_client("notification")
+            try:
+                publisher = notification_service.GatewayPublisher(client)
+                summary = await publish_all(publisher, messages, args.concurrency)
+            finally:
+                await client.aclose()
+            summary["requests"] = stand_ins.stats["notification"].requests
+            return summary
+
+        settings.KAFKA_LINGER_MS = args.linger_ms
+        settings.KAFKA_MAX_BATCH_BYTES = args.max_batch_bytes
+        if args.bootstrap_servers:
+            settings.KAFKA_BOOTSTRAP_SERVERS = args.bootstrap_servers
+            producer = notification_service._create_kafka_producer()
+            broker = None
+        else:
+            broker = InMemoryKafka(partitions=6, latency_ms=args.latency_ms)
+            producer = broker.producer(
+                linger_ms=args.linger_ms,
+                max_batch_size=args.max_batch_bytes,
+                key_serializer=lambda key: key.encode(),
+                value_serializer=lambda value: json.dumps(
+                    value, ensure_ascii=False
+                ).encode(),
+            )
+
+        publisher = notification_service.KafkaPublisher(producer)
+        summary = await publish_all(publisher, messages, args.concurrency)
+        if broker:
+            summary["requests"] = broker.produce_requests
+        return summary
+
+
+async def run(args: argparse.Namespace) -> dict:
+    results = {}
+    for transport in args.transports.split(","):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport: {transport}")
+        results[transport] = await run_transport(transport, args)
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    return result_envelope("notification_transports", config, {"transports": results})
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50, help="Senders")
+    parser.add_argument("--transports", default=",".join(TRANSPORTS))
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=10.0,
+        help="Round trip of one gateway call / produce request",
+    )
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    parser.add_argument("--linger-ms", type=int, default=20)
+    parser.add_argument("--max-batch-bytes", type=int, default=64 * 1024)
+    parser.add_argument(
+        "--bootstrap-servers",
+        default=None,
+        help="Produce to this Kafka instead of the in-memory broker",
+    )
+    parser.add_argument("--output", default=None, help="Write the JSON result here")
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    result = asyncio.run(run(args))
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
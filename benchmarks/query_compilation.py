@@ -0,0 +1,244 @@
+"""
+Per-call overhead of the hot dispatch queries: legacy Query vs. pre-built.
+
+Runs `get_dispatch` and `get_dispatches_with_filters` many times against an
+in-memory SQLite database, in two ways:
+
+- query:    what crud used to do, a new `db.query(...).options(...)` chain
+            (query object, loader options, cache key) built on every call,
+- prebuilt: the current crud functions, which build each statement once
+            and run it with bound parameters.
+
+    python -m benchmarks.query_compilation --calls 3000
+
+The database is tiny and in memory, so the time left is mostly Python:
+building the query, looking up the compiled SQL, loading the rows. Also
+prints the compiled cache hit ratio of the measured calls, which should
+stay close to 1 (a miss means SQLAlchemy compiled the SQL again).
+"""
+
+import argparse
+import json
+import time
+
+from .harness import (
+    LatencyRecorder,
+    StandIns,
+    configure_in_process_service,
+    result_envelope,
+)
+
+STRATEGIES = ("query", "prebuilt")
+
+# Nothing here calls the upstream services, they only have to be configured
+NO_UPSTREAMS = StandIns(
+    user_url="http://127.0.0.1:1/api/v1",
+    drive_url="http://127.0.0.1:1/api/v1/drive",
+    notification_url="http://127.0.0.1:1/api/v1/notifications",
+)
+
+
+def _import_service():
+    configure_in_process_service(NO_UPSTREAMS)
+
+    from hpc_dispatch_management import schemas
+    from hpc_dispatch_management.db import crud, instrumentation, models
+    from hpc_dispatch_management.db.database import Base
+
+    return schemas, crud, instrumentation, models, Base
+
+
+def legacy_queries(schemas, models):
+    """get_dispatch and get_dispatches_with_filters as Query chains."""
+    from sqlalchemy import or_
+    from sqlalchemy.orm import joinedload, selectinload
+
+    def get_dispatch(db, dispatch_id):
+        return (
+            db.query(models.Dispatch)
+            .options(
+                joinedload(models.Dispatch.author),
+                selectinload(models.Dispatch.assignments).joinedload(
+                    models.DispatchAssignment.assignee
+                ),
+            )
+            .filter(models.Dispatch.id == dispatch_id)
+            .first()
+        )
+
+    def get_dispatches_with_filters(db, user_id, search, limit):
+        query = (
+            db.query(models.Dispatch)
+            .options(
+                joinedload(models.Dispatch.author),
+                selectinload(models.Dispatch.assignments).joinedload(
+                    models.DispatchAssignment.assignee
+                ),
+            )
+            .join(models.DispatchAssignment, isouter=True)
+            .filter(
+                or_(
+                    models.Dispatch.author_id == user_id,
+                    models.DispatchAssignment.assignee_id == user_id,
+                )
+            )
+        )
+        if search:
+            query = query.filter(
+                or_(
+                    models.Dispatch.title.ilike(f"%{search}%"),
+                    models.Dispatch.serial_number.ilike(f"%{search}%"),
+                )
+            )
+        return query.order_by(models.Dispatch.created_at.desc()).limit(limit).all()
+
+    return get_dispatch, get_dispatches_with_filters
+
+
+def seed(db, schemas, models, dispatches: int, users: int) -> None:
+    """`dispatches` dispatches by user 1, each assigned to two other users."""
+    for user_id in range(1, users + 1):
+        db.add(
+            models.User(
+                id=user_id,
+                username=f"lecturer{user_id}",
+                email=f"lecturer{user_id}@hpc.vn",
+                full_name=f"Lecturer {user_id}",
+                user_type=schemas.UserType.LECTURER,
+            )
+        )
+    db.flush()
+    for number in range(1, dispatches + 1):
+        dispatch = models.Dispatch(
+            title=f"Kế hoạch #{number}",
+            serial_number=f"KH-{number:04d}/2026",
+            description="Benchmark dispatch",
+            file_url="http://drive.local/file.pdf",
+            author_id=1,
+        )
+        db.add(dispatch)
+        db.flush()
+        for offset in (1, 2):
+            assignee_id = 2 + (number + offset) % (users - 1)
+            db.add(
+                models.DispatchAssignment(
+                    dispatch_id=dispatch.id, assignee_id=assignee_id
+                )
+            )
+    db.commit()
+
+
+def cache_counts(instrumentation) -> tuple[float, float]:
+    samples = {
+        sample.labels["result"]: sample.value
+        for metric in instrumentation.DB_COMPILED_CACHE.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_total")
+    }
+    return samples.get("hit", 0.0), samples.get("miss", 0.0)
+
+
+def run(args: argparse.Namespace) -> dict:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from sqlalchemy.pool import StaticPool
+
+    schemas, crud, instrumentation, models, Base = _import_service()
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        seed(db, schemas, models, args.dispatches, args.users)
+
+    legacy_get, legacy_filters = legacy_queries(schemas, models)
+    calls = {
+        "query": {
+            "get_dispatch": lambda db, i: legacy_get(db, 1 + i % args.dispatches),
+            "list": lambda db, i: legacy_filters(db, 1 + i % args.users, None, 20),
+            "search": lambda db, i: legacy_filters(db, 1, f"#{i % 50}", 20),
+        },
+        "prebuilt": {
+            "get_dispatch": lambda db, i: crud.get_dispatch(
+                db, 1 + i % args.dispatches
+            ),
+            "list": lambda db, i: crud.get_dispatches_with_filters(
+                db,
+                user_id=1 + i % args.users,
+                dispatch_type=schemas.DispatchTypeSearch.ALL,
+                status=None,
+                search=None,
+                skip=0,
+                limit=20,
+            ),
+            "search": lambda db, i: crud.get_dispatches_with_filters(
+                db,
+                user_id=1,
+                dispatch_type=schemas.DispatchTypeSearch.ALL,
+                status=None,
+                search=f"#{i % 50}",
+                skip=0,
+                limit=20,
+            ),
+        },
+    }
+
+    results = {}
+    for strategy in args.strategies.split(","):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        recorder = LatencyRecorder()
+        with Session(engine) as db:
+            for name, call in calls[strategy].items():
+                # Fills the compiled cache, like a warmed-up worker
+                for i in range(args.warmup):
+                    call(db, i)
+                    db.expunge_all()
+
+                hits, misses = cache_counts(instrumentation)
+                for i in range(args.calls):
+                    start = time.perf_counter()
+                    call(db, i)
+                    recorder.record(name, time.perf_counter() - start, True)
+                    # Like a new request: nothing is served from the identity map
+                    db.expunge_all()
+                new_hits, new_misses = cache_counts(instrumentation)
+                lookups = (new_hits - hits) + (new_misses - misses)
+                results.setdefault(strategy, {})[name] = {
+                    "cache_hit_ratio": round((new_hits - hits) / lookups, 4),
+                }
+
+        summary = recorder.summary(1.0)["operations"]
+        for name, stats in summary.items():
+            results[strategy][name].update(
+                mean_us=round(stats["mean_ms"] * 1000, 1),
+                p50_us=round(stats["p50_ms"] * 1000, 1),
+                p99_us=round(stats["p99_ms"] * 1000, 1),
+            )
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    return result_envelope("query_compilation", config, {"strategies": results})
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=3000, help="Per query")
+    parser.add_argument("--warmup", type=int, default=200, help="Per query")
+    parser.add_argument("--dispatches", type=int, default=100)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--output", default=None, help="Write the JSON result here")
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    result = run(args)
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
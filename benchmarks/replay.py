@@ -0,0 +1,276 @@
+"""
+Replays traffic captured by the service against a local instance.
+
+Captured traffic comes from the TrafficCaptureMiddleware (set
+TRAFFIC_CAPTURE_PATH on a running service, see core/capture.py). Starts the
+stand-ins and the service like benchmarks.load, gives every captured user
+a few dispatches, then sends the captured requests again with their
+original spacing, or `--speed` times faster. Requests are sent on schedule
+without waiting for earlier answers (open loop), like independent users.
+Prints the latency distribution per route next to the captured one.
+
+    python -m benchmarks.replay traffic.jsonl --speed 4 --output replay.json
+
+- Captured users become bench lecturers (same hash, same lecturer).
+- Dispatch ids are mapped onto the seeded dispatches; edits go to one of
+  the user's own drafts.
+- Search terms were masked at capture. They keep their length and skew,
+  but match nothing.
+- Assign, review and delete depend on state the capture doesn't keep:
+  they are counted as skipped.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import zlib
+from dataclasses import dataclass, field
+
+import httpx
+
+from .harness import (
+    LatencyRecorder,
+    bench_lecturers,
+    mint_token,
+    percentile,
+    result_envelope,
+    run_service,
+    run_stand_ins,
+    service_env,
+    temporary_sqlite_url,
+)
+from .load import Workload, op_assign, op_create
+from .stand_ins import StandInConfig
+
+# Body of a created or edited dispatch, before its description is padded
+# to the captured body size
+BASE_BODY_SIZE = len(json.dumps({"title": "Replay", "description": ""}))
+
+
+def load_captures(paths: list[str], limit: int | None) -> list[dict]:
+    """Entries of every capture file (e.g. one per host), oldest first."""
+    entries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            entries.extend(json.loads(line) for line in f if line.strip())
+    entries.sort(key=lambda entry: entry["t"])
+    return entries[:limit] if limit else entries
+
+
+@dataclass
+class ReplayState:
+    """Captured users and dispatch ids, mapped onto the seeded ones."""
+
+    lecturers: dict[str, dict]
+    tokens: dict[str, str]
+    dispatch_ids: list[int] = field(default_factory=list)
+    # lecturer id -> their dispatches still in draft (editable)
+    drafts: dict[int, list[int]] = field(default_factory=dict)
+
+    def headers(self, user_hash: str | None) -> dict:
+        if user_hash is None:  # Not authenticated when captured
+            return {}
+        return {"Authorization": f"Bearer {self.tokens[user_hash]}"}
+
+    def dispatch_id(self, path_params: dict, candidates: list[int]) -> int:
+        """The same captured id always maps to the same dispatch."""
+        captured = str(path_params.get("dispatch_id", "0")).encode()
+        return candidates[zlib.crc32(captured) % len(candidates)]
+
+
+def _padded_body(size: int) -> dict:
+    return {
+        "title": "Replay",
+        "description": "x" * max(size - BASE_BODY_SIZE, 0),
+    }
+
+
+def build_request(entry: dict, state: ReplayState) -> dict | None:
+    """Keyword arguments of client.request() for an entry, None if skipped."""
+    method, route = entry["m"], entry["r"]
+    kwargs = {"method": method, "headers": state.headers(entry.get("u"))}
+
+    if method == "GET" and route in ("/dispatches/", "/dispatches/changes"):
+        return {**kwargs, "url": route, "params": entry.get("q", {})}
+    if method == "GET" and route == "/dispatches/{dispatch_id}":
+        if not state.dispatch_ids:
+            return None
+        dispatch_id = state.dispatch_id(entry.get("p", {}), state.dispatch_ids)
+        return {**kwargs, "url": f"/dispatches/{dispatch_id}"}
+    if method == "POST" and route == "/dispatches/":
+        # No serial number: the service allocates one
+        return {**kwargs, "url": route, "json": _padded_body(entry.get("b", 0))}
+    if method == "PUT" and route == "/dispatches/{dispatch_id}":
+        lecturer = state.lecturers.get(entry.get("u"))
+        drafts = state.drafts.get(lecturer["id"]) if lecturer else None
+        if not drafts:
+            return None
+        dispatch_id = state.dispatch_id(entry.get("p", {}), drafts)
+        return {
+            **kwargs,
+            "url": f"/dispatches/{dispatch_id}",
+            "json": _padded_body(entry.get("b", 0)),
+        }
+    return None
+
+
+async def seed(
+    base_url: str, state: ReplayState, drive_url: str, per_user: int, seed: int
+) -> None:
+    """Gives every lecturer `per_user` dispatches, half of them assigned."""
+    lecturers = list(state.lecturers.values())
+    work = Workload(lecturers=lecturers, drive_url=drive_url, rng=random.Random(seed))
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        for user_hash, lecturer in state.lecturers.items():
+            client.headers["Authorization"] = f"Bearer {state.tokens[user_hash]}"
+            for _ in range(per_user):
+                _, response = await op_create(client, lecturer, work)
+                response.raise_for_status()
+                state.dispatch_ids.append(response.json()["id"])
+            for _ in range(per_user // 2):
+                await op_assign(client, lecturer, work)
+            state.drafts[lecturer["id"]] = list(work.drafts.get(lecturer["id"], []))
+
+
+async def replay(
+    base_url: str, entries: list[dict], state: ReplayState, args: argparse.Namespace
+) -> dict:
+    recorder = LatencyRecorder()
+    skipped: dict[str, int] = {}
+    lags: list[float] = []
+
+    limits = httpx.Limits(max_connections=args.max_connections)
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=30.0, limits=limits
+    ) as client:
+
+        async def send(name: str, request: dict) -> None:
+            start = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            recorder.record(name, time.perf_counter() - start, ok)
+
+        tasks = []
+        first = entries[0]["t"]
+        start = time.monotonic()
+        for entry in entries:
+            due = start + (entry["t"] - first) / args.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lags.append(max(time.monotonic() - due, 0.0))
+
+            name = f"{entry['m']} {entry['r']}"
+            request = build_request(entry, state)
+            if request is None:
+                skipped[name] = skipped.get(name, 0) + 1
+                continue
+            tasks.append(asyncio.create_task(send(name, request)))
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - start
+
+    summary = recorder.summary(elapsed)
+    summary["skipped"] = skipped
+    # How late requests left. If this process couldn't keep the schedule,
+    # the results measure the replayer: lower --speed
+    lags.sort()
+    summary["schedule_lag_ms"] = {
+        "p50": round(percentile(lags, 50) * 1000, 3),
+        "max": round(lags[-1] * 1000, 3) if lags else 0.0,
+    }
+    return summary
+
+
+def captured_summary(entries: list[dict]) -> dict:
+    """Latencies measured by the capturing service, for comparison."""
+    recorder = LatencyRecorder()
+    for entry in entries:
+        recorder.record(
+            f"{entry['m']} {entry['r']}", entry["ms"] / 1000, entry["s"] < 400
+        )
+    span = max(entries[-1]["t"] - entries[0]["t"], 1e-3)
+    return recorder.summary(span)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    entries = load_captures(args.captures, args.limit)
+    if not entries:
+        raise ValueError("The capture files hold no requests")
+
+    user_hashes = list(dict.fromkeys(e["u"] for e in entries if e.get("u")))
+    # At least two, so that seeded dispatches can be assigned to someone
+    lecturers = bench_lecturers(max(len(user_hashes), 2))
+    state = ReplayState(
+        lecturers=dict(zip(user_hashes, lecturers)),
+        tokens={h: mint_token(lecturer) for h, lecturer in zip(user_hashes, lecturers)},
+    )
+
+    def stand_in(latency: float) -> StandInConfig:
+        return StandInConfig(latency_ms=latency, jitter_ms=args.jitter_ms)
+
+    async with run_stand_ins(
+        lecturers,
+        user=stand_in(args.user_latency_ms),
+        drive=stand_in(args.drive_latency_ms),
+        notification=stand_in(args.notification_latency_ms),
+    ) as stand_ins:
+        with temporary_sqlite_url() as sqlite_url:
+            env = service_env(stand_ins, args.database_url or sqlite_url)
+            async with run_service(env) as base_url:
+                await seed(
+                    base_url,
+                    state,
+                    stand_ins.drive_url,
+                    args.seed_dispatches,
+                    args.seed,
+                )
+                summary = await replay(base_url, entries, state, args)
+
+    summary["captured"] = captured_summary(entries)
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    return result_envelope("replay", config, summary)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("captures", nargs="+", help="Capture files (JSON Lines)")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="Replay N times faster"
+    )
+    parser.add_argument("--limit", type=int, default=None, help="First N requests")
+    parser.add_argument(
+        "--seed-dispatches", type=int, default=10, help="Per captured user"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument(
+        "--database-url",
+        default=None,
+        help="Local database to run against (default: throwaway SQLite file)",
+    )
+    parser.add_argument("--user-latency-ms", type=float, default=20.0)
+    parser.add_argument("--drive-latency-ms", type=float, default=30.0)
+    parser.add_argument("--notification-latency-ms", type=float, default=10.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--output", default=None, help="Write the JSON result here")
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    result = asyncio.run(run(args))
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Local ASGI stand-ins for the HPC microservices the dispatch service calls.
+
+Each stand-in answers the handful of endpoints used by
+`external_services/*` with a configurable latency and error rate, so
+benchmarks exercise the real outbound code paths without the real services.
+`InMemoryKafka` plays the same role for the direct Kafka producer mode.
+"""
+
+import asyncio
+import itertools
+import random
+import uuid
+import zlib
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from fastapi import FastAPI, Request, Response
+
+USER_SERVICE_PATH = "/api/v1"
+DRIVE_SERVICE_PATH = "/api/v1/drive"
+NOTIFICATION_SERVICE_PATH = "/api/v1/notifications/publish"
+
+
+@dataclass
+class StandInConfig:
+    """Latency/error behaviour of one stand-in service."""
+
+    latency_ms: float = 10.0
+    jitter_ms: float = 2.0
+    error_rate: float = 0.0
+
+
+@dataclass
+class StandInStats:
+    """What a stand-in saw, reported next to the benchmark results."""
+
+    requests: int = 0
+    errors: int = 0
+    # (host, port) of every client that talked to us = one TCP connection each
+    connections: set[tuple[str, int]] = field(default_factory=set)
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors_injected": self.errors,
+            "connections": len(self.connections),
+        }
+
+
+def _install_behaviour(app: FastAPI, config: StandInConfig, stats: StandInStats):
+    """Adds the latency/error injection middleware to a stand-in app."""
+
+    @app.middleware("http")
+    async def simulate_upstream(request: Request, call_next):
+        stats.requests += 1
+        if request.client:
+            stats.connections.add((request.client.host, request.client.port))
+
+        delay = max(config.latency_ms + random.uniform(-1, 1) * config.jitter_ms, 0)
+        await asyncio.sleep(delay / 1000)
+
+        if random.random() < config.error_rate:
+            stats.errors += 1
+            return Response(status_code=503)
+        return await call_next(request)
+
+
+def create_user_service(
+    config: StandInConfig, lecturers: list[dict], stats: StandInStats
+) -> FastAPI:
+    """Stand-in for the System Management (User) Service."""
+    app = FastAPI()
+    _install_behaviour(app, config, stats)
+    by_id = {lecturer["id"]: lecturer for lecturer in lecturers}
+
+    @app.get(f"{USER_SERVICE_PATH}/lecturers")
+    async def list_lecturers():
+        # Laravel style pagination wrapper, like the real service
+        return {"data": lecturers}
+
+    @app.get(f"{USER_SERVICE_PATH}/lecturers/{{lecturer_id}}")
+    async def get_lecturer(lecturer_id: int):
+        if lecturer_id not in by_id:
+            return Response(status_code=404)
+        return by_id[lecturer_id]
+
+    return app
+
+
+def create_drive_service(config: StandInConfig, stats: StandInStats) -> FastAPI:
+    """Stand-in for hpc_drive."""
+    app = FastAPI()
+    _install_behaviour(app, config, stats)
+    folders: dict[str, str] = {}
+
+    @app.get(f"{DRIVE_SERVICE_PATH}/items")
+    async def list_items():
+        return {
+            "items": [
+                {"item_id": item_id, "name": name, "item_type": "FOLDER"}
+                for name, item_id in folders.items()
+            ]
+        }
+
+    @app.post(f"{DRIVE_SERVICE_PATH}/items")
+    async def create_item(payload: dict):
+        item_id = folders.setdefault(payload["name"], str(uuid.uuid4()))
+        return {"item_id": item_id}
+
+    @app.patch(f"{DRIVE_SERVICE_PATH}/items/{{item_id}}")
+    async def move_item(item_id: str):
+        return {"item_id": item_id}
+
+    @app.post(f"{DRIVE_SERVICE_PATH}/items/{{item_id}}/share")
+    async def share_item(item_id: str):
+        return {"item_id": item_id}
+
+    @app.patch(f"{DRIVE_SERVICE_PATH}/items/{{item_id}}/trash")
+    async def trash_item(item_id: str):
+        return {"item_id": item_id}
+
+    return app
+
+
+def create_notification_gateway(config: StandInConfig, stats: StandInStats) -> FastAPI:
+    """Stand-in for the notification gateway (HTTP -> Kafka)."""
+    app = FastAPI()
+    _install_behaviour(app, config, stats)
+    app.state.messages = 0
+
+    @app.post(NOTIFICATION_SERVICE_PATH)
+    async def publish(payload: dict):
+        app.state.messages += 1
+        return {"status": "queued"}
+
+    return app
+
+
+# region Kafka
+
+
+@dataclass
+class KafkaRecord:
+    """One record as stored by the in-memory broker."""
+
+    topic: str
+    partition: int
+    key: bytes | None
+    value: bytes
+    headers: list[tuple[str, bytes]] | None
+
+
+@dataclass
+class RecordMetadata:
+    topic: str
+    partition: int
+    offset: int
+
+
+class InMemoryKafka:
+    """
+    Stand-in Kafka cluster: topics with a fixed number of partitions, kept in
+    memory. Every produce request costs `latency_ms`, whatever its size,
+    like a network round trip to a real broker.
+    """
+
+    def __init__(self, partitions: int = 3, latency_ms: float = 0.0):
+        self.partitions = partitions
+        self.latency_ms = latency_ms
+        self.records: dict[tuple[str, int], list[KafkaRecord]] = {}
+        self.produce_requests = 0
+
+    def producer(self, **config) -> "InMemoryProducer":
+        return InMemoryProducer(self, **config)
+
+    async def produce(self, records: list[KafkaRecord]) -> list[RecordMetadata]:
+        """Appends a batch of records in one request."""
+        self.produce_requests += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        metadata = []
+        for record in records:
+            log = self.records.setdefault((record.topic, record.partition), [])
+            log.append(record)
+            metadata.append(
+                RecordMetadata(record.topic, record.partition, len(log) - 1)
+            )
+        return metadata
+
+    def topic_records(self, topic: str) -> list[KafkaRecord]:
+        return [
+            record
+            for (record_topic, _), log in sorted(self.records.items())
+            if record_topic == topic
+            for record in log
+        ]
+
+
+class InMemoryProducer:
+    """
+    The subset of aiokafka's AIOKafkaProducer used by KafkaPublisher
+    (start / send / flush / stop), producing to an InMemoryKafka.
+    Like the real one, `send` only queues the record and returns a future;
+    queued records go out together after `linger_ms`, or as soon as
+    `max_batch_size` bytes are waiting (then `send` waits for that batch
+    to be taken). Keyed records are partitioned by a
+    hash of the key (crc32 here, murmur2 in Kafka), so a key keeps its order.
+    """
+
+    def __init__(
+        self,
+        broker: InMemoryKafka,
+        linger_ms: float = 0,
+        max_batch_size: int = 16384,
+        key_serializer: Callable | None = None,
+        value_serializer: Callable | None = None,
+        **_ignored,  # bootstrap_servers, compression_type, acks...
+    ):
+        self.broker = broker
+        self.linger_ms = linger_ms
+        self.max_batch_size = max_batch_size
+        self.key_serializer = key_serializer
+        self.value_serializer = value_serializer
+        self._pending: list[tuple[KafkaRecord, asyncio.Future]] = []
+        self._pending_bytes = 0
+        self._has_pending = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._batch_taken = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._round_robin = itertools.count()
+        self._sender: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._sender = asyncio.create_task(self._send_batches())
+
+    async def send(self, topic, value=None, key=None, headers=None) -> asyncio.Future:
+        if self._sender is None:
+            raise RuntimeError("Producer is not started")
+        if self.key_serializer and key is not None:
+            key = self.key_serializer(key)
+        if self.value_serializer:
+            value = self.value_serializer(value)
+
+        if key is not None:
+            partition = zlib.crc32(key) % self.broker.partitions
+        else:
+            partition = next(self._round_robin) % self.broker.partitions
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(
+            (KafkaRecord(topic, partition, key, value, headers), future)
+        )
+        self._pending_bytes += len(value)
+        self._idle.clear()
+        self._has_pending.set()
+        if self._pending_bytes >= self.max_batch_size:
+            # Like aiokafka, a full batch blocks the sender until it is sent
+            self._batch_full.set()
+            await self._batch_taken.wait()
+        return future
+
+    async def send_and_wait(self, topic, value=None, key=None, headers=None):
+        return await (await self.send(topic, value, key, headers))
+
+    async def flush(self) -> None:
+        if self._pending:
+            self._batch_full.set()  # Don't wait for the linger
+        await self._idle.wait()
+
+    async def stop(self) -> None:
+        await self.flush()
+        if self._sender:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+            self._sender = None
+
+    async def _send_batches(self) -> None:
+        while True:
+            await self._has_pending.wait()
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), self.linger_ms / 1000)
+            except TimeoutError:
+                pass
+
+            batch, self._pending, self._pending_bytes = self._pending, [], 0
+            self._has_pending.clear()
+            self._batch_full.clear()
+            # Wakes the blocked senders; clearing right away doesn't undo that
+            self._batch_taken.set()
+            self._batch_taken.clear()
+
+            metadata = await self.broker.produce([record for record, _ in batch])
+            for (_, future), record_metadata in zip(batch, metadata):
+                if not future.done():
+                    future.set_result(record_metadata)
+            if not self._pending:
+                self._idle.set()
+
+
+# endregion
@@ -0,0 +1,239 @@
+"""
+Connection reuse of the outbound HTTP clients under concurrent assignments.
+
+Runs the outbound part of `POST /dispatches/{id}/assign` (User lookup,
+Drive organize + share, one notification per assignee) many times
+concurrently against the local stand-ins, with three client strategies:
+
+- per-call: a new client for every service call (no connection reuse),
+- baseline: what the service used to do, default `httpx.AsyncClient()`
+            settings for User/Drive calls and a new client per notification,
+- tuned:    the per-upstream clients the service creates at startup
+            (pool limits, keep-alive, pre-opened connections).
+
+    python -m benchmarks.upstream_clients --assignments 500 --concurrency 20
+
+Prints, per strategy, the latency of one assignment and how many TCP
+connections each stand-in saw. The stand-ins share the benchmark's event
+loop, so connection counts are the primary result; latencies are only
+comparable between strategies of the same run.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import httpx
+
+from .harness import (
+    LatencyRecorder,
+    StandIns,
+    bench_lecturers,
+    configure_in_process_service,
+    result_envelope,
+    run_stand_ins,
+)
+from .stand_ins import StandInConfig
+
+STRATEGIES = ("per-call", "baseline", "tuned")
+
+# Returns the client for a call to an upstream ("user", "drive",
+# "notification") and whether the caller must close it afterwards.
+ClientFactory = Callable[[str], Awaitable[tuple[httpx.AsyncClient, bool]]]
+
+
+def _import_service(stand_ins: StandIns):
+    """Imports the service modules, configured against the stand-ins."""
+    configure_in_process_service(stand_ins)
+
+    from hpc_dispatch_management.db import models
+    from hpc_dispatch_management.external_services import (
+        drive_service,
+        http_client,
+        notification_service,
+        user_service,
+    )
+
+    return models, user_service, drive_service, notification_service, http_client
+
+
+@asynccontextmanager
+async def client_strategy(strategy: str, http_client) -> AsyncIterator[ClientFactory]:
+    """Yields the ClientFactory of a strategy and closes its pooled clients."""
+    if strategy == "tuned":
+        pooled = await http_client.create_upstream_clients()
+    elif strategy == "baseline":
+        pooled = {
+            service: httpx.AsyncClient(base_url=http_client.upstream_base_url(service))
+            for service in ("user", "drive")
+        }
+    else:
+        pooled = {}
+
+    async def get_client(service: str) -> tuple[httpx.AsyncClient, bool]:
+        if service in pooled:
+            return pooled[service], False
+        return httpx.AsyncClient(base_url=http_client.upstream_base_url(service)), True
+
+    try:
+        yield get_client
+    finally:
+        for client in pooled.values():
+            await client.aclose()
+
+
+async def assign_once(
+    index: int,
+    get_client: ClientFactory,
+    lecturers: list[dict],
+    drive_url: str,
+    services,
+) -> None:
+    """The outbound calls of one assignment to three lecturers."""
+    models, user_service, drive_service, notification_service, _ = services
+    author = models.User(**{**lecturers[0], "user_type": "lecturer"})
+    assignees = [
+        models.User(**{**lecturer, "user_type": "lecturer"})
+        for lecturer in lecturers[1 + index % 5 : 4 + index % 5]
+    ]
+    dispatch = models.Dispatch(
+        id=index,
+        title=f"Kế hoạch công tác số {index}",
+        serial_number=f"BENCH-{index:06d}/2026",
+        file_url=f"{drive_url}/items/00000000-0000-4000-8000-{index:012d}",
+        status="pending",
+        author_id=author.id,
+        author=author,
+        created_at=datetime.now(timezone.utc),
+    )
+
+    async def call(service: str, fn, *args, **kwargs):
+        client, close_after = await get_client(service)
+        try:
+            if service == "notification":
+                publisher = notification_service.GatewayPublisher(client)
+                return await fn(*args, publisher=publisher, **kwargs)
+            return await fn(*args, client=client, **kwargs)
+        finally:
+            if close_after:
+                await client.aclose()
+
+    await call(
+        "user",
+        user_service.fetch_lecturer_by_username,
+        assignees[-1].username,
+        "token",
+    )
+    await call(
+        "drive",
+        drive_service.organize_dispatch_in_drive,
+        dispatch=dispatch,
+        assignees=assignees,
+        token="token",
+    )
+    for assignee in assignees:
+        await call(
+            "notification",
+            notification_service.send_new_dispatch_notification,
+            dispatch=dispatch,
+            assigner=author,
+            assignee=assignee,
+            action_required="Vui lòng xem xét.",
+        )
+
+
+async def run_strategy(
+    strategy: str, args: argparse.Namespace, lecturers: list[dict]
+) -> dict:
+    """Runs all assignments with one strategy against fresh stand-ins."""
+
+    def stand_in(latency: float) -> StandInConfig:
+        return StandInConfig(latency_ms=latency, jitter_ms=args.jitter_ms)
+
+    async with run_stand_ins(
+        lecturers,
+        user=stand_in(args.user_latency_ms),
+        drive=stand_in(args.drive_latency_ms),
+        notification=stand_in(args.notification_latency_ms),
+    ) as stand_ins:
+        services = _import_service(stand_ins)
+        http_client = services[-1]
+
+        recorder = LatencyRecorder()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async with client_strategy(strategy, http_client) as get_client:
+            warm_connections = {
+                name: len(stats.connections) for name, stats in stand_ins.stats.items()
+            }
+
+            async def one(index: int):
+                async with semaphore:
+                    start = time.perf_counter()
+                    await assign_once(
+                        index,
+                        get_client,
+                        lecturers,
+                        stand_ins.drive_url,
+                        services,
+                    )
+                    recorder.record("assign", time.perf_counter() - start, True)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(args.assignments)))
+            elapsed = time.perf_counter() - started
+
+        summary = recorder.summary(elapsed)
+        summary["elapsed_s"] = round(elapsed, 3)
+        summary["upstreams"] = {
+            name: {
+                **stats.as_dict(),
+                "opened_at_startup": warm_connections[name],
+            }
+            for name, stats in stand_ins.stats.items()
+        }
+        return summary
+
+
+async def run(args: argparse.Namespace) -> dict:
+    lecturers = bench_lecturers(8)
+    results = {}
+    for strategy in args.strategies.split(","):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        results[strategy] = await run_strategy(strategy, args, lecturers)
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    return result_envelope("upstream_clients", config, {"strategies": results})
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--assignments", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--user-latency-ms", type=float, default=20.0)
+    parser.add_argument("--drive-latency-ms", type=float, default=30.0)
+    parser.add_argument("--notification-latency-ms", type=float, default=10.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--output", default=None, help="Write the JSON result here")
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    result = asyncio.run(run(args))
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
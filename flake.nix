@@ -78,15 +78,19 @@
               python-lsp-server
 
               pytest # Framework for writing tests
+              pytest-benchmark # Fixture for timing the micro benchmarks (benchmarks/micro)
               requests # HTTP library for Python
               fastapi # Web framework for building APIs
               uvicorn # Lightning-fast ASGI server
+              gunicorn # Pre-forking process manager (gunicorn.conf.py)
+              uvicorn-worker # Uvicorn worker class for Gunicorn
               pytest-mock # Thin wrapper around the mock package for easier use with pytest
               pymysql # Pure Python MySQL client
               alembic # Database migration tool for SQLAlchemy
               cryptography # Package which provides cryptographic recipes and primitives
 
               httpx # Next generation HTTP client
+              h2 # HTTP/2 protocol stack (for httpx http2=True)
               python-http-client # Python HTTP library to call APIs
               sqlmodel # Module to work with SQL databases
 
@@ -101,6 +105,8 @@
               jwt # Super fast CLI tool to decode and encode JWTs
               pyjwt # JSON Web Token implementation in Python
               redis # Python client for Redis key-value store
+              prometheus-client # Prometheus instrumentation library for Python applications
+              aiokafka # asyncio client for Kafka (NOTIFICATION_TRANSPORT=kafka)
 
               # Add whatever else you'd like here.
               pkgs.basedpyright
@@ -0,0 +1,51 @@
+# Multi-worker launch: gunicorn -c gunicorn.conf.py
+#
+# The app is imported once in the master (preload_app), and the workers
+# are forked from it, so settings, models, routes and mappers are already
+# set up when a worker starts. Each worker then runs the lifespan warm-up
+# (pool connections, statements, schemas) before it accepts requests.
+import multiprocessing
+import os
+import sys
+
+# The package lives in ./src
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+wsgi_app = "hpc_dispatch_management.main:app"
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = os.environ.get("BIND", "0.0.0.0:8888")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+preload_app = True
+
+# Give lifespan (warm-up, notification flush) time to finish
+timeout = 60
+graceful_timeout = 30
+
+
+def on_starting(server):
+    """
+    One-off work done in the master, before any worker exists, so that every
+    worker inherits it: mapper configuration, and the local development
+    tables (see create_db_and_tables).
+    """
+    from sqlalchemy.orm import configure_mappers
+
+    from hpc_dispatch_management.core.settings import settings
+    from hpc_dispatch_management.db.database import create_db_and_tables, engine
+
+    configure_mappers()
+    if settings.APP_ENV == "local":
+        create_db_and_tables()
+        engine.dispose()
+
+
+def post_fork(server, worker):
+    """
+    A forked worker must not reuse pooled connections of the master: the
+    sockets would be shared between processes. Dropping the inherited pools
+    (without closing the master's sockets) makes each worker open its own.
+    """
+    from hpc_dispatch_management.db.database import all_engines
+
+    for engine in all_engines.values():
+        engine.dispose(close=False)
@@ -0,0 +1,111 @@
+from prometheus_client import Counter, Gauge
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..db.instrumentation import POOL_WAIT_AVERAGE, PoolWaitAverage
+from .settings import settings
+
+# region Metrics
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests being served by this worker (long-lived streams excluded).",
+)
+
+REQUESTS_SHED = Counter(
+    "http_requests_shed_total",
+    "Low-priority requests rejected with 503 because the service was saturated.",
+    ["route", "reason"],
+)
+
+# endregion
+
+# Long-lived streams and probes: they hold no DB connection while open,
+# so they neither count as load nor get shed.
+UNTRACKED_PATHS = frozenset({"/dispatches/events", "/ready", "/metrics"})
+
+
+class AdmissionController:
+    """
+    Decides whether the service is saturated, from the requests in flight
+    and the recent DB pool checkout wait. The app runs on a single event
+    loop, so the in-flight counter needs no locking.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_pool_wait_seconds: float,
+        pool_wait: PoolWaitAverage = POOL_WAIT_AVERAGE,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_pool_wait_seconds = max_pool_wait_seconds
+        self.pool_wait = pool_wait
+        self.in_flight = 0
+
+    def saturation(self) -> str | None:
+        """The reason the service is saturated, None when it isn't."""
+        if self.in_flight >= self.max_in_flight:
+            return "in_flight"
+        if self.pool_wait.value() >= self.max_pool_wait_seconds:
+            return "pool_wait"
+        return None
+
+
+class AdmissionControlMiddleware:
+    """
+    Sheds low-priority requests (ADMISSION_LOW_PRIORITY_ROUTES) with
+    503 + Retry-After while the service is saturated, before they reach
+    the router and queue for a DB connection. Everything else (reviews,
+    assignments, edits) is always admitted, and gets the pool to itself.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController | None = None,
+        low_priority_routes: list[str] | None = None,
+        retry_after_seconds: int | None = None,
+    ):
+        self.app = app
+        self.controller = controller or AdmissionController(
+            max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+            max_pool_wait_seconds=settings.ADMISSION_MAX_POOL_WAIT_MS / 1000,
+        )
+        self.low_priority_routes = frozenset(
+            low_priority_routes
+            if low_priority_routes is not None
+            else settings.ADMISSION_LOW_PRIORITY_ROUTES
+        )
+        self.retry_after_seconds = (
+            retry_after_seconds
+            if retry_after_seconds is not None
+            else settings.ADMISSION_RETRY_AFTER_SECONDS
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in UNTRACKED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        # Same format as ADMISSION_LOW_PRIORITY_ROUTES, e.g. "GET /dispatches/"
+        route = f"{scope['method']} {scope['path']}"
+        if route in self.low_priority_routes:
+            reason = self.controller.saturation()
+            if reason is not None:
+                REQUESTS_SHED.labels(route, reason).inc()
+                response = JSONResponse(
+                    status_code=503,
+                    content={"detail": "The service is busy, please retry later."},
+                    headers={"Retry-After": str(self.retry_after_seconds)},
+                )
+                await response(scope, receive, send)
+                return
+
+        self.controller.in_flight += 1
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.in_flight -= 1
+            REQUESTS_IN_FLIGHT.dec()
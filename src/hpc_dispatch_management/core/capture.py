@@ -0,0 +1,159 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import time
+from urllib.parse import parse_qsl
+
+from prometheus_client import Counter
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# region Metrics
+
+TRAFFIC_CAPTURED = Counter(
+    "traffic_captured_total",
+    "Requests written to the traffic capture file (TRAFFIC_CAPTURE_PATH).",
+)
+
+# endregion
+
+# Probes, scrapes and long-lived streams say nothing about the request mix
+SKIPPED_PATHS = frozenset(
+    {"/", "/ready", "/metrics", "/dispatches/events", "/docs", "/openapi.json"}
+)
+
+# Query parameters that are paging, filters or names of columns: kept as
+# sent. Every other value (search terms above all) is masked.
+VERBATIM_PARAMS = frozenset(
+    {"skip", "limit", "since", "status", "dispatch_type", "fields", "include"}
+)
+
+
+class TrafficCapture:
+    """
+    Appends the shape of requests to a JSON Lines file, one compact object
+    per request, for benchmarks/replay.py:
+
+        {"t": 1773741600.123, "m": "GET", "r": "/dispatches/{dispatch_id}",
+         "p": {"dispatch_id": "12"}, "q": {"search": "~5e0c1"}, "b": 0,
+         "u": "9f86d081884c", "s": 200, "ms": 12.41}
+
+    t: start (unix time), m: method, r: route template (the path as sent
+    when no route matched), p: path parameters, q: query parameters,
+    b: request body size in bytes, u: user id hash, s: status, ms: latency.
+    Bodies, headers and tokens are never written. Masked values and user
+    ids go through an HMAC keyed by JWT_SECRET: the same search term or
+    user always gives the same token (the skew survives), of the same
+    length for search terms, but neither can be read back.
+    Each line is one O_APPEND write, so workers can share the file.
+    """
+
+    def __init__(self, path: str, sample_rate: float = 1.0, secret: str = ""):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._key = hmac.new(
+            secret.encode(), b"traffic-capture", hashlib.sha256
+        ).digest()
+        self._fd: int | None = None
+
+    def wants(self, path: str) -> bool:
+        if path in SKIPPED_PATHS:
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def _digest(self, value: str) -> str:
+        return hmac.new(self._key, value.encode(), hashlib.sha256).hexdigest()
+
+    def mask(self, value: str) -> str:
+        """A stand-in of the same length that only equals itself."""
+        token = "~" + self._digest(value)
+        while len(token) < len(value):
+            token += self._digest(token)
+        return token[: max(len(value), 1)]
+
+    def user_hash(self, user_id: int | None) -> str | None:
+        return None if user_id is None else self._digest(f"user:{user_id}")[:12]
+
+    def sanitize_query(self, query_string: bytes) -> dict[str, str]:
+        return {
+            name: value if name in VERBATIM_PARAMS else self.mask(value)
+            for name, value in parse_qsl(query_string.decode("latin-1"))
+        }
+
+    def write(self, entry: dict) -> None:
+        line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n"
+        try:
+            if self._fd is None:
+                self._fd = os.open(
+                    self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600
+                )
+            os.write(self._fd, line.encode())
+        except OSError as e:
+            logger.error(f"Could not write to the traffic capture {self.path}: {e}")
+            return
+        TRAFFIC_CAPTURED.inc()
+
+
+class TrafficCaptureMiddleware:
+    """
+    Records the sanitized shape of every request (see TrafficCapture).
+    Opt-in: only added when TRAFFIC_CAPTURE_PATH is set. Outermost, so the
+    latency includes admission control and requests it sheds are captured.
+    """
+
+    def __init__(self, app: ASGIApp, capture: TrafficCapture | None = None):
+        self.app = app
+        self.capture = capture or TrafficCapture(
+            settings.TRAFFIC_CAPTURE_PATH or "traffic.jsonl",
+            sample_rate=settings.TRAFFIC_CAPTURE_SAMPLE_RATE,
+            secret=settings.JWT_SECRET,
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.capture.wants(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.time()
+        start = time.perf_counter()
+        body_size = 0
+        status_code = 500
+
+        async def receive_wrapper() -> Message:
+            nonlocal body_size
+            message = await receive()
+            if message["type"] == "http.request":
+                body_size += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            route = scope.get("route")
+            state = scope.get("state") or {}
+            self.capture.write(
+                {
+                    "t": round(started_at, 3),
+                    "m": scope["method"],
+                    "r": getattr(route, "path", None) or scope["path"][:200],
+                    "p": scope.get("path_params") or {},
+                    "q": self.capture.sanitize_query(scope.get("query_string", b"")),
+                    "b": body_size,
+                    # Set by get_current_user, None if authentication failed
+                    "u": self.capture.user_hash(state.get("user_id")),
+                    "s": status_code,
+                    "ms": round((time.perf_counter() - start) * 1000, 2),
+                }
+            )
@@ -0,0 +1,129 @@
+import gc
+import os
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Literal
+
+import httpx
+from sqlalchemy.orm import Session
+
+from ..db.database import Base
+
+GroupBy = Literal["lineno", "filename", "traceback"]
+
+# Allocations of tracemalloc itself and of the import system are noise here
+_NOISE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _site(traceback: tracemalloc.Traceback, group_by: GroupBy) -> str:
+    if group_by == "filename":
+        return traceback[0].filename
+    # Most recent call first, like tracemalloc's own output
+    return " <- ".join(
+        f"{frame.filename}:{frame.lineno}" for frame in reversed(traceback)
+    )
+
+
+class MemoryProfiler:
+    """
+    tracemalloc, started and stopped on demand in this worker process.
+    Each snapshot is compared with the previous one (the first with the
+    one taken at start), so successive calls show what grew in between.
+    tracemalloc slows allocations down while it runs: stop it when done.
+    """
+
+    def __init__(self):
+        self._previous: tracemalloc.Snapshot | None = None
+        # Endpoints run in FastAPI's thread pool
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int) -> None:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._previous = tracemalloc.take_snapshot().filter_traces(_NOISE)
+
+    def stop(self) -> None:
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = None
+
+    def snapshot(self, limit: int, group_by: GroupBy) -> dict:
+        """Top allocation sites now, and their growth since the last snapshot."""
+        with self._lock:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_NOISE)
+            previous, self._previous = self._previous, snapshot
+        current, peak = tracemalloc.get_traced_memory()
+
+        top = snapshot.statistics(group_by)[:limit]
+        diff = (
+            snapshot.compare_to(previous, group_by)[:limit]
+            if previous is not None
+            else []
+        )
+        return {
+            "pid": os.getpid(),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "top": [
+                {
+                    "site": _site(stat.traceback, group_by),
+                    "size_bytes": stat.size,
+                    "count": stat.count,
+                }
+                for stat in top
+            ],
+            "diff": [
+                {
+                    "site": _site(stat.traceback, group_by),
+                    "size_bytes": stat.size,
+                    "size_diff_bytes": stat.size_diff,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in diff
+            ],
+        }
+
+
+memory_profiler = MemoryProfiler()
+
+
+def live_object_counts() -> dict:
+    """
+    Counts the live ORM instances (per model), Sessions with the size of
+    their identity maps, and httpx clients of this worker. Walks every
+    object tracked by the garbage collector: this takes a while on a big
+    heap, and blocks the worker meanwhile.
+    """
+    gc.collect()
+    models: Counter[str] = Counter()
+    clients: Counter[str] = Counter()
+    sessions = 0
+    identity_map_size = 0
+
+    for obj in gc.get_objects():
+        if isinstance(obj, Base):
+            models[type(obj).__name__] += 1
+        elif isinstance(obj, Session):
+            sessions += 1
+            identity_map_size += len(obj.identity_map)
+        elif isinstance(obj, (httpx.AsyncClient, httpx.Client)):
+            clients["closed" if obj.is_closed else "open"] += 1
+
+    return {
+        "pid": os.getpid(),
+        "orm_instances": dict(models.most_common()),
+        "sessions": sessions,
+        "identity_map_size": identity_map_size,
+        "httpx_clients": {"open": clients["open"], "closed": clients["closed"]},
+    }
@@ -0,0 +1,134 @@
+import logging
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..db.instrumentation import QueryStats, track_queries
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# region Metrics
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests, by route template and status code.",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Number of SQL statements executed per HTTP request.",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time spent executing SQL statements per HTTP request.",
+    ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+# endregion
+
+
+def _route_label(scope: Scope) -> str:
+    """
+    Uses the route *template* (e.g. /dispatches/{dispatch_id}) as the label.
+    FastAPI puts the matched route in the scope during routing; unmatched
+    paths are grouped together to keep the label cardinality bounded.
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+def _query_debug_headers(
+    query_stats: QueryStats, repeated: dict[str, int]
+) -> list[tuple[bytes, bytes]]:
+    """
+    Builds the X-DB-* debug headers describing the SQL run so far.
+    """
+    return [
+        (b"x-db-query-count", str(query_stats.count).encode()),
+        (b"x-db-query-time-ms", f"{query_stats.duration * 1000:.2f}".encode()),
+        (b"x-db-repeated-queries", str(len(repeated)).encode()),
+    ]
+
+
+def _report_repeated_queries(
+    scope: Scope, query_stats: QueryStats, repeated: dict[str, int]
+) -> None:
+    """
+    Logs statements that ran many times in one request (likely N+1).
+    """
+    for statement, times in repeated.items():
+        logger.warning(
+            f"Possible N+1 on {scope['method']} {_route_label(scope)}: "
+            f"statement ran {times} times ({query_stats.count} queries total): "
+            f"{statement[:300]}"
+        )
+
+
+class MetricsMiddleware:
+    """
+    Records latency and DB usage of every HTTP request.
+    Written as a plain ASGI middleware (not BaseHTTPMiddleware) so it adds
+    no extra task or response buffering on the hot path.
+    - Statements repeated N_PLUS_ONE_THRESHOLD times are logged as N+1.
+    - With QUERY_DEBUG_HEADERS, the query stats are added to the response.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.QUERY_DEBUG_HEADERS:
+                    # The endpoint (and its queries) has finished by the time
+                    # the response starts, so the numbers are final here.
+                    repeated = query_stats.repeated_statements(
+                        settings.N_PLUS_ONE_THRESHOLD
+                    )
+                    message["headers"] = list(
+                        message.get("headers", [])
+                    ) + _query_debug_headers(query_stats, repeated)
+            await send(message)
+
+        with track_queries() as query_stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = _route_label(scope)
+                HTTP_REQUEST_DURATION.labels(
+                    scope["method"], route, str(status_code)
+                ).observe(time.perf_counter() - start)
+                HTTP_REQUEST_DB_QUERIES.labels(route).observe(query_stats.count)
+                HTTP_REQUEST_DB_SECONDS.labels(route).observe(query_stats.duration)
+
+                if query_stats.count >= settings.N_PLUS_ONE_THRESHOLD:
+                    repeated = query_stats.repeated_statements(
+                        settings.N_PLUS_ONE_THRESHOLD
+                    )
+                    if repeated:
+                        _report_repeated_queries(scope, query_stats, repeated)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Renders every registered metric in the Prometheus text format.
+    Returns the body and its content type.
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import redis.asyncio as redis
+from prometheus_client import Counter, Gauge
+
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# region Metrics
+
+EVENT_SUBSCRIBERS = Gauge(
+    "event_stream_subscribers",
+    "Open server-sent event streams in this worker.",
+)
+
+EVENTS_DROPPED = Counter(
+    "event_stream_dropped_total",
+    "Events dropped because a subscriber did not read them fast enough.",
+)
+
+# endregion
+
+
+class EventBroker:
+    """
+    In-process pub/sub of per-user events (e.g. for the SSE endpoint).
+    Each subscriber gets its own bounded queue; when a slow client lets it
+    fill up, the oldest event is dropped instead of blocking the publisher.
+    Events only reach subscribers of this worker process; see
+    RedisEventBroker for fan-out across workers.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: dict[int, set[asyncio.Queue]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def publish(self, user_id: int, event: dict) -> None:
+        """Sends an event to every stream of `user_id`."""
+        self.deliver(user_id, event)
+
+    def deliver(self, user_id: int, event: dict) -> None:
+        """Puts an event in the queues of this worker's subscribers."""
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                _ = queue.get_nowait()
+                EVENTS_DROPPED.inc()
+            queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[asyncio.Queue]:
+        """Yields a queue receiving the events of `user_id` until exit."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        EVENT_SUBSCRIBERS.inc()
+        try:
+            yield queue
+        finally:
+            EVENT_SUBSCRIBERS.dec()
+            queues = self._subscribers[user_id]
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+
+class RedisEventBroker(EventBroker):
+    """
+    EventBroker for several workers (or instances): events are published on
+    a Redis channel, and every worker delivers the ones it receives to its
+    own subscribers. Publishing never fails the request that triggered it.
+    """
+
+    def __init__(self, url: str, channel: str, queue_size: int = 100):
+        super().__init__(queue_size)
+        self.channel = channel
+        self._redis = redis.from_url(url)
+        self._listener: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        await self._redis.aclose()
+
+    async def publish(self, user_id: int, event: dict) -> None:
+        # Delivered to local subscribers by _listen, like on every other worker
+        try:
+            await self._redis.publish(
+                self.channel, json.dumps({"user_id": user_id, "event": event})
+            )
+        except redis.RedisError as e:
+            logger.error(f"Failed to publish event for user {user_id} to Redis: {e}")
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._deliver_raw(message["data"])
+            except redis.RedisError as e:
+                # Keep the streams open, events resume once Redis is back
+                logger.error(f"Lost the Redis event channel, retrying: {e}")
+                await asyncio.sleep(1)
+
+    def _deliver_raw(self, raw: bytes | str) -> None:
+        # A bad payload loses that message only, not the listener (and so
+        # every later event of this worker)
+        try:
+            data = json.loads(raw)
+            self.deliver(data["user_id"], data["event"])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Ignoring malformed event on {self.channel!r}: {e}")
+
+
+def create_event_broker() -> EventBroker:
+    """The app's event broker, as configured in settings."""
+    if settings.EVENTS_REDIS_URL:
+        return RedisEventBroker(
+            settings.EVENTS_REDIS_URL,
+            channel=settings.EVENTS_REDIS_CHANNEL,
+            queue_size=settings.EVENTS_QUEUE_SIZE,
+        )
+    return EventBroker(queue_size=settings.EVENTS_QUEUE_SIZE)
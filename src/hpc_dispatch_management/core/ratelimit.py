@@ -0,0 +1,235 @@
+import logging
+import math
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Annotated
+
+import redis.asyncio as redis
+from fastapi import Depends, HTTPException, Request, Response, status
+from prometheus_client import Counter
+
+from ..schemas import User
+from .security import get_current_user
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# region Metrics
+
+RATE_LIMITED = Counter(
+    "rate_limited_total",
+    "Requests rejected with 429 because the user's token bucket was empty.",
+    ["cost"],
+)
+
+# endregion
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    """Outcome of charging a request to a bucket, and what to tell the client."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until the bucket is full again
+    reset_seconds: int
+    # Seconds until the request could go through (0 when allowed)
+    retry_after_seconds: int
+
+    def headers(self) -> dict[str, str]:
+        """The RateLimit-* headers (IETF draft), plus Retry-After on a 429."""
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset_seconds),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after_seconds)
+        return headers
+
+
+def _decide(
+    tokens: float, capacity: float, refill_per_second: float, cost: float
+) -> tuple[float, RateLimitDecision]:
+    """
+    Charges `cost` to a bucket holding `tokens` (already refilled).
+    Returns the tokens left and the decision. A denied request costs nothing.
+    """
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+    decision = RateLimitDecision(
+        allowed=allowed,
+        limit=int(capacity),
+        remaining=int(tokens),
+        reset_seconds=math.ceil((capacity - tokens) / refill_per_second),
+        retry_after_seconds=(
+            0 if allowed else math.ceil((cost - tokens) / refill_per_second)
+        ),
+    )
+    return tokens, decision
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets kept in this worker's memory: each key (a user) holds up
+    to `capacity` tokens, refilled at `refill_per_second`, and every request
+    takes its cost out of it. With several workers each one has its own
+    buckets; see RedisTokenBucketLimiter for buckets shared by all of them.
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        refill_per_second: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.clock = clock
+        # key -> (tokens, last refill time)
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    async def close(self) -> None:
+        pass
+
+    async def acquire(self, key: str, cost: float) -> RateLimitDecision:
+        """Takes `cost` tokens from the bucket of `key`, if it holds enough."""
+        now = self.clock()
+        tokens, updated = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+        tokens, decision = _decide(tokens, self.capacity, self.refill_per_second, cost)
+        if tokens >= self.capacity:
+            # A full bucket is the same as no bucket, don't keep idle users around
+            self._buckets.pop(key, None)
+        else:
+            self._buckets[key] = (tokens, now)
+        return decision
+
+
+# Refill and charge in one round trip, atomically for every worker.
+# The Redis server clock is used, so that workers with skewed clocks agree.
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_per_second = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill_per_second)
+
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+-- Gone once it would be full again anyway
+local ttl = math.ceil((capacity - tokens) / refill_per_second * 1000)
+redis.call("PEXPIRE", KEYS[1], math.max(ttl, 1))
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisTokenBucketLimiter(TokenBucketLimiter):
+    """
+    TokenBucketLimiter whose buckets live in Redis, shared by every worker
+    (or instance). If Redis can't be reached, requests are let through:
+    the limiter protects the database, it must not take the service down.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        capacity: float,
+        refill_per_second: float,
+        key_prefix: str = "hpc-dispatch:ratelimit:",
+    ):
+        super().__init__(capacity, refill_per_second)
+        self.key_prefix = key_prefix
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+    async def acquire(self, key: str, cost: float) -> RateLimitDecision:
+        try:
+            allowed, tokens = await self._script(
+                keys=[self.key_prefix + key],
+                args=[self.capacity, self.refill_per_second, cost],
+            )
+        except redis.RedisError as e:
+            logger.error(f"Rate limiting skipped, Redis is unavailable: {e}")
+            return RateLimitDecision(
+                allowed=True,
+                limit=int(self.capacity),
+                remaining=int(self.capacity),
+                reset_seconds=0,
+                retry_after_seconds=0,
+            )
+        # The script already charged the bucket, only the headers are left
+        tokens = float(tokens)
+        if allowed:
+            tokens += cost
+        return _decide(tokens, self.capacity, self.refill_per_second, cost)[1]
+
+
+def create_rate_limiter() -> TokenBucketLimiter | None:
+    """The app's rate limiter as configured in settings, None when disabled."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    if settings.RATE_LIMIT_REDIS_URL:
+        return RedisTokenBucketLimiter(
+            settings.RATE_LIMIT_REDIS_URL,
+            capacity=settings.RATE_LIMIT_CAPACITY,
+            refill_per_second=settings.RATE_LIMIT_REFILL_PER_SECOND,
+        )
+    return TokenBucketLimiter(
+        capacity=settings.RATE_LIMIT_CAPACITY,
+        refill_per_second=settings.RATE_LIMIT_REFILL_PER_SECOND,
+    )
+
+
+def rate_limit(
+    cost: str, search_cost: str | None = None
+) -> Callable[..., Awaitable[None]]:
+    """
+    Dependency charging the request to the current user's bucket.
+    `cost` names an entry of RATE_LIMIT_COSTS; `search_cost` is charged
+    instead when the request has a `search` query parameter. Answers 429
+    once the bucket is empty, and sets the RateLimit-* headers either way.
+    """
+
+    async def charge(
+        request: Request,
+        response: Response,
+        current_user: Annotated[User, Depends(get_current_user)],
+    ) -> None:
+        limiter: TokenBucketLimiter | None = getattr(
+            request.state, "rate_limiter", None
+        )
+        if limiter is None:
+            return
+
+        name = cost
+        if search_cost is not None and request.query_params.get("search"):
+            name = search_cost
+        decision = await limiter.acquire(
+            str(current_user.sub), settings.RATE_LIMIT_COSTS[name]
+        )
+        if not decision.allowed:
+            RATE_LIMITED.labels(name).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please slow down.",
+                headers=decision.headers(),
+            )
+        response.headers.update(decision.headers())
+
+    return charge
@@ -1,6 +1,6 @@
 from typing import Annotated
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security.http import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
 
@@ -11,6 +11,7 @@ bearer_scheme = HTTPBearer()
 
 
 async def get_current_user(
+    request: Request,
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(bearer_scheme)],
 ) -> User:
     """
@@ -48,6 +49,9 @@ async def get_current_user(
                 status_code=status.HTTP_403_FORBIDDEN, detail="Access Denied"
             )
 
+        # For the database dependencies (read-your-writes replica routing)
+        request.state.user_id = user.sub
+
         return user
 
     except JWTError:
@@ -56,3 +60,14 @@ async def get_current_user(
             detail="Could not validate credentials: JWT Error",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+
+async def get_current_admin(
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> User:
+    """
+    Dependency for admin-only endpoints (e.g. diagnostics).
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
+    return current_user
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import Field, HttpUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -15,6 +17,125 @@ class Settings(BaseSettings):
     )
 
     DATABASE_URL: str
+
+    # Optional read replicas of DATABASE_URL (see db/database.py)
+    DATABASE_REPLICA_URLS: list[str] = Field(
+        default=[],
+        description="Read replicas used by read-only endpoints; writes always go to DATABASE_URL",
+    )
+    DB_WARMUP_CONNECTIONS: int = Field(
+        default=4,
+        description="Connections opened per database pool at startup (0 disables it)",
+    )
+    READ_YOUR_WRITES_SECONDS: float = Field(
+        default=5.0,
+        description="After a user writes, their reads stay on the primary this long (covers replica lag)",
+    )
+
+    # Transactions retried on MySQL deadlocks / lock wait timeouts (see db/transactions.py)
+    DB_RETRY_ATTEMPTS: int = Field(
+        default=3,
+        ge=1,
+        description="Times a transaction runs at most, the first run included",
+    )
+    DB_RETRY_BACKOFF_MS: float = Field(
+        default=10.0,
+        description="Pause ceiling before the first retry, doubled for each further one (full jitter)",
+    )
+    DB_RETRY_MAX_BACKOFF_MS: float = 200.0
+    DB_RETRY_BUDGET_RATIO: float = Field(
+        default=0.1,
+        description="Retries allowed per transaction run, so lock storms don't become retry storms",
+    )
+    DB_RETRY_BUDGET_RESERVE: float = Field(
+        default=10.0,
+        description="Retries the budget can save up (and starts with)",
+    )
+
+    # Assignees' first views of a dispatch, written behind (see db/read_receipts.py)
+    READ_RECEIPTS_FLUSH_SECONDS: float = Field(
+        default=5.0,
+        description="How often buffered read receipts are written to the database",
+    )
+    READ_RECEIPTS_MAX_BUFFERED: int = Field(
+        default=500,
+        description="Buffered read receipts that trigger a write right away",
+    )
+
+    # Per-request SQL instrumentation (see db/instrumentation.py)
+    QUERY_DEBUG_HEADERS: bool = Field(
+        default=False,
+        description="Add X-DB-Query-* debug headers to every response",
+    )
+    N_PLUS_ONE_THRESHOLD: int = Field(
+        default=5,
+        description="Same statement (ignoring parameters) run this many times in one request is reported as N+1",
+    )
+
+    # Opt-in capture of request shapes for benchmarks/replay.py (see core/capture.py)
+    TRAFFIC_CAPTURE_PATH: str | None = Field(
+        default=None,
+        description="JSON Lines file the sanitized requests are appended to (unset: no capture)",
+    )
+    TRAFFIC_CAPTURE_SAMPLE_RATE: float = Field(
+        default=1.0,
+        ge=0.0,
+        le=1.0,
+        description="Share of the requests captured",
+    )
+
+    # Admission control (see core/admission.py): when the service is
+    # saturated, low-priority requests are rejected early with a 503
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_MAX_IN_FLIGHT: int = Field(
+        default=60,
+        description="Requests being served at once above which low-priority ones are shed",
+    )
+    ADMISSION_MAX_POOL_WAIT_MS: float = Field(
+        default=50.0,
+        description="Average DB pool checkout wait above which low-priority requests are shed",
+    )
+    ADMISSION_RETRY_AFTER_SECONDS: int = 2
+    ADMISSION_LOW_PRIORITY_ROUTES: list[str] = Field(
+        default=["GET /dispatches/", "GET /dispatches/changes"],
+        description="'METHOD /path' of the requests shed first (list and search)",
+    )
+
+    # Per-user token buckets (see core/ratelimit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_CAPACITY: float = Field(
+        default=100.0,
+        description="Tokens a user's bucket holds, i.e. the largest allowed burst",
+    )
+    RATE_LIMIT_REFILL_PER_SECOND: float = Field(
+        default=5.0,
+        description="Tokens given back to every bucket per second (sustained rate)",
+    )
+    RATE_LIMIT_COSTS: dict[str, float] = Field(
+        default={"read": 1.0, "list": 2.0, "search": 10.0, "write": 2.0},
+        description="Tokens taken per request, by kind (search is a full scan)",
+    )
+    RATE_LIMIT_REDIS_URL: str | None = Field(
+        default=None,
+        description="Share the buckets between workers through Redis (e.g. redis://localhost:6379/0)",
+    )
+
+    # Serial numbers allocated by the server (see crud.SerialAllocator)
+    SERIAL_DEFAULT_PREFIX: str = "CV"
+    SERIAL_TIMEZONE: str = Field(
+        default="Asia/Ho_Chi_Minh",
+        description="Time zone deciding the year of an allocated serial number",
+    )
+    SERIAL_NUMBER_FORMAT: str = Field(
+        default="{prefix}-{number:03d}/{year}",
+        description="How an allocated serial number is written (prefix, number, year)",
+    )
+    SERIAL_BLOCK_SIZE: int = Field(
+        default=1,
+        ge=1,
+        description="Numbers a worker reserves per counter update; above 1, numbers skip on restart and interleave across workers",
+    )
+
     CORS_ORIGINS: list[str] = [
         "http://localhost:3000",
         "http://localhost:3001",
@@ -27,7 +148,7 @@ class Settings(BaseSettings):
     ]
 
     METHODS: list[str] = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-    HEADERS: list[str] = ["Content-Type", "Authorization", "Accept"]
+    HEADERS: list[str] = ["Content-Type", "Authorization", "Accept", "If-Match"]
 
     JWT_SECRET: str
     JWT_ALGO: str
@@ -36,6 +157,96 @@ class Settings(BaseSettings):
     HPC_USER_SERVICE_URL: HttpUrl
     HPC_DRIVE_SERVICE_URL: HttpUrl
 
+    # Explicit timeouts (seconds) per upstream, instead of httpx's defaults
+    HPC_USER_SERVICE_CONNECT_TIMEOUT: float = 2.0
+    HPC_USER_SERVICE_READ_TIMEOUT: float = 5.0
+    HPC_DRIVE_SERVICE_CONNECT_TIMEOUT: float = 2.0
+    HPC_DRIVE_SERVICE_READ_TIMEOUT: float = 5.0
+    NOTIFICATION_SERVICE_CONNECT_TIMEOUT: float = 1.0
+    NOTIFICATION_SERVICE_READ_TIMEOUT: float = 3.0
+
+    # Connection pool of each upstream's long-lived client
+    HPC_USER_SERVICE_MAX_CONNECTIONS: int = 50
+    HPC_DRIVE_SERVICE_MAX_CONNECTIONS: int = 50
+    NOTIFICATION_SERVICE_MAX_CONNECTIONS: int = 20
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int | None = Field(
+        default=None,
+        description=(
+            "Idle connections kept open per upstream (default: its max connections). "
+            "Lower values close connections right after bursts, only to reopen them"
+        ),
+    )
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    UPSTREAM_HTTP2: bool = Field(
+        default=False,
+        description="Talk HTTP/2 to upstreams that support it (needs httpx[http2])",
+    )
+    UPSTREAM_WARMUP_CONNECTIONS: int = Field(
+        default=4,
+        description="Connections opened per upstream at startup (0 disables warm-up)",
+    )
+
+    # How notifications leave the service: through the gateway's HTTP API,
+    # or produced straight to Kafka (needs the aiokafka package)
+    NOTIFICATION_TRANSPORT: Literal["http", "kafka"] = "http"
+    KAFKA_BOOTSTRAP_SERVERS: str = "localhost:9092"
+    KAFKA_LINGER_MS: int = Field(
+        default=20,
+        description="How long the producer waits to fill a batch before sending it",
+    )
+    KAFKA_MAX_BATCH_BYTES: int = 64 * 1024
+    KAFKA_COMPRESSION: Literal["none", "gzip", "snappy", "lz4", "zstd"] = "gzip"
+    KAFKA_ACKS: Literal["0", "1", "all"] = "all"
+
+    # Coalescing of notifications per recipient (see notification_service.py)
+    NOTIFICATION_COALESCE: bool = Field(
+        default=False,
+        description="Buffer notifications per recipient and merge repeated status updates",
+    )
+    NOTIFICATION_COALESCE_WINDOW_SECONDS: float = Field(
+        default=5.0,
+        description="How long a recipient's first buffered notification may wait",
+    )
+    NOTIFICATION_COALESCE_MAX_ITEMS: int = Field(
+        default=20,
+        description="A recipient's buffer is sent as soon as it holds this many notices",
+    )
+    NOTIFICATION_DIGEST: bool = Field(
+        default=False,
+        description="Roll a recipient's buffered new-dispatch notices into one digest",
+    )
+
+    # Server-sent events (GET /dispatches/events, see core/pubsub.py)
+    EVENTS_REDIS_URL: str | None = Field(
+        default=None,
+        description="Fan events out to every worker through Redis (e.g. redis://localhost:6379/0)",
+    )
+    EVENTS_REDIS_CHANNEL: str = "hpc-dispatch:events"
+    EVENTS_QUEUE_SIZE: int = Field(
+        default=100,
+        description="Events buffered per open stream before the oldest is dropped",
+    )
+    SSE_HEARTBEAT_SECONDS: float = Field(
+        default=15.0,
+        description="Comment sent on idle streams, so proxies don't close them",
+    )
+
+    # Circuit breaker shared by every upstream (see external_services/circuit_breaker.py)
+    CIRCUIT_BREAKER_FAILURE_RATE: float = Field(
+        default=0.5,
+        description="Failure ratio (timeouts, network errors, 5xx) that opens the circuit",
+    )
+    CIRCUIT_BREAKER_MINIMUM_CALLS: int = Field(
+        default=10,
+        description="Calls needed in the window before the failure ratio is trusted",
+    )
+    CIRCUIT_BREAKER_WINDOW_SECONDS: float = 30.0
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = Field(
+        default=15.0,
+        description="How long an open circuit fails fast before letting a probe through",
+    )
+    CIRCUIT_BREAKER_HALF_OPEN_CALLS: int = 1
+
     # Pydantic v2 configuration
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,95 @@
+import logging
+import time
+from collections.abc import Callable
+from functools import partial
+
+from fastapi import FastAPI
+from prometheus_client import Gauge
+from sqlalchemy import Engine, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import configure_mappers
+
+from .. import schemas
+from ..db import crud
+from ..db.database import RoutingSession, all_engines
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# region Metrics
+
+STARTUP_WARMUP_SECONDS = Gauge(
+    "startup_warmup_seconds",
+    "Time spent in each startup warm-up step of this worker.",
+    ["step"],
+)
+
+# endregion
+
+
+def _open_pool_connections(db_engine: Engine, count: int) -> None:
+    """
+    Checks `count` connections out at once, so that the pool really opens
+    that many, then returns them all to the pool for the first requests.
+    """
+    connections = []
+    try:
+        for _ in range(count):
+            connection = db_engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def _run_hot_queries(db_engine: Engine) -> None:
+    """
+    Runs the statements of the busiest endpoints once, matching no row.
+    SQLAlchemy keeps their compiled form in the engine's statement cache,
+    so the first real requests skip the compilation.
+    """
+    with RoutingSession(bind=db_engine) as db:
+        _ = crud.get_dispatch(db, dispatch_id=0)
+        for dispatch_type in schemas.DispatchTypeSearch:
+            _ = crud.get_dispatches_with_filters(
+                db,
+                user_id=0,
+                dispatch_type=dispatch_type,
+                status=None,
+                search=None,
+                skip=0,
+                limit=1,
+            )
+        _ = crud.get_changes_since(db, user_id=0, since=0, limit=1)
+        _ = crud.get_user(db, user_id=0)
+        db.rollback()
+
+
+def warm_up(app: FastAPI) -> None:
+    """
+    Pays the one-off costs of the first requests at startup instead:
+    mapper configuration, pool connections, statement compilation and the
+    OpenAPI / JSON schemas of the routes. A database that can't be reached
+    is logged and skipped; the pool connects lazily later on.
+    """
+
+    def step(name: str, work: Callable[[], None]) -> None:
+        start = time.perf_counter()
+        try:
+            work()
+        except SQLAlchemyError as e:
+            logger.warning(f"Warm-up step '{name}' failed, skipping it: {e}")
+        elapsed = time.perf_counter() - start
+        STARTUP_WARMUP_SECONDS.labels(step=name).set(elapsed)
+        logger.info(f"Warm-up step '{name}' took {elapsed * 1000:.0f} ms")
+
+    step("mappers", configure_mappers)
+    for name, db_engine in all_engines.items():
+        step(
+            f"pool:{name}",
+            partial(_open_pool_connections, db_engine, settings.DB_WARMUP_CONNECTIONS),
+        )
+        step(f"statements:{name}", partial(_run_hot_queries, db_engine))
+    # Builds the schema of every request/response model (also serves /docs)
+    step("schemas", app.openapi)
@@ -1,15 +1,324 @@
-from sqlite3 import IntegrityError
+import threading
+from collections.abc import Callable
+from datetime import datetime
+from functools import cache, lru_cache
+from typing import TypeVar
+from zoneinfo import ZoneInfo
 
 from fastapi import HTTPException, status
-from sqlalchemy import or_
+from sqlalchemy import (
+    Connection,
+    Engine,
+    Select,
+    bindparam,
+    exists,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 
 # joinedload tells SQLAlchemy to use an SQL LEFT OUTER JOIN or INNER JOIN
 # to fetch related tables in the exact same query, rather than making separate
 # subsequent queries.
-from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm import Session, joinedload, load_only, raiseload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
 
 from .. import schemas
+from ..core.settings import settings
 from . import models
+from .transactions import transactional
+
+T = TypeVar("T")
+
+# region Change Log
+
+# The one row of models.ChangeSequence
+_CHANGE_SEQUENCE_KEY = {"id": 1}
+
+
+def reserve_change_ids(conn: Connection, count: int) -> int:
+    """
+    Takes `count` ids of the change log and returns the last one.
+    The sequence row stays locked until the transaction of `conn` ends: a
+    concurrent writer waits for it, and can only take later ids once this
+    transaction is visible.
+    """
+    return _increment_counter(conn, models.ChangeSequence, _CHANGE_SEQUENCE_KEY, count)
+
+
+def _next_change_id(db: Session) -> int:
+    """
+    The id of a new change, in the session's transaction (see
+    reserve_change_ids). Pending writes are flushed first, so the
+    transaction locks its own rows before the sequence, in the same order
+    on every path.
+    """
+    db.flush()
+    return reserve_change_ids(db.connection(), 1)
+
+
+def _record_change(
+    db: Session,
+    dispatch_id: int,
+    operation: schemas.ChangeOperation = schemas.ChangeOperation.UPSERT,
+    entity: schemas.ChangeEntity = schemas.ChangeEntity.DISPATCH,
+    entity_id: int | None = None,
+    user_id: int | None = None,
+) -> None:
+    """
+    Appends a row to the change log (see get_changes_since).
+    Every write path calls it before its commit, so the change becomes
+    visible in the same transaction as the write itself.
+    """
+    db.add(
+        models.DispatchChange(
+            id=_next_change_id(db),
+            dispatch_id=dispatch_id,
+            entity=entity,
+            entity_id=dispatch_id if entity_id is None else entity_id,
+            operation=operation,
+            user_id=user_id,
+        )
+    )
+
+
+def backfill_change_log(db: Session) -> int:
+    """
+    Logs an upsert for every dispatch that has no change yet (created
+    before the change log existed, or inserted around crud), so that a
+    full sync returns it. Also starts the sequence after the changes
+    already logged. Safe to run again; returns the number of rows added.
+    """
+
+    def work() -> int:
+        logged = db.query(func.max(models.DispatchChange.id)).scalar() or 0
+        missing = (
+            db.query(models.Dispatch.id)
+            .filter(
+                ~exists().where(models.DispatchChange.dispatch_id == models.Dispatch.id)
+            )
+            .order_by(models.Dispatch.id)
+            .all()
+        )
+        last = _increment_counter(
+            db.connection(),
+            models.ChangeSequence,
+            _CHANGE_SEQUENCE_KEY,
+            len(missing),
+            start=logged,
+        )
+        if missing:
+            first = last - len(missing) + 1
+            db.execute(
+                insert(models.DispatchChange),
+                [
+                    {
+                        "id": change_id,
+                        "dispatch_id": dispatch_id,
+                        "entity": schemas.ChangeEntity.DISPATCH,
+                        "entity_id": dispatch_id,
+                        "operation": schemas.ChangeOperation.UPSERT,
+                    }
+                    for change_id, (dispatch_id,) in enumerate(missing, first)
+                ],
+            )
+        return len(missing)
+
+    return transactional(db, work)
+
+
+# endregion
+
+# region Optimistic Concurrency
+
+
+def _save_dispatch_edit(
+    db: Session, db_dispatch: models.Dispatch, edit: Callable[[], T]
+) -> T:
+    """
+    Applies `edit` to a dispatch loaded earlier in the request and commits
+    it, retried on deadlocks (see transactional).
+    The UPDATE only matches the version that was loaded, so if someone else
+    saved the dispatch in between, nothing is overwritten and the client
+    gets a 412 to reload and retry (no row lock is held meanwhile).
+    """
+    loaded_version = db_dispatch.version
+
+    def work() -> T:
+        # A retry starts from a rollback, which expired the dispatch: it is
+        # reloaded here and must still be the version the request started from
+        if db_dispatch.version != loaded_version:
+            raise StaleDataError()
+        return edit()
+
+    try:
+        result = transactional(db, work)
+    except StaleDataError:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="The dispatch was changed by someone else. Reload it and retry.",
+        )
+    db.refresh(db_dispatch)
+    return result
+
+
+# endregion
+
+# region Status Transitions
+
+# Allowed status changes: current status -> statuses it can move to.
+# Reviewed dispatches stay open to the other assignees' decisions.
+DISPATCH_TRANSITIONS: dict[schemas.DispatchStatus, set[schemas.DispatchStatus]] = {
+    schemas.DispatchStatus.DRAFT: {schemas.DispatchStatus.PENDING},
+    schemas.DispatchStatus.PENDING: {
+        schemas.DispatchStatus.IN_PROGRESS,
+        schemas.DispatchStatus.APPROVED,
+        schemas.DispatchStatus.REJECTED,
+    },
+    schemas.DispatchStatus.IN_PROGRESS: {
+        schemas.DispatchStatus.APPROVED,
+        schemas.DispatchStatus.REJECTED,
+    },
+    schemas.DispatchStatus.APPROVED: {
+        schemas.DispatchStatus.APPROVED,
+        schemas.DispatchStatus.REJECTED,
+    },
+    schemas.DispatchStatus.REJECTED: {
+        schemas.DispatchStatus.APPROVED,
+        schemas.DispatchStatus.REJECTED,
+    },
+}
+
+
+def can_transition(
+    current: schemas.DispatchStatus, target: schemas.DispatchStatus
+) -> bool:
+    return target in DISPATCH_TRANSITIONS.get(current, set())
+
+
+def transition_sources(target: schemas.DispatchStatus) -> list[schemas.DispatchStatus]:
+    """The statuses a dispatch can be in to move to `target`."""
+    return [
+        current
+        for current, targets in DISPATCH_TRANSITIONS.items()
+        if target in targets
+    ]
+
+
+# endregion
+
+# region Serial Numbers
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+_UPSERT_RETURNING = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _increment_counter(
+    conn: Connection, model: type, key: dict, count: int, start: int = 0
+) -> int:
+    """
+    Adds `count` to the `last_value` of the counter row `key` of `model`,
+    creating it at `start` on first use, and returns its new value.
+    One statement, atomic under concurrency.
+    """
+    if conn.dialect.name == "mysql":
+        # LAST_INSERT_ID(expr) makes the new value the statement's lastrowid,
+        # so it comes back with the INSERT itself instead of a SELECT
+        stmt = (
+            mysql.insert(model)
+            .values(**key, last_value=func.last_insert_id(start + count))
+            .on_duplicate_key_update(
+                last_value=func.last_insert_id(model.last_value + count)
+            )
+        )
+        return conn.execute(stmt).lastrowid
+
+    upsert = _UPSERT_RETURNING[conn.dialect.name]
+    stmt = (
+        upsert(model)
+        .values(**key, last_value=start + count)
+        .on_conflict_do_update(
+            index_elements=list(key),
+            set_={"last_value": model.last_value + count},
+        )
+        .returning(model.last_value)
+    )
+    return conn.execute(stmt).scalar_one()
+
+
+def _increment_serial_counter(
+    conn: Connection, prefix: str, year: int, count: int
+) -> int:
+    """Reserves `count` numbers of (prefix, year), returns the last one."""
+    return _increment_counter(
+        conn, models.SerialCounter, {"prefix": prefix, "year": year}, count
+    )
+
+
+class SerialAllocator:
+    """
+    Hands out the serial numbers of each (prefix, year) in order.
+    Every trip to the counter table reserves `block_size` numbers at once,
+    in its own short transaction: the counter row stays locked for the
+    increment only, not for the whole transaction of the creator.
+    Reserved numbers that are never used (the worker restarts with part of
+    a block left, the dispatch insert fails) are skipped, not reused.
+    """
+
+    def __init__(self, block_size: int = 1):
+        self.block_size = block_size
+        # (prefix, year) -> (next number to hand out, last number reserved)
+        self._blocks: dict[tuple[str, int], tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def allocate(self, engine: Engine, prefix: str, year: int) -> int:
+        with self._lock:
+            next_number, last_number = self._blocks.get((prefix, year), (1, 0))
+            if next_number > last_number:
+                with engine.begin() as conn:
+                    last_number = _increment_serial_counter(
+                        conn, prefix, year, self.block_size
+                    )
+                next_number = last_number - self.block_size + 1
+            self._blocks[(prefix, year)] = (next_number + 1, last_number)
+            return next_number
+
+
+serial_allocator = SerialAllocator(block_size=settings.SERIAL_BLOCK_SIZE)
+
+# MySQL's "Duplicate entry ... for key ..." error
+_MYSQL_DUPLICATE_KEY = 1062
+
+
+def _is_serial_number_taken(error: IntegrityError) -> bool:
+    """
+    Whether an INSERT of a dispatch failed on the unique serial number,
+    rather than on another constraint (e.g. the author's foreign key).
+    """
+    message = str(error.orig)
+    args = getattr(error.orig, "args", ())
+    if args and isinstance(args[0], int):
+        # MySQL: (code, "Duplicate entry '...' for key 'dispatches.serial_number'")
+        return args[0] == _MYSQL_DUPLICATE_KEY and "serial_number" in message
+    # SQLite: "UNIQUE constraint failed: dispatches.serial_number",
+    # PostgreSQL: '... unique constraint "dispatches_serial_number_key"'
+    return "unique" in message.lower() and "serial_number" in message
+
+
+def allocate_serial_number(db: Session, prefix: str) -> str:
+    """The next serial number of `prefix` for the current year, e.g. QD-001/2026."""
+    year = datetime.now(ZoneInfo(settings.SERIAL_TIMEZONE)).year
+    # Same database as the session's writes (the primary)
+    number = serial_allocator.allocate(db.get_bind(), prefix, year)
+    return settings.SERIAL_NUMBER_FORMAT.format(prefix=prefix, number=number, year=year)
+
+
+# endregion
 
 # region User Cache Management
 
@@ -29,40 +338,48 @@ def sync_user_from_jwt(db: Session, user_jwt_data: schemas.User) -> models.User:
     Take a decoded JWT payload and ensures this user
     exists and is up-to-date in the local database
     """
-    db_user = get_user(db, user_id=user_jwt_data.sub)
-
-    # If the user already exists in the database, it
-    # overwrites all their mutable attributes with the
-    # fresh data from the JWT.
-    if db_user:
-        # User exists, update their cached info in case it changed
-        db_user.username = user_jwt_data.username
-        db_user.email = user_jwt_data.email
-        db_user.full_name = user_jwt_data.full_name
-        db_user.user_type = schemas.UserType(user_jwt_data.user_type)
-        db_user.department_id = user_jwt_data.department_id
-        db_user.is_admin = user_jwt_data.is_admin
-        # Because user profile can change in System Service,
-        # and Dispatch Servce relies on JWT authentiation, the JWT
-        # acts as a vehicle carrying the absolute latest suer state.
-        # Overwriting these fields guaratees eventual consistency between
-        # microservices
-    # If user wasn't found, create new models.User instance using
-    # the JWT data and ads it to the session.
-    else:
-        # User does not exist in our local cache, create the record
-        db_user = models.User(
-            id=user_jwt_data.sub,
-            username=user_jwt_data.username,
-            email=user_jwt_data.email,
-            full_name=user_jwt_data.full_name,
-            user_type=schemas.UserType(user_jwt_data.user_type),
-            department_id=user_jwt_data.department_id,
-            is_admin=user_jwt_data.is_admin,
-        )
-        db.add(db_user)
 
-    db.commit()
+    def work() -> models.User:
+        db_user = get_user(db, user_id=user_jwt_data.sub)
+
+        # If the user already exists in the database, it
+        # overwrites all their mutable attributes with the
+        # fresh data from the JWT.
+        if db_user:
+            # User exists, update their cached info in case it changed
+            db_user.username = user_jwt_data.username
+            db_user.email = user_jwt_data.email
+            db_user.full_name = user_jwt_data.full_name
+            db_user.user_type = schemas.UserType(user_jwt_data.user_type)
+            db_user.department_id = user_jwt_data.department_id
+            db_user.is_admin = user_jwt_data.is_admin
+            # Because user profile can change in System Service,
+            # and Dispatch Servce relies on JWT authentiation, the JWT
+            # acts as a vehicle carrying the absolute latest suer state.
+            # Overwriting these fields guaratees eventual consistency between
+            # microservices
+        # If user wasn't found, create new models.User instance using
+        # the JWT data and ads it to the session.
+        else:
+            # User does not exist in our local cache, create the record
+            db_user = models.User(
+                id=user_jwt_data.sub,
+                username=user_jwt_data.username,
+                email=user_jwt_data.email,
+                full_name=user_jwt_data.full_name,
+                user_type=schemas.UserType(user_jwt_data.user_type),
+                department_id=user_jwt_data.department_id,
+                is_admin=user_jwt_data.is_admin,
+            )
+            db.add(db_user)
+        return db_user
+
+    try:
+        db_user = transactional(db, work)
+    except IntegrityError:
+        # A concurrent request of the same new user inserted it first,
+        # this time the update branch runs
+        db_user = transactional(db, work)
 
     # Refresh to isses a quick SELECT to fetch the
     # most recent state of the row
@@ -70,21 +387,58 @@ def sync_user_from_jwt(db: Session, user_jwt_data: schemas.User) -> models.User:
     return db_user
 
 
+def cache_lecturers(db: Session, lecturers: list[dict]) -> None:
+    """
+    Saves lecturers fetched from the User Service to the local cache.
+    One that a concurrent request cached first is left as it is.
+    """
+    for lecturer_data in lecturers:
+
+        def work(lecturer_data: dict = lecturer_data) -> None:
+            db.add(
+                models.User(
+                    id=lecturer_data["id"],
+                    username=lecturer_data["username"],
+                    email=lecturer_data["email"],
+                    full_name=lecturer_data.get(
+                        "full_name",
+                        lecturer_data.get("name", lecturer_data["username"]),
+                    ),
+                    user_type=schemas.UserType.LECTURER,
+                    department_id=lecturer_data.get("department_id"),
+                    is_admin=lecturer_data.get("is_admin", False),
+                )
+            )
+
+        try:
+            transactional(db, work)
+        except IntegrityError:
+            pass
+
+
 # endregion
 
 # region Dispatch CRUD
 
 
+@cache
+def _get_dispatch_statement() -> Select:
+    """
+    Built once, on first use (after the mappers are configured), then run
+    with a bound `dispatch_id`. SQLAlchemy finds the compiled SQL in its
+    cache without rebuilding the query and its loader options every call.
+    """
+    return (
+        select(models.Dispatch)
+        .options(*_dispatch_load_options(None, None))
+        .where(models.Dispatch.id == bindparam("dispatch_id"))
+    )
+
+
 def get_dispatch(db: Session, dispatch_id: int) -> models.Dispatch | None:
     return (
-        db.query(models.Dispatch)
-        .options(
-            joinedload(models.Dispatch.author),
-            selectinload(models.Dispatch.assignments).joinedload(
-                models.DispatchAssignment.assignee
-            ),
-        )
-        .filter(models.Dispatch.id == dispatch_id)
+        db.execute(_get_dispatch_statement(), {"dispatch_id": dispatch_id})
+        .scalars()
         .first()
     )
 
@@ -112,7 +466,7 @@ def create_dispatch(
     Create a new dispatch for the database.
     """
     # Converts the validated Pydantic input schema into a standard Python dictionary
-    dispatch_data = dispatch.model_dump()
+    dispatch_data = dispatch.model_dump(exclude={"serial_prefix"})
 
     # While Pydantic models often define URL as special HttpUrl type for strict
     # type validation, SQLAlchemy expects a standard primitive string to store in
@@ -120,22 +474,42 @@ def create_dispatch(
     if dispatch_data.get("file_url"):
         dispatch_data["file_url"] = str(dispatch_data["file_url"])
 
-    db_dispatch = models.Dispatch(
-        **dispatch_data, author_id=author_id, status=schemas.DispatchStatus.DRAFT
-    )
-    db.add(db_dispatch)
-
-    try:
-        db.commit()
+    # No serial number sent: the server allocates the next one
+    allocated = dispatch_data["serial_number"] is None
+    prefix = dispatch.serial_prefix or settings.SERIAL_DEFAULT_PREFIX
+
+    # An allocated number is only taken if someone typed it in by hand
+    # before; the next one is then tried, a few times at most.
+    for _ in range(3 if allocated else 1):
+        if allocated:
+            dispatch_data["serial_number"] = allocate_serial_number(db, prefix)
+
+        def work() -> models.Dispatch:
+            db_dispatch = models.Dispatch(
+                **dispatch_data,
+                author_id=author_id,
+                status=schemas.DispatchStatus.DRAFT,
+            )
+            db.add(db_dispatch)
+            # The change log needs the new id
+            db.flush()
+            _record_change(db, db_dispatch.id)
+            return db_dispatch
+
+        try:
+            db_dispatch = transactional(db, work)
+        except IntegrityError as e:
+            if not _is_serial_number_taken(e):
+                raise
+            continue  # transactional rolled the failed transaction back
         db.refresh(db_dispatch)
         return db_dispatch
-    except IntegrityError:
-        db.rollback()  # Rollback the failed transaction
-        # Raise a 400 error with a clean, Vietnamese message
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Số hiệu công văn này đã tồn tại. Vui lòng nhập một số hiệu khác.",
-        )
+
+    # Raise a 400 error with a clean, Vietnamese message
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Số hiệu công văn này đã tồn tại. Vui lòng nhập một số hiệu khác.",
+    )
 
 
 def update_dispatch(
@@ -150,14 +524,16 @@ def update_dispatch(
     if update_data.get("file_url"):
         update_data["file_url"] = str(update_data["file_url"])
 
-    for key, value in update_data.items():
-        setattr(db_dispatch, key, value)
+    def edit() -> None:
+        for key, value in update_data.items():
+            setattr(db_dispatch, key, value)
 
-    # Though, the db_dispatch is already fethced from the db, we still use
-    # add() here. it's no-op, but good practice to signal intent.
-    db.add(db_dispatch)
-    db.commit()
-    db.refresh(db_dispatch)
+        # Though, the db_dispatch is already fethced from the db, we still use
+        # add() here. it's no-op, but good practice to signal intent.
+        db.add(db_dispatch)
+        _record_change(db, db_dispatch.id)
+
+    _save_dispatch_edit(db, db_dispatch, edit)
     return db_dispatch
 
 
@@ -166,11 +542,22 @@ def delete_dispatch(db: Session, dispatch_id: int) -> models.Dispatch | None:
     Remove a dispatch from the database
     """
 
-    db_dispatch = get_dispatch(db, dispatch_id)
-    if db_dispatch:
-        db.delete(db_dispatch)  # TODO: Set up soft delete is_delete=True instead.
-        db.commit()
-    return db_dispatch
+    def work() -> models.Dispatch | None:
+        db_dispatch = get_dispatch(db, dispatch_id)
+        if db_dispatch:
+            # Tombstones, so that syncing clients drop it too. Only the users
+            # who could see the dispatch learn that it is gone.
+            audience = {db_dispatch.author_id} | {
+                assignment.assignee_id for assignment in db_dispatch.assignments
+            }
+            db.delete(db_dispatch)  # TODO: Set up soft delete is_delete=True instead.
+            for user_id in sorted(audience):
+                _record_change(
+                    db, dispatch_id, schemas.ChangeOperation.DELETE, user_id=user_id
+                )
+        return db_dispatch
+
+    return transactional(db, work)
 
 
 def assign_dispatch_to_users(
@@ -180,76 +567,252 @@ def assign_dispatch_to_users(
     Creates DispatchAssignment records and updates dispatch status.
     Returns the list of assignee user objects.
     """
-    assignee_usernames = assignment_data.assignee_usernames
-    # If an API client accidentally sends ["jane", "jane"], it would create duplicate
-    # Using set for efficiency and to handle duplicate usernames in input
-    unique_assignee_usernames = set(assignee_usernames)
-    assignees = (
-        db.query(models.User)
-        .filter(models.User.username.in_(unique_assignee_usernames))
-        .all()
-    )
 
-    if len(assignees) != len(unique_assignee_usernames):
-        raise ValueError("One or more assignee usernames are invalid.")
+    def edit() -> list[models.User]:
+        assignee_usernames = assignment_data.assignee_usernames
+        # If an API client accidentally sends ["jane", "jane"], it would create duplicate
+        # Using set for efficiency and to handle duplicate usernames in input
+        unique_assignee_usernames = set(assignee_usernames)
+        assignees = (
+            db.query(models.User)
+            .filter(models.User.username.in_(unique_assignee_usernames))
+            .all()
+        )
+
+        if len(assignees) != len(unique_assignee_usernames):
+            raise ValueError("One or more assignee usernames are invalid.")
 
-    for assignee in assignees:
-        assignment = models.DispatchAssignment(
-            dispatch_id=db_dispatch.id,
-            assignee_id=assignee.id,
-            action_required=assignment_data.action_required,
+        assignments = [
+            models.DispatchAssignment(
+                dispatch_id=db_dispatch.id,
+                assignee_id=assignee.id,
+                action_required=assignment_data.action_required,
+            )
+            for assignee in assignees
+        ]
+        db.add_all(assignments)
+
+        # Transition the dispatch from DRAFT to PENDING
+        db_dispatch.status = schemas.DispatchStatus.PENDING
+        db.add(db_dispatch)
+
+        # The change log needs the ids of the new assignments
+        db.flush()
+        _record_change(db, db_dispatch.id)
+        for assignment in assignments:
+            _record_change(
+                db,
+                db_dispatch.id,
+                entity=schemas.ChangeEntity.ASSIGNMENT,
+                entity_id=assignment.id,
+            )
+        return assignees
+
+    # The session doesn't expire instances on commit (see SessionLocal),
+    # the assignees are still loaded and usable outside of it.
+    return _save_dispatch_edit(db, db_dispatch, edit)
+
+
+def review_dispatch(
+    db: Session,
+    dispatch_id: int,
+    reviewer_id: int,
+    status_update: schemas.DispatchStatusUpdate,
+    expected_versions: set[int] | None = None,
+) -> models.Dispatch:
+    """
+    Sets the status an assignee decided on, and saves their review comment
+    to their assignment record.
+    The rules (caller is an assignee, the transition is allowed, the
+    If-Match version) are part of the UPDATE's WHERE clause, so checking
+    and writing is one atomic statement instead of read, check, then write.
+    `expected_versions=None` accepts any version.
+    """
+
+    target = status_update.status
+    is_assignee = exists().where(
+        models.DispatchAssignment.dispatch_id == models.Dispatch.id,
+        models.DispatchAssignment.assignee_id == reviewer_id,
+    )
+    guards = [
+        models.Dispatch.id == dispatch_id,
+        models.Dispatch.status.in_(transition_sources(target)),
+        is_assignee,
+    ]
+    if expected_versions is not None:
+        guards.append(models.Dispatch.version.in_(expected_versions))
+
+    def work() -> None:
+        # Core UPDATE, so the version_id_col has to be bumped by hand
+        result = db.execute(
+            update(models.Dispatch)
+            .where(*guards)
+            .values(status=target, version=models.Dispatch.version + 1)
+            .execution_options(synchronize_session=False)
         )
-        db.add(assignment)
+        if result.rowcount != 1:
+            db.rollback()
+            _raise_review_denied(
+                db, dispatch_id, reviewer_id, target, expected_versions
+            )
 
-    # Transition the dispatch from DRAFT to PENDING
-    db_dispatch.status = schemas.DispatchStatus.PENDING
-    db.add(db_dispatch)
+        _record_change(db, dispatch_id)
 
-    # A commit expires the state of all instances.
-    db.commit()
+        if status_update.review_comment is not None:
+            own_assignment = (
+                models.DispatchAssignment.dispatch_id == dispatch_id,
+                models.DispatchAssignment.assignee_id == reviewer_id,
+            )
+            db.execute(
+                update(models.DispatchAssignment)
+                .where(*own_assignment)
+                .values(review_comment=status_update.review_comment)
+                .execution_options(synchronize_session=False)
+            )
+            # INSERT ... SELECT logs the assignment without reading its id first
+            change = models.DispatchChange.__table__.c
+            db.execute(
+                insert(models.DispatchChange).from_select(
+                    ["id", "dispatch_id", "entity", "entity_id", "operation"],
+                    select(
+                        literal(_next_change_id(db)),
+                        literal(dispatch_id),
+                        literal(schemas.ChangeEntity.ASSIGNMENT, change.entity.type),
+                        models.DispatchAssignment.id,
+                        literal(schemas.ChangeOperation.UPSERT, change.operation.type),
+                    ).where(*own_assignment),
+                )
+            )
 
-    # After a commit, refresh the objects that will be used
-    # outside this session. This loads their fresh state so they no longer
-    # need the session to be accessed.
-    db.refresh(db_dispatch)
-    for assignee in assignees:
-        db.refresh(assignee)
+    transactional(db, work)
 
-    return assignees
+    # The Core UPDATEs bypassed the session, and it doesn't expire on commit:
+    # overwrite the dispatch and assignments it may hold from earlier reads
+    db_dispatch = (
+        db.execute(
+            _get_dispatch_statement(),
+            {"dispatch_id": dispatch_id},
+            execution_options={"populate_existing": True},
+        )
+        .scalars()
+        .first()
+    )
+    if db_dispatch is None:  # Deleted right after the review
+        raise HTTPException(status_code=404, detail="Dispatch not found")
+    return db_dispatch
 
 
-def get_dispatches_with_filters(
+def _raise_review_denied(
     db: Session,
-    user_id: int,
-    dispatch_type: schemas.DispatchTypeSearch,
-    status: schemas.DispatchStatus | None,
-    search: str | None,
-    skip: int,
-    limit: int,
-) -> list[models.Dispatch]:
+    dispatch_id: int,
+    reviewer_id: int,
+    target: schemas.DispatchStatus,
+    expected_versions: set[int] | None,
+):
     """
-    Retrieves dispatches with advanced filtering based on the user's perspective.
+    Explains why review_dispatch's UPDATE matched no row.
+    Only runs on the failure path, the successful one never reads first.
     """
-    # Start with a base query and eager load author info to prevent N+1 queries
-    query = db.query(models.Dispatch).options(
-        joinedload(models.Dispatch.author),
-        selectinload(models.Dispatch.assignments).joinedload(
-            models.DispatchAssignment.assignee
+    row = db.execute(
+        select(
+            models.Dispatch.status,
+            models.Dispatch.version,
+            exists().where(
+                models.DispatchAssignment.dispatch_id == models.Dispatch.id,
+                models.DispatchAssignment.assignee_id == reviewer_id,
+            ),
+        ).where(models.Dispatch.id == dispatch_id)
+    ).first()
+
+    if row is None:
+        raise HTTPException(status_code=404, detail="Dispatch not found")
+    current_status, version, is_assignee = row
+    if not is_assignee:
+        raise HTTPException(
+            status_code=403, detail="You are not an assignee of this dispatch"
+        )
+    if expected_versions is not None and version not in expected_versions:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="The dispatch was changed by someone else. Reload it and retry.",
+        )
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=(
+            f"A dispatch cannot go from '{current_status.value}' "
+            f"to '{target.value}'."
         ),
     )
 
+
+def _dispatch_load_options(
+    fields: set[schemas.DispatchField] | None,
+    include: set[schemas.DispatchInclude] | None,
+) -> list:
+    """
+    Builds the loader options for a (possibly sparse) dispatch query.
+    - fields=None loads every column, otherwise only the requested ones
+      (the Text `description` column is skipped unless asked for).
+    - include=None eager loads every relationship, otherwise only the
+      requested ones. Anything not requested raises on access instead of
+      silently firing an extra SELECT per row.
+    """
+    options = []
+
+    if fields is not None:
+        # The primary key is always needed to build the identity map
+        # and to run the selectin query for assignments.
+        columns = {models.Dispatch.id} | {
+            getattr(models.Dispatch, field.value) for field in fields
+        }
+        options.append(load_only(*columns, raiseload=True))
+
+    if include is None or schemas.DispatchInclude.AUTHOR in include:
+        options.append(joinedload(models.Dispatch.author))
+    if include is None or schemas.DispatchInclude.ASSIGNMENTS in include:
+        options.append(
+            selectinload(models.Dispatch.assignments).joinedload(
+                models.DispatchAssignment.assignee
+            )
+        )
+
+    if include is not None:
+        options.append(raiseload("*"))
+
+    return options
+
+
+@lru_cache(maxsize=256)
+def _filters_statement(
+    dispatch_type: schemas.DispatchTypeSearch,
+    by_status: bool,
+    by_search: bool,
+    fields: frozenset[schemas.DispatchField] | None,
+    include: frozenset[schemas.DispatchInclude] | None,
+) -> Select:
+    """
+    The statement of get_dispatches_with_filters for one shape of request,
+    with bound parameters (user_id, status, search, skip, limit) for the
+    values. There are only a few shapes in practice, so each one is built
+    once and reused, like _get_dispatch_statement.
+    """
+    # Eager load only what the caller asked for (everything by default)
+    # to prevent N+1 queries
+    stmt = select(models.Dispatch).options(*_dispatch_load_options(fields, include))
+    user_id = bindparam("user_id")
+
     # 1. Filter by User Perspective (INCOMING/OUTGOING)
     if dispatch_type == schemas.DispatchTypeSearch.INCOMING:
         # An incoming dispatch is one where the user is an assignee
-        query = query.join(models.DispatchAssignment).filter(
+        stmt = stmt.join(models.DispatchAssignment).where(
             models.DispatchAssignment.assignee_id == user_id
         )
     elif dispatch_type == schemas.DispatchTypeSearch.OUTGOING:
         # An outgoing dispatch is one where the user is the author
-        query = query.filter(models.Dispatch.author_id == user_id)
+        stmt = stmt.where(models.Dispatch.author_id == user_id)
     else:  # 'ALL'
         # A dispatch is related to the user if they are the author OR an assignee
-        query = query.join(models.DispatchAssignment, isouter=True).filter(
+        stmt = stmt.join(models.DispatchAssignment, isouter=True).where(
             or_(
                 models.Dispatch.author_id == user_id,
                 models.DispatchAssignment.assignee_id == user_id,
@@ -257,26 +820,183 @@ def get_dispatches_with_filters(
         )
 
     # 2. Filter by Status (if provided)
-    if status:
-        query = query.filter(models.Dispatch.status == status)
+    if by_status:
+        stmt = stmt.where(models.Dispatch.status == bindparam("status"))
 
     # 3. Filter by Search Term (if provided)
-    if search:
-        search_term = f"%{search}%"
+    if by_search:
+        search_term = bindparam("search")
         # Case-insensitive search on title or serial number
-        query = query.filter(
+        stmt = stmt.where(
             or_(
                 models.Dispatch.title.ilike(search_term),
                 models.Dispatch.serial_number.ilike(search_term),
             )
         )
 
-    # Apply ordering and pagination before executing the query
+    # Apply ordering and pagination
+    return (
+        stmt.order_by(models.Dispatch.created_at.desc())
+        .offset(bindparam("skip"))
+        .limit(bindparam("limit"))
+    )
+
+
+def get_dispatches_with_filters(
+    db: Session,
+    user_id: int,
+    dispatch_type: schemas.DispatchTypeSearch,
+    status: schemas.DispatchStatus | None,
+    search: str | None,
+    skip: int,
+    limit: int,
+    fields: set[schemas.DispatchField] | None = None,
+    include: set[schemas.DispatchInclude] | None = None,
+) -> list[models.Dispatch]:
+    """
+    Retrieves dispatches with advanced filtering based on the user's perspective.
+    `fields` and `include` narrow down what gets loaded (see _dispatch_load_options).
+    """
+    stmt = _filters_statement(
+        dispatch_type,
+        by_status=bool(status),
+        by_search=bool(search),
+        fields=None if fields is None else frozenset(fields),
+        include=None if include is None else frozenset(include),
+    )
+    params = {"user_id": user_id, "skip": skip, "limit": limit}
+    if status:
+        params["status"] = status
+    if search:
+        params["search"] = f"%{search}%"
+
+    # The outer join of 'ALL' repeats a dispatch once per matching row,
+    # unique() returns each dispatch once (as Query.all() used to)
+    return list(db.execute(stmt, params).scalars().unique())
+
+
+def get_changes_since(
+    db: Session, user_id: int, since: int, limit: int
+) -> schemas.DispatchChanges:
+    """
+    Dispatches of the user (as author or assignee) that were created,
+    updated or deleted after the change `since`, oldest change first.
+    A dispatch changed several times is returned once, in its latest state.
+    Tombstones are only returned to the users they were written for.
+    """
+    # Pin the upper bound first, so the token covers exactly what was read.
+    # Ids are taken under the ChangeSequence lock, so every change up to
+    # `head` has committed: none can appear below it later.
+    head = db.query(func.max(models.DispatchChange.id)).scalar() or 0
+    if head <= since:
+        return schemas.DispatchChanges(
+            sync_token=max(since, head),
+            has_more=False,
+            dispatches=[],
+            deleted_dispatch_ids=[],
+        )
+
+    # Only the user's changes are grouped: their dispatches, and the
+    # tombstones written for them
+    own_dispatch_ids = (
+        select(models.Dispatch.id)
+        .where(models.Dispatch.author_id == user_id)
+        .union(
+            select(models.DispatchAssignment.dispatch_id).where(
+                models.DispatchAssignment.assignee_id == user_id
+            )
+        )
+    )
+    # One row per changed dispatch, with its latest change
+    latest = (
+        db.query(
+            models.DispatchChange.dispatch_id,
+            func.max(models.DispatchChange.id).label("seq"),
+        )
+        .filter(
+            models.DispatchChange.id > since,
+            models.DispatchChange.id <= head,
+            or_(
+                models.DispatchChange.user_id == user_id,
+                models.DispatchChange.dispatch_id.in_(own_dispatch_ids),
+            ),
+        )
+        .group_by(models.DispatchChange.dispatch_id)
+        .subquery()
+    )
+    rows = (
+        db.query(latest.c.dispatch_id, latest.c.seq, models.Dispatch.id)
+        .outerjoin(models.Dispatch, models.Dispatch.id == latest.c.dispatch_id)
+        .order_by(latest.c.seq)
+        .limit(limit + 1)
+        .all()
+    )
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    live_ids = [dispatch_id for dispatch_id, _, live in rows if live is not None]
     dispatches = (
-        query.order_by(models.Dispatch.created_at.desc())
-        .offset(skip)
-        .limit(limit)
+        db.query(models.Dispatch)
+        .options(*_dispatch_load_options(None, None))
+        .filter(models.Dispatch.id.in_(live_ids))
         .all()
+        if live_ids
+        else []
     )
+    order = {dispatch_id: position for position, dispatch_id in enumerate(live_ids)}
+    dispatches.sort(key=lambda d: order[d.id])
+
+    return schemas.DispatchChanges.model_validate(
+        {
+            # A full page stops at its last change; the next call resumes there
+            "sync_token": rows[-1].seq if has_more else head,
+            "has_more": has_more,
+            "dispatches": dispatches,
+            "deleted_dispatch_ids": [
+                dispatch_id for dispatch_id, _, live in rows if live is None
+            ],
+        },
+        from_attributes=True,
+    )
+
+
+# region Read Receipts
+
+
+@cache
+def _mark_seen_statement():
+    """UPDATE of one assignment's seen_at, run with a list of parameters."""
+    assignments = models.DispatchAssignment.__table__
+    return (
+        assignments.update()
+        .where(
+            assignments.c.dispatch_id == bindparam("receipt_dispatch_id"),
+            assignments.c.assignee_id == bindparam("receipt_assignee_id"),
+            # The first view wins, also against another worker's flush
+            assignments.c.seen_at.is_(None),
+        )
+        .values(seen_at=bindparam("receipt_seen_at"))
+    )
+
 
-    return dispatches
+def mark_assignments_seen(db: Session, receipts: dict[tuple[int, int], datetime]):
+    """
+    Sets seen_at of the (dispatch_id, assignee_id) assignments, in one
+    executemany UPDATE. Assignments already seen, or deleted since, are
+    left alone. Dispatch versions and the change log are not touched:
+    being opened doesn't change a dispatch.
+    """
+    params = [
+        {
+            "receipt_dispatch_id": dispatch_id,
+            "receipt_assignee_id": assignee_id,
+            "receipt_seen_at": seen_at,
+        }
+        for (dispatch_id, assignee_id), seen_at in receipts.items()
+    ]
+    if params:
+        transactional(db, lambda: db.execute(_mark_seen_statement(), params))
+
+
+# endregion
@@ -1,29 +1,119 @@
+import itertools
 import logging
+import time
 from collections.abc import Generator
+from typing import TYPE_CHECKING
 
 import httpx
 from fastapi import Request
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, event
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy.sql.expression import UpdateBase
 
+from ..core.pubsub import EventBroker
 from ..core.settings import settings
+from .instrumentation import InstrumentedQueuePool, register_pool_metrics
+
+if TYPE_CHECKING:  # notification_service imports the models, which import this module
+    from ..external_services.notification_service import NotificationPublisher
+    from .read_receipts import ReadReceiptBuffer
 
 logger = logging.getLogger(__name__)
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True,  # Ensure the connection is alive before using.
-    pool_size=10,  # Keep up to 10 persistent connections open in the connection pool to handles request quickly wihout constantly reopening connections
-    max_overflow=20,  # Allows the pool to temproraility to create up to 20 extra connecitons if there is a sudden spike in traffic
-)
+
+def _create_engine(url: str) -> Engine:
+    return create_engine(
+        url,
+        pool_pre_ping=True,  # Ensure the connection is alive before using.
+        pool_size=10,  # Keep up to 10 persistent connections open in the connection pool to handles request quickly wihout constantly reopening connections
+        max_overflow=20,  # Allows the pool to temproraility to create up to 20 extra connecitons if there is a sudden spike in traffic
+        poolclass=InstrumentedQueuePool,  # Same QueuePool, but records checkout wait time for /metrics
+    )
+
+
+engine = _create_engine(SQLALCHEMY_DATABASE_URL)
+
+# Read replicas, each with its own pool. Empty when none are configured,
+# then every session uses the primary `engine`.
+replica_engines = [_create_engine(url) for url in settings.DATABASE_REPLICA_URLS]
+_next_replica = itertools.cycle(replica_engines)
+
+# Every pool by name: for /metrics, the startup warm-up and forked workers
+all_engines: dict[str, Engine] = {
+    "primary": engine,
+    **{f"replica-{i}": replica for i, replica in enumerate(replica_engines)},
+}
+
+# Pool state (checked-out, overflow) is read on each /metrics scrape
+register_pool_metrics(all_engines)
+
+
+class ReadYourWrites:
+    """
+    Remembers which users wrote recently, so that their next reads go to
+    the primary instead of a replica that may not have the write yet.
+    Kept in memory, so it covers the requests served by this worker.
+    """
+
+    def __init__(self, window_seconds: float, clock=time.monotonic):
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._until: dict[int, float] = {}
+
+    def mark(self, user_id: int) -> None:
+        self._until[user_id] = self._clock() + self.window_seconds
+
+    def is_sticky(self, user_id: int) -> bool:
+        until = self._until.get(user_id)
+        if until is None:
+            return False
+        if until <= self._clock():
+            del self._until[user_id]
+            return False
+        return True
+
+
+read_your_writes = ReadYourWrites(settings.READ_YOUR_WRITES_SECONDS)
+
+
+class RoutingSession(Session):
+    """
+    Session that runs its reads on `info["replica"]` when one is set
+    (see get_read_db). Flushes and INSERT/UPDATE/DELETE statements always
+    go to the primary, and mark the session as having written.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["wrote"] = True
+            return super().get_bind(mapper=mapper, clause=clause, **kw)
+        replica = self.info.get("replica")
+        if replica is not None:
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_writer(session: Session):
+    """Makes the user who just committed a write read from the primary."""
+    if session.info.pop("wrote", False) and replica_engines:
+        request = session.info.get("request")
+        user_id = getattr(request.state, "user_id", None) if request else None
+        if user_id is not None:
+            read_your_writes.mark(user_id)
+
 
 # Create a factory for generating new database sessions.
 SessionLocal = sessionmaker(
     autocommit=False,  # Ensures the changes aren't saved to db unless you db.commit().
     autoflush=False,  # Prevents SQLAlchemy from auto pushing changes to db before executing queries.
+    # Objects stay loaded after a commit, so an endpoint can commit (and give
+    # the connection back, see release_connection) and still use them.
+    expire_on_commit=False,
     bind=engine,
+    class_=RoutingSession,
 )
 
 
@@ -35,12 +125,17 @@ class Base(DeclarativeBase):
 
 # A FastAPI Dependency. When an endpoiint need to talk to the db,
 # it injects this functions.
-def get_db() -> Generator[Session, None, None]:
+def get_db(request: Request) -> Generator[Session, None, None]:
     """
-    FastAPI dependency to get a db sessions.
+    FastAPI dependency to get a db sessions (on the primary).
+    The session is cheap: it only checks a pooled connection out at its
+    first query, and holds it until the transaction ends (commit, rollback
+    or close). Call release_connection before awaiting anything slow.
     """
     # Creates a fresh db session
     db = SessionLocal()
+    # Lets a committed write keep the user's reads on the primary for a while
+    db.info["request"] = request
     try:
         # yields it to the route
         yield db
@@ -50,12 +145,69 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
-# As main.py create http client and store it in app state,
-# this function allows endpoints to grab that shared client
+def release_connection(db: Session) -> None:
+    """
+    Ends the session's transaction, which returns its connection to the
+    pool, before the request awaits an upstream service. Otherwise a slow
+    upstream keeps connections checked out and drains the pool.
+    Loaded objects stay usable (see expire_on_commit); anything not loaded
+    yet would check a connection out again, so load it before.
+    """
+    if db.in_transaction():
+        db.commit()
+
+
+def get_read_db(request: Request) -> Generator[Session, None, None]:
+    """
+    FastAPI dependency to get a db session for read-only endpoints.
+    It reads from a replica (round robin) when replicas are configured,
+    except for users who wrote within READ_YOUR_WRITES_SECONDS.
+    """
+    db = SessionLocal()
+    db.info["request"] = request
+    # Set by get_current_user, which the router runs before this
+    user_id = getattr(request.state, "user_id", None)
+    if replica_engines and not (
+        user_id is not None and read_your_writes.is_sticky(user_id)
+    ):
+        db.info["replica"] = next(_next_replica)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# As main.py create one http client per upstream service and store them in app state,
+# these functions allow endpoints to grab those shared clients
 # to make requests to otehr microservices.
-async def get_http_client(request: Request) -> httpx.AsyncClient:
-    """Dependency to get the shared httpx.AsyncClient instance."""
-    return request.state.http_client
+async def get_user_client(request: Request) -> httpx.AsyncClient:
+    """Dependency to get the shared client of the User Service."""
+    return request.state.user_client
+
+
+async def get_drive_client(request: Request) -> httpx.AsyncClient:
+    """Dependency to get the shared client of the Drive Service."""
+    return request.state.drive_client
+
+
+async def get_notification_publisher(request: Request) -> "NotificationPublisher":
+    """Dependency to get the app's notification publisher (gateway client inside)."""
+    return request.state.notification_publisher
+
+
+async def get_event_broker(request: Request) -> EventBroker:
+    """Dependency to get the app's event broker (feeds the SSE streams)."""
+    return request.state.event_broker
+
+
+async def get_read_receipts(request: Request) -> "ReadReceiptBuffer":
+    """Dependency to get the app's buffer of read receipts."""
+    return request.state.read_receipts
+
+
+# Set once the tables exist. Workers forked from a gunicorn master that
+# already created them inherit it, instead of racing each other to do it.
+_tables_created = False
 
 
 def create_db_and_tables():
@@ -64,5 +216,9 @@ def create_db_and_tables():
     If using Albemic migration in production, remove this.
     For local dev, this ensure tables are created in MySQL
     """
+    global _tables_created
+    if _tables_created:
+        return
     logger.info("Ensure MySQL db exists...")
     Base.metadata.create_all(bind=engine)
+    _tables_created = True
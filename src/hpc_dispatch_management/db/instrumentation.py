@@ -0,0 +1,294 @@
+import itertools
+import re
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from prometheus_client import Counter as MetricCounter
+from prometheus_client import Histogram
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import REGISTRY, Collector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.pool import QueuePool
+
+# region Metrics
+
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the SQLAlchemy pool.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+
+DB_COMPILED_CACHE = MetricCounter(
+    "db_compiled_cache_total",
+    "Statements executed, by outcome of the lookup in SQLAlchemy's compiled cache.",
+    ["result"],
+)
+
+# endregion
+
+# region Per-request query stats
+
+
+# A parenthesised list of bind placeholders / literals, e.g. "(%s, %s, %s)"
+# as rendered by an expanding IN. Collapsed so that IN lists of different
+# lengths share one fingerprint.
+_PLACEHOLDER_LIST = re.compile(
+    r"\(\s*(?:%s|\?|%\(\w+\)s|:\w+|'[^']*'|\d+)"
+    r"(?:\s*,\s*(?:%s|\?|%\(\w+\)s|:\w+|'[^']*'|\d+))*\s*\)"
+)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Normalizes a SQL statement so that statements differing only in their
+    parameters (literal values, IN list length) compare equal.
+    """
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    statement = _PLACEHOLDER_LIST.sub("(?)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+@dataclass
+class QueryStats:
+    """
+    Counters for the SQL statements run while serving one request.
+    """
+
+    count: int = 0
+    duration: float = 0.0
+    # Raw statement -> times executed. Statements come from SQLAlchemy's
+    # compiled cache, so this is a cheap dict increment per query; the
+    # normalization only happens when repeated_statements() is called.
+    statements: Counter[str] = field(default_factory=Counter)
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated_statements(self, threshold: int) -> dict[str, int]:
+        """
+        Returns the statement fingerprints executed at least `threshold`
+        times, the usual signature of an N+1 query pattern.
+        """
+        fingerprints: Counter[str] = Counter()
+        for statement, times in self.statements.items():
+            fingerprints[fingerprint(statement)] += times
+        return {fp: times for fp, times in fingerprints.items() if times >= threshold}
+
+
+# Holds the QueryStats of the request being served.
+# ContextVars are copied into the threadpool used for sync dependencies
+# (like get_db), and since we share the same mutable object, every
+# statement is counted against the right request.
+_current_stats: ContextVar[QueryStats | None] = ContextVar(
+    "current_query_stats", default=None
+)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Counts every SQL statement executed inside the `with` block.
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+# Listening on the Engine class (not an instance) covers every engine
+# created by the app, including the ones used by the test suite.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+
+    start_times = conn.info.get("query_start_time")
+    duration = time.perf_counter() - start_times.pop() if start_times else 0.0
+    stats.record(statement, duration)
+
+
+# endregion
+
+# region Compiled Cache
+
+_CACHE_HITS = DB_COMPILED_CACHE.labels("hit")
+_CACHE_MISSES = DB_COMPILED_CACHE.labels("miss")
+# Raw SQL (text(), exec_driver_sql) has no cache key, it is never compiled
+_CACHE_UNUSED = DB_COMPILED_CACHE.labels("uncached")
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _count_compiled_cache(conn, cursor, statement, parameters, context, executemany):
+    """
+    Counts hits and misses of the compiled cache. A miss means SQLAlchemy
+    compiled the statement to SQL again, which a steady workload should
+    almost never do: see crud's pre-built statements.
+    """
+    if context.cache_hit is CACHE_HIT:
+        _CACHE_HITS.inc()
+    elif context.cache_hit is CACHE_MISS:
+        _CACHE_MISSES.inc()
+    else:
+        _CACHE_UNUSED.inc()
+
+
+# endregion
+
+# region Connection Pool
+
+
+class PoolWaitAverage:
+    """
+    Exponentially weighted average of the recent pool checkout waits, used
+    by admission control (core/admission.py) as the saturation signal.
+    It also decays with time (halving every `half_life_seconds`), so a
+    pool that stopped being used doesn't read as saturated forever.
+    Checkouts still waiting count with their wait so far: an exhausted
+    pool reads as saturated while requests queue, not only once their
+    checkouts finish (or time out). Checkouts happen in threadpool
+    threads, hence the lock.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.2,
+        half_life_seconds: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.alpha = alpha
+        self.half_life_seconds = half_life_seconds
+        self._clock = clock
+        self._value = 0.0
+        self._updated_at = clock()
+        # Token -> start time of every checkout still waiting
+        self._waits: dict[int, float] = {}
+        self._tokens = itertools.count()
+        self._lock = threading.Lock()
+
+    def _decayed(self, now: float) -> float:
+        elapsed = now - self._updated_at
+        return self._value * 0.5 ** (elapsed / self.half_life_seconds)
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            now = self._clock()
+            current = self._decayed(now)
+            self._value = current + self.alpha * (seconds - current)
+            self._updated_at = now
+
+    def start_wait(self) -> int:
+        """Registers a checkout that starts waiting, returns its token."""
+        with self._lock:
+            token = next(self._tokens)
+            self._waits[token] = self._clock()
+            return token
+
+    def end_wait(self, token: int) -> None:
+        """Records the wait of a finished (or failed) checkout."""
+        with self._lock:
+            started = self._waits.pop(token)
+        self.observe(self._clock() - started)
+
+    @property
+    def waiting(self) -> int:
+        """Checkouts still waiting for a connection."""
+        return len(self._waits)
+
+    def value(self) -> float:
+        with self._lock:
+            now = self._clock()
+            current = self._decayed(now)
+            if self._waits:
+                current = max(current, now - min(self._waits.values()))
+            return current
+
+
+# Shared by every instrumented pool (primary and replicas)
+POOL_WAIT_AVERAGE = PoolWaitAverage()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a connection.
+    This is the number that explodes first when the pool is exhausted.
+    """
+
+    wait_average: PoolWaitAverage = POOL_WAIT_AVERAGE
+
+    def _do_get(self):
+        start = time.perf_counter()
+        token = self.wait_average.start_wait()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_average.end_wait(token)
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+
+class PoolCollector(Collector):
+    """
+    Reports the pool state at scrape time, so nothing runs on the hot path.
+    """
+
+    def __init__(self, engines: dict[str, Engine]):
+        self._engines = engines
+
+    def collect(self):
+        checked_out = GaugeMetricFamily(
+            "db_pool_checked_out",
+            "Connections currently checked out of the pool.",
+            labels=["engine"],
+        )
+        overflow = GaugeMetricFamily(
+            "db_pool_overflow",
+            "Connections currently open beyond pool_size.",
+            labels=["engine"],
+        )
+        size = GaugeMetricFamily(
+            "db_pool_size", "Configured pool_size.", labels=["engine"]
+        )
+
+        for name, engine in self._engines.items():
+            pool = engine.pool
+            # Only QueuePool exposes these counters (sqlite memory pools don't)
+            if not isinstance(pool, QueuePool):
+                continue
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], max(pool.overflow(), 0))
+            size.add_metric([name], pool.size())
+
+        yield checked_out
+        yield overflow
+        yield size
+
+
+def register_pool_metrics(engines: dict[str, Engine]) -> None:
+    """
+    Exposes the state of the given pools on /metrics.
+    """
+    REGISTRY.register(PoolCollector(engines))
+
+
+# endregion
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Any, ClassVar
 
 from sqlalchemy import (
     DateTime,
@@ -14,7 +15,7 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from sqlalchemy.sql.schema import UniqueConstraint
 
-from ..schemas import DispatchStatus, UserType
+from ..schemas import ChangeEntity, ChangeOperation, DispatchStatus, UserType
 from .database import Base
 
 
@@ -72,14 +73,25 @@ class Dispatch(Base):
         DateTime(timezone=True), onupdate=func.now(), server_onupdate=func.now()
     )
 
+    # Optimistic concurrency: every ORM UPDATE bumps it and checks the
+    # previous value in its WHERE clause, so a concurrent edit makes the
+    # second commit fail (StaleDataError) instead of overwriting the first.
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+
     author_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="RESTRICT"))
-    author: Mapped["User"] = relationship(back_populates="dispatches", lazy="selectin")
+    # No default eager loading here: each query in crud.py decides whether it
+    # needs the author (joinedload) or not (sparse list views).
+    author: Mapped["User"] = relationship(back_populates="dispatches")
 
     # Relationship: A dispatch can be assigned to many users
+    # Deleting a dispatch deletes its assignments (the FK is ON DELETE CASCADE
+    # too), instead of the ORM trying to set their dispatch_id to NULL
     assignments: Mapped[list["DispatchAssignment"]] = relationship(
-        back_populates="dispatch"
+        back_populates="dispatch", cascade="all, delete-orphan", passive_deletes=True
     )
 
+    __mapper_args__: ClassVar[dict[str, Any]] = {"version_id_col": version}
+
 
 class DispatchAssignment(Base):
     """
@@ -109,5 +121,69 @@ class DispatchAssignment(Base):
         DateTime(timezone=True), server_default=func.now()
     )
 
+    # When the assignee first opened the dispatch (written behind, see
+    # db/read_receipts.py). Not a change of the dispatch: no version bump.
+    seen_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
     dispatch: Mapped["Dispatch"] = relationship(back_populates="assignments")
     assignee: Mapped["User"] = relationship(back_populates="assigned_dispatches")
+
+
+class DispatchChange(Base):
+    """
+    Append-only log of every write to dispatches and their assignments.
+    The `id` is the change sequence, taken from ChangeSequence in the same
+    transaction as the write: clients hold the last one they saw as a sync
+    token and ask for everything after it.
+    """
+
+    __tablename__: str = "dispatch_changes"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+
+    # No foreign key: the tombstone of a deleted dispatch outlives it
+    dispatch_id: Mapped[int] = mapped_column(Integer, index=True)
+
+    entity: Mapped[ChangeEntity] = mapped_column(
+        SAEnum(ChangeEntity, native_enum=False, length=20)
+    )
+    entity_id: Mapped[int] = mapped_column(Integer)
+    operation: Mapped[ChangeOperation] = mapped_column(
+        SAEnum(ChangeOperation, native_enum=False, length=20)
+    )
+
+    # Who a tombstone is for: a deleted dispatch gets one per author and
+    # assignee. NULL on upserts, which go to whoever can see the dispatch.
+    user_id: Mapped[int | None] = mapped_column(Integer, index=True)
+
+    changed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+
+class ChangeSequence(Base):
+    """
+    Single row holding the last id handed out to the change log.
+    Writers increment it in their own transaction, so the row stays locked
+    until they commit: changes commit in the order of their ids, and a
+    reader never sees a change without the ones before it.
+    """
+
+    __tablename__: str = "change_sequence"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    last_value: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class SerialCounter(Base):
+    """
+    Last serial number handed out per (prefix, year), e.g. ("QD", 2026).
+    Incremented atomically by crud.SerialAllocator, so concurrent creators
+    never get the same number.
+    """
+
+    __tablename__: str = "serial_counters"
+
+    prefix: Mapped[str] = mapped_column(String(20), primary_key=True)
+    year: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    last_value: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
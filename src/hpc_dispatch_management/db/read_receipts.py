@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from collections.abc import Callable
+from datetime import datetime, timezone
+
+from prometheus_client import Counter
+from sqlalchemy.orm import Session
+
+from ..core.settings import settings
+from . import crud
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# region Metrics
+
+READ_RECEIPTS = Counter(
+    "read_receipts_total",
+    "Assignees opening a dispatch: buffered (recorded), merged into a buffered "
+    "view (collapsed), flushed to the database (written) or lost to a failed "
+    "flush (dropped).",
+    ["result"],
+)
+
+# endregion
+
+
+class ReadReceiptBuffer:
+    """
+    Write-behind buffer of the first time assignees open a dispatch, so
+    reading a dispatch doesn't cost an UPDATE.
+    record() only touches a dict, in which repeated views of an assignment
+    collapse into one entry (the earliest). The buffer is written with one
+    batched UPDATE every `flush_seconds`, as soon as it holds `max_entries`,
+    and on close (shutdown). Receipts of a worker killed before closing, or
+    of a flush that fails, are lost: they are only a courtesy to authors.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_seconds: float,
+        max_entries: int,
+    ):
+        self.session_factory = session_factory
+        self.flush_seconds = flush_seconds
+        self.max_entries = max_entries
+        # (dispatch_id, assignee_id) -> first view
+        self._pending: dict[tuple[int, int], datetime] = {}
+        self._full = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+
+    def record(
+        self, dispatch_id: int, assignee_id: int, seen_at: datetime | None = None
+    ) -> None:
+        """Notes that an assignee opened a dispatch (now, by default)."""
+        key = (dispatch_id, assignee_id)
+        if key in self._pending:
+            READ_RECEIPTS.labels("collapsed").inc()
+            return
+        self._pending[key] = seen_at or datetime.now(timezone.utc)
+        READ_RECEIPTS.labels("recorded").inc()
+        if len(self._pending) >= self.max_entries:
+            self._full.set()
+
+    async def start(self) -> None:
+        self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_seconds)
+            except TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Writes the buffered receipts, in a thread (crud is synchronous)."""
+        # Swapped before writing, so views arriving meanwhile fill a new buffer
+        receipts, self._pending = self._pending, {}
+        self._full.clear()
+        if not receipts:
+            return
+
+        try:
+            await asyncio.to_thread(self._write, receipts)
+        except Exception as e:
+            READ_RECEIPTS.labels("dropped").inc(len(receipts))
+            logger.error(f"Could not write {len(receipts)} read receipts: {e}")
+            return
+        READ_RECEIPTS.labels("written").inc(len(receipts))
+
+    def _write(self, receipts: dict[tuple[int, int], datetime]) -> None:
+        with self.session_factory() as db:
+            crud.mark_assignments_seen(db, receipts)
+
+
+def create_read_receipt_buffer() -> ReadReceiptBuffer:
+    """The app's read receipt buffer, as configured in settings."""
+    return ReadReceiptBuffer(
+        SessionLocal,
+        flush_seconds=settings.READ_RECEIPTS_FLUSH_SECONDS,
+        max_entries=settings.READ_RECEIPTS_MAX_BUFFERED,
+    )
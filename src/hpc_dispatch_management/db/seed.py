@@ -1,64 +1,332 @@
-from datetime import datetime, timezone
+"""
+Synthetic data generator for the dispatch database.
 
-from .database import SessionLocal
-from .models import Dispatch, DispatchStatus, User
+Produces users, departments, dispatches and assignments with realistic
+distributions (a few very active authors, Vietnamese titles, mostly
+finished dispatches), deterministic for a given --seed.
 
+    python -m hpc_dispatch_management.db.seed --users 2000 --dispatches 5000000
 
-def run_seeder():
-    db = SessionLocal()
+Rows are inserted in batches through executemany, which PyMySQL rewrites
+into multi-row `INSERT ... VALUES (...), (...)` statements. Every dispatch
+gets its change log row too, so delta sync sees the seeded data.
+"""
 
-    try:
+import argparse
+import random
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Connection, Engine, func, insert, select
+from sqlalchemy.orm import Session
+
+from ..schemas import ChangeEntity, ChangeOperation, DispatchStatus, UserType
+from . import crud
+from .database import Base, engine
+from .models import Dispatch, DispatchAssignment, DispatchChange, User
+
+# region Distributions
+
+# Weighted so that most dispatches are finished, like in production
+STATUS_WEIGHTS = {
+    DispatchStatus.APPROVED: 45,
+    DispatchStatus.REJECTED: 8,
+    DispatchStatus.PENDING: 20,
+    DispatchStatus.IN_PROGRESS: 12,
+    DispatchStatus.DRAFT: 15,
+}
+
+# Kind of document -> serial number prefix
+TITLE_KINDS = {
+    "Quyết định": "QD",
+    "Kế hoạch": "KH",
+    "Thông báo": "TB",
+    "Công văn": "CV",
+    "Biên bản": "BB",
+    "Tờ trình": "TTr",
+}
+TITLE_SUBJECTS = [
+    "tổ chức thi kết thúc học phần",
+    "nghỉ lễ 30/4 và 1/5",
+    "phân công giảng dạy học kỳ",
+    "bảo vệ đồ án tốt nghiệp",
+    "kiểm định chất lượng chương trình đào tạo",
+    "tuyển sinh đại học chính quy",
+    "họp hội đồng khoa học",
+    "mua sắm thiết bị phòng thực hành",
+    "sinh hoạt chuyên môn bộ môn",
+    "cập nhật đề cương chi tiết học phần",
+    "khen thưởng sinh viên xuất sắc",
+    "bồi dưỡng nghiệp vụ sư phạm",
+]
+TITLE_SCOPES = [
+    "năm học 2025-2026",
+    "học kỳ 1",
+    "học kỳ 2",
+    "toàn khoa",
+    "khoa Công nghệ thông tin",
+    "bộ môn Hệ thống thông tin",
+    "bộ môn Khoa học máy tính",
+]
+
+FAMILY_NAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Đặng"]
+MIDDLE_NAMES = ["Văn", "Thị", "Minh", "Thanh", "Quốc", "Ngọc", "Hữu", "Đức"]
+GIVEN_NAMES = ["An", "Bình", "Châu", "Dũng", "Giang", "Hà", "Hùng", "Lan", "Long"]
+
+ACTIONS = [
+    "Vui lòng xem xét và phê duyệt.",
+    "Đề nghị cho ý kiến trước thứ Sáu.",
+    "Nắm thông tin và triển khai.",
+    None,
+]
+
+# endregion
+
+
+def _batched(rows: Iterator[dict], size: int) -> Iterator[list[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert_batches(conn: Connection, model, rows: Iterator[dict], size: int) -> int:
+    """Inserts rows in batches of `size`. Returns the row count."""
+    total = 0
+    for batch in _batched(rows, size):
+        conn.execute(insert(model), batch)
+        total += len(batch)
+    return total
+
+
+def _next_id(conn: Connection, model) -> int:
+    """First free primary key, so the generator can append to existing data."""
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def generate_users(
+    rng: random.Random, first_id: int, count: int, departments: int
+) -> Iterator[dict]:
+    """Lecturers spread over departments; a few of them are admins."""
+    for offset in range(count):
+        user_id = first_id + offset
+        full_name = " ".join(
+            [
+                rng.choice(FAMILY_NAMES),
+                rng.choice(MIDDLE_NAMES),
+                rng.choice(GIVEN_NAMES),
+            ]
+        )
+        yield {
+            "id": user_id,
+            "username": f"gv{user_id:07d}",
+            "email": f"gv{user_id:07d}@hpc.edu.vn",
+            "full_name": full_name,
+            "user_type": UserType.LECTURER,
+            "department_id": rng.randint(1, departments),
+            "is_admin": rng.random() < 0.01,
+        }
+
+
+def generate_dispatches(
+    rng: random.Random,
+    first_id: int,
+    count: int,
+    author_ids: list[int],
+    author_weights: list[float],
+    start: datetime,
+    days: int,
+) -> Iterator[dict]:
+    """Dispatches with skewed authors, Vietnamese titles and mixed statuses."""
+    statuses, status_weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+    kinds = list(TITLE_KINDS.items())
+    # With cum_weights, each weighted draw is a bisect (O(log n)) instead of
+    # re-summing every author's weight for every dispatch.
+    cum_weights = []
+    running = 0.0
+    for weight in author_weights:
+        running += weight
+        cum_weights.append(running)
+
+    for offset in range(count):
+        dispatch_id = first_id + offset
+        created_at = start + timedelta(seconds=rng.randrange(days * 86400))
+        kind, prefix = rng.choice(kinds)
+        title = (
+            f"{kind} về việc {rng.choice(TITLE_SUBJECTS)} {rng.choice(TITLE_SCOPES)}"
+        )
+        yield {
+            "id": dispatch_id,
+            # The id keeps serial numbers unique across any volume
+            "serial_number": f"{prefix}-{dispatch_id:07d}/{created_at.year}",
+            "title": title,
+            "description": f"{title}. " * rng.randint(1, 6),
+            "file_url": None,
+            "status": rng.choices(statuses, status_weights)[0],
+            "author_id": rng.choices(author_ids, cum_weights=cum_weights)[0],
+            "created_at": created_at,
+            "updated_at": created_at + timedelta(hours=rng.randint(0, 240)),
+        }
+
+
+def generate_assignments(
+    rng: random.Random, dispatches: list[dict], user_ids: list[int], max_per: int
+) -> Iterator[dict]:
+    """1..max_per distinct assignees for every dispatch that was sent."""
+    for dispatch in dispatches:
+        if dispatch["status"] == DispatchStatus.DRAFT:
+            continue
+        how_many = rng.randint(1, max_per)
+        assignees = rng.sample(user_ids, k=min(how_many, len(user_ids)))
+        reviewed = dispatch["status"] in (
+            DispatchStatus.APPROVED,
+            DispatchStatus.REJECTED,
+        )
+        for assignee_id in assignees:
+            if assignee_id == dispatch["author_id"]:
+                continue
+            yield {
+                "dispatch_id": dispatch["id"],
+                "assignee_id": assignee_id,
+                "action_required": rng.choice(ACTIONS),
+                "review_comment": "Đã xem, đồng ý." if reviewed else None,
+                "assigned_at": dispatch["created_at"]
+                + timedelta(minutes=rng.randint(1, 600)),
+            }
+
+
+def generate_changes(dispatches: list[dict], last_id: int) -> Iterator[dict]:
+    """One upsert per dispatch, with change ids ending at `last_id`."""
+    first_id = last_id - len(dispatches) + 1
+    for change_id, dispatch in enumerate(dispatches, first_id):
+        yield {
+            "id": change_id,
+            "dispatch_id": dispatch["id"],
+            "entity": ChangeEntity.DISPATCH,
+            "entity_id": dispatch["id"],
+            "operation": ChangeOperation.UPSERT,
+            "changed_at": dispatch["updated_at"],
+        }
+
+
+def run_seeder(
+    users: int = 200,
+    departments: int = 12,
+    dispatches: int = 10_000,
+    max_assignees: int = 4,
+    author_skew: float = 1.1,
+    seed: int = 42,
+    batch_size: int = 5_000,
+    years: int = 3,
+    end_year: int = 2026,
+    db_engine: Engine = engine,
+):
+    """
+    Appends synthetic data to the database configured in DATABASE_URL
+    (or `db_engine`).
+    The same arguments on the same starting database give the same rows.
+    """
+    rng = random.Random(seed)
+    start = datetime(end_year - years + 1, 1, 1, tzinfo=timezone.utc)
+    started = time.perf_counter()
+
+    # No-op when the tables already exist (e.g. created by the app)
+    Base.metadata.create_all(bind=db_engine)
+    # Existing dispatches without a change, and the change sequence itself
+    with Session(db_engine) as db:
+        crud.backfill_change_log(db)
+
+    with db_engine.connect() as conn:
         print("Starting Database Seeder...")
 
-        author_id = 1
-        author = db.get(User, author_id)
-        if not author:
-            author = User(
-                id=author_id,
-                username="admin",
-                email="admin@system.com",
-                full_name="Admin System",
-                user_type="lecturer",
-                is_admin=True,
-                department_id=1,
+        first_user_id = _next_id(conn, User)
+        user_rows = list(generate_users(rng, first_user_id, users, departments))
+        _insert_batches(conn, User, iter(user_rows), batch_size)
+        conn.commit()
+        user_ids = [row["id"] for row in user_rows]
+        print(f"Inserted {len(user_ids)} users.")
+
+        # Zipf-like author activity: a handful of lecturers (heads of
+        # department, secretaries) write most of the dispatches.
+        author_weights = [1 / (rank**author_skew) for rank in range(1, users + 1)]
+        rng.shuffle(author_weights)
+
+        inserted_dispatches = inserted_assignments = 0
+        first_dispatch_id = _next_id(conn, Dispatch)
+        rows = generate_dispatches(
+            rng,
+            first_dispatch_id,
+            dispatches,
+            user_ids,
+            author_weights,
+            start,
+            years * 365,
+        )
+        # Assignments reference their dispatch, so insert them right
+        # after each dispatch batch. Its change log rows commit with it.
+        for batch in _batched(rows, batch_size):
+            conn.execute(insert(Dispatch), batch)
+            last_change_id = crud.reserve_change_ids(conn, len(batch))
+            conn.execute(
+                insert(DispatchChange), list(generate_changes(batch, last_change_id))
+            )
+            inserted_dispatches += len(batch)
+            inserted_assignments += _insert_batches(
+                conn,
+                DispatchAssignment,
+                generate_assignments(rng, batch, user_ids, max_assignees),
+                batch_size,
+            )
+            conn.commit()
+            elapsed = time.perf_counter() - started
+            print(
+                f"{inserted_dispatches}/{dispatches} dispatches, "
+                f"{inserted_assignments} assignments ({elapsed:.0f}s)"
             )
-            db.add(author)
-            db.commit()
-            print("Created dummy author.")
-
-        dispatches = [
-            Dispatch(
-                title="Quyết định nghỉ lễ 30/4",
-                serial_number="QD-001/2026",
-                description="Thông báo lịch nghỉ lễ 30/4 và 1/5 cho toàn trường.",
-                status=DispatchStatus.APPROVED,
-                author_id=author.id,
-                created_at=datetime.now(timezone.utc),
-            ),
-            Dispatch(
-                title="Kế hoạch thi học kỳ 1",
-                serial_number="KH-002/2026",
-                description="Kế hoạch tổ chức thi kết thúc học phần.",
-                status=DispatchStatus.IN_PROGRESS,
-                author_id=author.id,
-                created_at=datetime.now(timezone.utc),
-            ),
-        ]
-
-        for d in dispatches:
-            exists = db.query(Dispatch).filter_by(serial_number=d.serial_number).first()
-            if not exists:
-                db.add(d)
-
-        db.commit()
-        print("Successfully seeded dispatches!")
-
-    except Exception as e:
-        db.rollback()
-        print(f"Failed to seed database: {e}")
-    finally:
-        db.close()
+
+    print(
+        f"Successfully seeded {users} users, {inserted_dispatches} dispatches and "
+        f"{inserted_assignments} assignments in {time.perf_counter() - started:.1f}s."
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic dispatch data.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--departments", type=int, default=12)
+    parser.add_argument("--dispatches", type=int, default=10_000)
+    parser.add_argument(
+        "--max-assignees", type=int, default=4, help="Per sent dispatch"
+    )
+    parser.add_argument(
+        "--author-skew",
+        type=float,
+        default=1.1,
+        help="Zipf exponent of author activity (0 = uniform)",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    parser.add_argument("--years", type=int, default=3, help="Spread of created_at")
+    parser.add_argument("--end-year", type=int, default=2026)
+    args = parser.parse_args()
+
+    run_seeder(
+        users=args.users,
+        departments=args.departments,
+        dispatches=args.dispatches,
+        max_assignees=args.max_assignees,
+        author_skew=args.author_skew,
+        seed=args.seed,
+        batch_size=args.batch_size,
+        years=args.years,
+        end_year=args.end_year,
+    )
 
 
 if __name__ == "__main__":
-    run_seeder()
+    main()
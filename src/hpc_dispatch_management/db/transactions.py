@@ -0,0 +1,127 @@
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable
+from typing import TypeVar
+
+from prometheus_client import Counter
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from ..core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# region Metrics
+
+DB_TRANSACTION_RETRIES = Counter(
+    "db_transaction_retries_total",
+    "Transactions run again after a transient MySQL error.",
+    ["reason"],
+)
+
+DB_TRANSACTION_RETRIES_EXHAUSTED = Counter(
+    "db_transaction_retries_exhausted_total",
+    "Transient MySQL errors passed on to the caller instead of being retried.",
+    ["reason", "limit"],
+)
+
+# endregion
+
+# MySQL error codes worth running the whole transaction again for: InnoDB
+# rolled it back (deadlock), or gave up waiting for a row lock.
+TRANSIENT_MYSQL_ERRORS = {1213: "deadlock", 1205: "lock_wait_timeout"}
+
+
+def transient_reason(error: DBAPIError) -> str | None:
+    """Why a database error is worth a retry, None if it isn't."""
+    args = getattr(error.orig, "args", ())
+    return TRANSIENT_MYSQL_ERRORS.get(args[0]) if args else None
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of the transactions run, so a lock storm
+    doesn't turn into a retry storm: every transaction deposits `ratio`
+    of a retry (up to `reserve`), every retry withdraws a whole one.
+    """
+
+    def __init__(self, ratio: float, reserve: float):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._balance = reserve
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._balance = min(self.reserve, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Takes one retry out of the budget, False if it is spent."""
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+retry_budget = RetryBudget(
+    ratio=settings.DB_RETRY_BUDGET_RATIO, reserve=settings.DB_RETRY_BUDGET_RESERVE
+)
+
+
+def _backoff_seconds(retry: int) -> float:
+    """Full jitter: random up to an exponentially growing, capped delay."""
+    ceiling = min(
+        settings.DB_RETRY_MAX_BACKOFF_MS, settings.DB_RETRY_BACKOFF_MS * 2**retry
+    )
+    return random.uniform(0, ceiling) / 1000
+
+
+def transactional(
+    db: Session,
+    work: Callable[[], T],
+    attempts: int | None = None,
+    budget: RetryBudget = retry_budget,
+) -> T:
+    """
+    Runs `work` and commits, as one transaction. If MySQL reports a
+    deadlock or a lock wait timeout, the transaction is rolled back and
+    `work` runs again from the start, after a short jittered pause, up to
+    `attempts` times in all (DB_RETRY_ATTEMPTS by default).
+    `work` must therefore redo all of its reads: after the rollback, the
+    objects it saw are expired and reload on access. Any other error rolls
+    back and propagates.
+    The pause blocks the calling thread, like the queries around it (crud
+    is synchronous): async endpoints call retried crud functions through
+    run_in_threadpool, so the event loop keeps serving other requests.
+    """
+    attempts = attempts or settings.DB_RETRY_ATTEMPTS
+    budget.deposit()
+    retry = 0
+    while True:
+        try:
+            result = work()
+            db.commit()
+            return result
+        except DBAPIError as e:
+            db.rollback()
+            reason = transient_reason(e)
+            if reason is None:
+                raise
+            if retry + 1 >= attempts:
+                DB_TRANSACTION_RETRIES_EXHAUSTED.labels(reason, "attempts").inc()
+                raise
+            if not budget.withdraw():
+                DB_TRANSACTION_RETRIES_EXHAUSTED.labels(reason, "budget").inc()
+                raise
+            DB_TRANSACTION_RETRIES.labels(reason).inc()
+            logger.warning(f"Transaction failed with a {reason}, retrying: {e.orig}")
+            time.sleep(_backoff_seconds(retry))
+            retry += 1
+        except BaseException:
+            db.rollback()
+            raise
@@ -0,0 +1,178 @@
+import logging
+import time
+from collections import deque
+from collections.abc import Callable
+from enum import Enum
+
+import httpx
+from prometheus_client import Counter, Gauge
+
+from ..core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# region Metrics
+
+CIRCUIT_STATE = Gauge(
+    "upstream_circuit_state",
+    "Circuit breaker state per upstream: 0 closed, 1 half-open, 2 open.",
+    ["service"],
+)
+
+CIRCUIT_REJECTED = Counter(
+    "upstream_circuit_rejected_total",
+    "Calls failed fast because the upstream's circuit was open.",
+    ["service"],
+)
+
+# endregion
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+
+_STATE_VALUES = {
+    CircuitState.CLOSED: 0,
+    CircuitState.HALF_OPEN: 1,
+    CircuitState.OPEN: 2,
+}
+
+
+class CircuitOpenError(httpx.TransportError):
+    """
+    Raised instead of calling an upstream whose circuit is open.
+    It is an httpx.TransportError, so existing `except httpx.RequestError`
+    handlers treat it like any other unreachable upstream.
+    """
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker for one upstream service.
+    - CLOSED: calls go through; outcomes are kept for `window_seconds`.
+      Once at least `minimum_calls` were made and the failure rate reaches
+      `failure_rate_threshold`, the circuit opens.
+    - OPEN: calls fail immediately with CircuitOpenError for `open_seconds`.
+    - HALF_OPEN: up to `half_open_max_calls` probe calls go through. A
+      successful probe closes the circuit, a failed one opens it again.
+    The app runs on a single event loop, so no locking is needed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float,
+        minimum_calls: int,
+        window_seconds: float,
+        open_seconds: float,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        # (timestamp, succeeded) of the calls made in the current window
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._failures = 0
+        CIRCUIT_STATE.labels(name).set(_STATE_VALUES[self._state])
+
+    @property
+    def state(self) -> CircuitState:
+        if (
+            self._state == CircuitState.OPEN
+            and self._clock() - self._opened_at >= self.open_seconds
+        ):
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    def before_call(self, request: httpx.Request | None = None) -> None:
+        """Raises CircuitOpenError if the call must not be attempted."""
+        state = self.state
+        if state == CircuitState.OPEN or (
+            state == CircuitState.HALF_OPEN
+            and self._half_open_in_flight >= self.half_open_max_calls
+        ):
+            CIRCUIT_REJECTED.labels(self.name).inc()
+            raise CircuitOpenError(
+                f"Circuit for '{self.name}' is open, failing fast", request=request
+            )
+        if state == CircuitState.HALF_OPEN:
+            self._half_open_in_flight += 1
+
+    def record_abandoned(self) -> None:
+        """The call was cancelled on our side; it says nothing about the upstream."""
+        if self._state == CircuitState.HALF_OPEN and self._half_open_in_flight > 0:
+            self._half_open_in_flight -= 1
+
+    def record_success(self) -> None:
+        if self._state == CircuitState.HALF_OPEN:
+            self._transition(CircuitState.CLOSED)
+            return
+        self._record(True)
+
+    def record_failure(self) -> None:
+        if self._state == CircuitState.HALF_OPEN:
+            self._transition(CircuitState.OPEN)
+            return
+        self._record(False)
+
+        total = len(self._outcomes)
+        if (
+            self._state == CircuitState.CLOSED
+            and total >= self.minimum_calls
+            and self._failures / total >= self.failure_rate_threshold
+        ):
+            self._transition(CircuitState.OPEN)
+
+    def _record(self, succeeded: bool) -> None:
+        now = self._clock()
+        self._outcomes.append((now, succeeded))
+        if not succeeded:
+            self._failures += 1
+
+        # Drop outcomes that left the rolling window
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            _, old_succeeded = self._outcomes.popleft()
+            if not old_succeeded:
+                self._failures -= 1
+
+    def _transition(self, state: CircuitState) -> None:
+        logger.warning(
+            f"Circuit for '{self.name}' changed from {self._state.value} to {state.value}"
+        )
+        self._state = state
+        self._half_open_in_flight = 0
+        if state == CircuitState.OPEN:
+            self._opened_at = self._clock()
+        if state == CircuitState.CLOSED:
+            self._outcomes.clear()
+            self._failures = 0
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[state])
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(service: str) -> CircuitBreaker:
+    """Returns the (process wide) circuit breaker of an upstream service."""
+    if service not in _breakers:
+        _breakers[service] = CircuitBreaker(
+            name=service,
+            failure_rate_threshold=settings.CIRCUIT_BREAKER_FAILURE_RATE,
+            minimum_calls=settings.CIRCUIT_BREAKER_MINIMUM_CALLS,
+            window_seconds=settings.CIRCUIT_BREAKER_WINDOW_SECONDS,
+            open_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+            half_open_max_calls=settings.CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+        )
+    return _breakers[service]
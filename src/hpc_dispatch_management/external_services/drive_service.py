@@ -3,7 +3,6 @@ import uuid
 
 import httpx
 
-from ..core.settings import settings
 from ..db import models
 from ..schemas import DispatchStatus
 
@@ -45,11 +44,10 @@ async def _get_or_create_folder(
     Returns the folder's item_id.
     """
     headers = _get_auth_header(token)
-    drive_url = settings.HPC_DRIVE_SERVICE_URL
 
     try:
         # 1. Check if folder exists in root
-        response = await client.get(f"{drive_url}/items", headers=headers)
+        response = await client.get("/items", headers=headers)
         response.raise_for_status()
 
         root_items = response.json().get("items", [])
@@ -72,9 +70,7 @@ async def _get_or_create_folder(
             "item_type": "FOLDER",
             "parent_id": None,
         }
-        response = await client.post(
-            f"{drive_url}/items", headers=headers, json=create_payload
-        )
+        response = await client.post("/items", headers=headers, json=create_payload)
         response.raise_for_status()
         return response.json()["item_id"]
 
@@ -93,13 +89,12 @@ async def _move_item_to_folder(
 ):
     """Moves a drive item into a specific parent folder."""
     headers = _get_auth_header(token)
-    drive_url = settings.HPC_DRIVE_SERVICE_URL
     update_payload = {"parent_id": folder_id}
 
     try:
         # HPC Drive uses PATCH for updates
         response = await client.patch(
-            f"{drive_url}/items/{item_id}", headers=headers, json=update_payload
+            f"/items/{item_id}", headers=headers, json=update_payload
         )
         response.raise_for_status()
         logger.info(f"Successfully moved item {item_id} to folder {folder_id}")
@@ -116,12 +111,11 @@ async def _share_item_with_user(
 ):
     """Shares a drive item with another user by their username."""
     headers = _get_auth_header(token)
-    drive_url = settings.HPC_DRIVE_SERVICE_URL
     share_payload = {"username": username}
 
     try:
         response = await client.post(
-            f"{drive_url}/items/{item_id}/share", headers=headers, json=share_payload
+            f"/items/{item_id}/share", headers=headers, json=share_payload
         )
         response.raise_for_status()
         logger.info(f"Successfully shared item {item_id} with user {username}")
@@ -183,12 +177,9 @@ async def trash_dispatch_file(
         return
 
     headers = _get_auth_header(token)
-    drive_url = settings.HPC_DRIVE_SERVICE_URL
 
     try:
-        response = await client.patch(
-            f"{drive_url}/items/{item_id}/trash", headers=headers
-        )
+        response = await client.patch(f"/items/{item_id}/trash", headers=headers)
         response.raise_for_status()
         logger.info(f"Successfully moved item {item_id} to trash.")
     except httpx.HTTPStatusError as e:
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import time
+
+import httpx
+from prometheus_client import Counter, Histogram
+
+from ..core.settings import settings
+from .circuit_breaker import get_breaker
+
+logger = logging.getLogger(__name__)
+
+UPSTREAMS = ("user", "drive", "notification")
+
+# Marks the startup requests that only exist to open pooled connections, so
+# they don't count towards metrics or the circuit breakers.
+WARMUP_EXTENSION = "upstream_warmup"
+
+# region Metrics
+
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "upstream_request_duration_seconds",
+    "Latency of outbound calls to other HPC microservices.",
+    ["service", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+UPSTREAM_ERRORS = Counter(
+    "upstream_errors_total",
+    "Outbound calls that failed, by kind ('network' or 'http_5xx').",
+    ["service", "kind"],
+)
+
+# endregion
+
+
+def upstream_timeout(service: str) -> httpx.Timeout:
+    """Connect/read timeouts configured for an upstream service."""
+    connect, read = {
+        "user": (
+            settings.HPC_USER_SERVICE_CONNECT_TIMEOUT,
+            settings.HPC_USER_SERVICE_READ_TIMEOUT,
+        ),
+        "drive": (
+            settings.HPC_DRIVE_SERVICE_CONNECT_TIMEOUT,
+            settings.HPC_DRIVE_SERVICE_READ_TIMEOUT,
+        ),
+        "notification": (
+            settings.NOTIFICATION_SERVICE_CONNECT_TIMEOUT,
+            settings.NOTIFICATION_SERVICE_READ_TIMEOUT,
+        ),
+    }.get(service, (5.0, 5.0))
+    # Writing a request body is bounded like reading the response, and
+    # waiting for a free pooled connection like opening a new one.
+    return httpx.Timeout(connect=connect, read=read, write=read, pool=connect)
+
+
+def upstream_base_url(service: str) -> str:
+    """Base URL of an upstream service, as configured."""
+    return {
+        "user": str(settings.HPC_USER_SERVICE_URL),
+        "drive": str(settings.HPC_DRIVE_SERVICE_URL),
+        "notification": str(settings.NOTIFICATION_SERVICE_URL),
+    }[service]
+
+
+def upstream_limits(service: str) -> httpx.Limits:
+    """Connection pool limits configured for an upstream service."""
+    max_connections = {
+        "user": settings.HPC_USER_SERVICE_MAX_CONNECTIONS,
+        "drive": settings.HPC_DRIVE_SERVICE_MAX_CONNECTIONS,
+        "notification": settings.NOTIFICATION_SERVICE_MAX_CONNECTIONS,
+    }[service]
+    max_keepalive = settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS or max_connections
+    # Idle connections are still closed after UPSTREAM_KEEPALIVE_EXPIRY
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=min(max_keepalive, max_connections),
+        keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+
+
+def create_upstream_client(service: str) -> httpx.AsyncClient:
+    """
+    Long-lived client for one upstream service: its own connection pool
+    (kept alive between requests), timeouts, circuit breaker and metrics.
+    Service functions call it with paths relative to the service's base URL.
+    """
+    limits = upstream_limits(service)
+    # The client's limits/http2 only apply to its default transport,
+    # so they are set on the wrapped transport instead.
+    pool = httpx.AsyncHTTPTransport(limits=limits, http2=settings.UPSTREAM_HTTP2)
+    return httpx.AsyncClient(
+        base_url=upstream_base_url(service),
+        timeout=upstream_timeout(service),
+        transport=UpstreamTransport(service, transport=pool),
+    )
+
+
+async def warm_up_client(client: httpx.AsyncClient, connections: int) -> None:
+    """
+    Opens `connections` pooled connections before the first real request,
+    so it doesn't pay for the TCP (and TLS) handshake. The requests are sent
+    concurrently, otherwise they would all reuse the same connection.
+    Any answer, even a 401/404, leaves an open connection behind; failures
+    are only logged, the service may simply not be up yet.
+    """
+
+    async def _open_one():
+        await client.head("", extensions={WARMUP_EXTENSION: True})
+
+    results = await asyncio.gather(
+        *(_open_one() for _ in range(connections)), return_exceptions=True
+    )
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        logger.warning(
+            f"Could not pre-open connections to {client.base_url}: {failures[0]!r}"
+        )
+
+
+async def create_upstream_clients() -> dict[str, httpx.AsyncClient]:
+    """Creates (and warms up) one client per upstream service."""
+    clients = {service: create_upstream_client(service) for service in UPSTREAMS}
+    if settings.UPSTREAM_WARMUP_CONNECTIONS > 0:
+        await asyncio.gather(
+            *(
+                warm_up_client(client, settings.UPSTREAM_WARMUP_CONNECTIONS)
+                for client in clients.values()
+            )
+        )
+    return clients
+
+
+def upstream_name_for_url(url: str) -> str:
+    """
+    Maps an outbound URL to the name of the microservice it belongs to,
+    so metrics stay labelled by service instead of by (unbounded) URL.
+    """
+    upstreams = {
+        "user": str(settings.HPC_USER_SERVICE_URL),
+        "drive": str(settings.HPC_DRIVE_SERVICE_URL),
+        "notification": str(settings.NOTIFICATION_SERVICE_URL),
+    }
+
+    # Longest prefix wins, in case services share a gateway host
+    best_match, best_length = "other", 0
+    for name, base_url in upstreams.items():
+        base_url = base_url.rstrip("/")
+        if url.startswith(base_url) and len(base_url) > best_length:
+            best_match, best_length = name, len(base_url)
+    return best_match
+
+
+class UpstreamTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps the real httpx transport for every outbound call, without touching
+    the service functions themselves:
+    - applies the upstream's connect/read timeouts,
+    - fails fast through the upstream's circuit breaker,
+    - records latency and errors.
+    service=None resolves the service from the request URL (shared client).
+    """
+
+    def __init__(
+        self,
+        service: str | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self._service = service
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.extensions.get(WARMUP_EXTENSION):
+            return await self._transport.handle_async_request(request)
+
+        service = self._service or upstream_name_for_url(str(request.url))
+        breaker = get_breaker(service)
+
+        # Raises CircuitOpenError (an httpx.TransportError) when open
+        breaker.before_call(request)
+        request.extensions["timeout"] = upstream_timeout(service).as_dict()
+        start = time.perf_counter()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except asyncio.CancelledError:
+            breaker.record_abandoned()
+            raise
+        except Exception:
+            breaker.record_failure()
+            UPSTREAM_ERRORS.labels(service, "network").inc()
+            UPSTREAM_REQUEST_DURATION.labels(service, request.method, "error").observe(
+                time.perf_counter() - start
+            )
+            raise
+
+        UPSTREAM_REQUEST_DURATION.labels(
+            service, request.method, str(response.status_code)
+        ).observe(time.perf_counter() - start)
+        if response.status_code >= 500:
+            breaker.record_failure()
+            UPSTREAM_ERRORS.labels(service, "http_5xx").inc()
+        else:
+            breaker.record_success()
+
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
@@ -1,7 +1,13 @@
+import asyncio
+import json
 import logging
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 
 import httpx
+from prometheus_client import Counter
 from pydantic import HttpUrl
 
 from .. import schemas
@@ -12,21 +18,34 @@ from ..db import models
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+NEW_DISPATCH_TOPIC = "official.dispatch"
+STATUS_UPDATE_TOPIC = "official.dispatch.status.update"
+DIGEST_TOPIC = "official.dispatch.digest"
+
+NOTIFICATIONS_COALESCED = Counter(
+    "notifications_coalesced_total",
+    "Notifications not sent on their own: merged status updates or digested notices.",
+    ["kind"],
+)
+
 
 async def send_new_dispatch_notification(
     dispatch: models.Dispatch,
     assigner: models.User,
     assignee: models.User,
     action_required: str,
+    publisher: "NotificationPublisher",
 ):
     """Prepares and sends a notification for a newly assigned dispatch."""
     payload = schemas.KafkaNewDispatchPayload(
         user_id=assignee.id,
         user_type=assignee.user_type,
         document_title=dispatch.title,
-        document_url=HttpUrl(str(dispatch.file_url))
-        if dispatch.file_url
-        else HttpUrl("http://hpc-system.com/dispatch-not-found"),
+        document_url=(
+            HttpUrl(str(dispatch.file_url))
+            if dispatch.file_url
+            else HttpUrl("http://hpc-system.com/dispatch-not-found")
+        ),
         document_serial_number=dispatch.serial_number,
         assigner_name=assigner.full_name,
         assignee_name=assignee.full_name,
@@ -37,12 +56,12 @@ async def send_new_dispatch_notification(
     )
 
     message = schemas.KafkaMessage(
-        topic="official.dispatch",
+        topic=NEW_DISPATCH_TOPIC,
         payload=payload,
         key=f"dispatch_new_{dispatch.serial_number}_{assignee.id}",
     )
 
-    await _publish_to_kafka_gateway(message)
+    await publisher.publish(message)
 
 
 async def send_status_update_notification(
@@ -50,6 +69,7 @@ async def send_status_update_notification(
     reviewer: models.User,
     status: schemas.DispatchStatus,
     comment: str | None,
+    publisher: "NotificationPublisher",
 ):
     """Prepares and sends a notification for a dispatch status update."""
     author = dispatch.author
@@ -63,34 +83,299 @@ async def send_status_update_notification(
         reviewer_name=reviewer.full_name,
         status=status.value,  # Send the Vietnamese string value
         review_comment=comment,
-        document_url=HttpUrl(str(dispatch.file_url))
-        if dispatch.file_url
-        else HttpUrl("http://hpc-system.com/dispatch-not-found"),
+        document_url=(
+            HttpUrl(str(dispatch.file_url))
+            if dispatch.file_url
+            else HttpUrl("http://hpc-system.com/dispatch-not-found")
+        ),
         year=str(dispatch.created_at.year),
     )
 
     message = schemas.KafkaMessage(
-        topic="official.dispatch.status.update",
+        topic=STATUS_UPDATE_TOPIC,
         payload=payload,
         key=f"dispatch_status_{dispatch.serial_number}",
     )
 
-    await _publish_to_kafka_gateway(message)
+    await publisher.publish(message)
 
 
-async def _publish_to_kafka_gateway(message: schemas.KafkaMessage):
+async def _publish_to_kafka_gateway(
+    message: schemas.KafkaMessage, client: httpx.AsyncClient
+):
     """Sends the formatted message to the notification gateway service."""
+    # The gateway URL is the publish endpoint itself, not a base for paths
     url = str(settings.NOTIFICATION_SERVICE_URL)
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=message.model_dump(mode="json"))
-            _ = response.raise_for_status()
-            logger.info(
-                f"Successfully published message with key '{message.key}' to topic '{message.topic}'."
-            )
+        response = await client.post(url, json=message.model_dump(mode="json"))
+        _ = response.raise_for_status()
+        logger.info(
+            f"Successfully published message with key '{message.key}' to topic '{message.topic}'."
+        )
     except httpx.RequestError as e:
         logger.error(
             f"Failed to publish message to notification service at {url}. Error: {e}"
         )
     except Exception as e:
         logger.error(f"An unexpected error occurred while publishing message: {e}")
+
+
+# region Publishers
+
+
+class NotificationPublisher(ABC):
+    """
+    Where notifications go. Endpoints get the app's publisher through the
+    get_notification_publisher dependency; start/close run in the lifespan.
+    Subclasses must implement `publish`, or they can't be instantiated.
+    """
+
+    @abstractmethod
+    async def publish(self, message: schemas.KafkaMessage) -> None: ...
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class GatewayPublisher(NotificationPublisher):
+    """Posts every message to the notification gateway right away."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+
+    async def publish(self, message: schemas.KafkaMessage) -> None:
+        await _publish_to_kafka_gateway(message, self.client)
+
+
+class KafkaPublisher(NotificationPublisher):
+    """
+    Produces messages straight to Kafka, without the gateway's HTTP hop.
+    The producer batches records (linger + size limit) and compresses each
+    batch. `publish` only queues the record, the send result is checked when
+    the batch is acknowledged. Records are partitioned by KafkaMessage.key,
+    so the notifications of one dispatch keep their order.
+    """
+
+    def __init__(self, producer):
+        self.producer = producer
+
+    async def start(self) -> None:
+        await self.producer.start()
+
+    async def close(self) -> None:
+        # Sends what is still lingering before disconnecting
+        await self.producer.stop()
+
+    async def publish(self, message: schemas.KafkaMessage) -> None:
+        try:
+            delivery = await self.producer.send(
+                message.topic,
+                value=message.payload.model_dump(mode="json"),
+                key=message.key,
+                headers=[("priority", message.priority.encode())],
+            )
+        except Exception as e:
+            logger.error(f"Failed to queue message '{message.key}' for Kafka: {e}")
+            return
+        delivery.add_done_callback(
+            lambda future: _log_delivery(future, message.key, message.topic)
+        )
+
+
+def _log_delivery(future: asyncio.Future, key: str, topic: str) -> None:
+    if future.cancelled():
+        logger.error(f"Delivery of message '{key}' to '{topic}' was cancelled.")
+    elif future.exception() is not None:
+        logger.error(
+            f"Failed to produce message '{key}' to '{topic}': {future.exception()}"
+        )
+    else:
+        logger.info(f"Successfully produced message with key '{key}' to '{topic}'.")
+
+
+def _create_kafka_producer():
+    """aiokafka producer configured from settings."""
+    try:
+        from aiokafka import AIOKafkaProducer
+    except ImportError as e:
+        raise RuntimeError(
+            "NOTIFICATION_TRANSPORT=kafka needs the aiokafka package"
+        ) from e
+
+    compression = settings.KAFKA_COMPRESSION
+    return AIOKafkaProducer(
+        bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
+        client_id="hpc-dispatch-management",
+        linger_ms=settings.KAFKA_LINGER_MS,
+        max_batch_size=settings.KAFKA_MAX_BATCH_BYTES,
+        compression_type=None if compression == "none" else compression,
+        acks=(
+            settings.KAFKA_ACKS
+            if settings.KAFKA_ACKS == "all"
+            else int(settings.KAFKA_ACKS)
+        ),
+        key_serializer=lambda key: key.encode(),
+        value_serializer=lambda value: json.dumps(value, ensure_ascii=False).encode(),
+    )
+
+
+@dataclass
+class _RecipientBuffer:
+    """Notifications waiting for one recipient."""
+
+    opened_at: float
+    # message key -> latest status update of that dispatch
+    status_updates: dict[str, schemas.KafkaMessage] = field(default_factory=dict)
+    new_dispatches: list[schemas.KafkaMessage] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.status_updates) + len(self.new_dispatches)
+
+
+class CoalescingPublisher(NotificationPublisher):
+    """
+    Buffers notifications per recipient for up to `window_seconds` before
+    passing them to the wrapped publisher:
+    - repeated status updates of the same dispatch are merged, only the
+      latest one (the dispatch's current status) is sent,
+    - with `digest`, the buffered new-dispatch notices of a recipient are
+      sent as one digest message; otherwise they are not buffered at all.
+    A recipient's buffer is also sent as soon as it holds `max_items`
+    notices, and every buffer is sent on close (shutdown).
+    """
+
+    def __init__(
+        self,
+        inner: NotificationPublisher,
+        window_seconds: float,
+        max_items: int,
+        digest: bool = False,
+    ):
+        self.inner = inner
+        self.window_seconds = window_seconds
+        self.max_items = max_items
+        self.digest = digest
+        self._buffers: dict[int, _RecipientBuffer] = {}
+        self._flusher: asyncio.Task | None = None
+
+    async def publish(self, message: schemas.KafkaMessage) -> None:
+        is_status_update = message.topic == STATUS_UPDATE_TOPIC
+        is_new_dispatch = message.topic == NEW_DISPATCH_TOPIC and self.digest
+        if not (is_status_update or is_new_dispatch):
+            await self.inner.publish(message)
+            return
+
+        recipient_id = message.payload.user_id
+        buffer = self._buffers.get(recipient_id)
+        if buffer is None:
+            buffer = self._buffers[recipient_id] = _RecipientBuffer(
+                opened_at=time.monotonic()
+            )
+
+        if is_status_update:
+            if message.key in buffer.status_updates:
+                NOTIFICATIONS_COALESCED.labels("status_update").inc()
+            buffer.status_updates[message.key] = message
+        else:
+            buffer.new_dispatches.append(message)
+
+        if len(buffer) >= self.max_items:
+            await self._flush(recipient_id)
+
+    async def start(self) -> None:
+        await self.inner.start()
+        self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        for recipient_id in list(self._buffers):
+            await self._flush(recipient_id)
+        await self.inner.close()
+
+    async def _flush_periodically(self) -> None:
+        # Checking 4 times per window keeps the extra delay under a quarter window
+        interval = max(self.window_seconds / 4, 0.05)
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush_due()
+
+    async def flush_due(self) -> None:
+        """Sends the buffers that waited for a whole window."""
+        deadline = time.monotonic() - self.window_seconds
+        for recipient_id, buffer in list(self._buffers.items()):
+            if buffer.opened_at <= deadline:
+                await self._flush(recipient_id)
+
+    async def _flush(self, recipient_id: int) -> None:
+        # Popped before publishing, so messages arriving meanwhile start a new buffer
+        buffer = self._buffers.pop(recipient_id, None)
+        if buffer is None:
+            return
+
+        for message in buffer.status_updates.values():
+            await self.inner.publish(message)
+
+        if len(buffer.new_dispatches) == 1:
+            await self.inner.publish(buffer.new_dispatches[0])
+        elif buffer.new_dispatches:
+            NOTIFICATIONS_COALESCED.labels("new_dispatch").inc(
+                len(buffer.new_dispatches)
+            )
+            await self.inner.publish(_digest_message(buffer.new_dispatches))
+
+
+def _digest_message(messages: list[schemas.KafkaMessage]) -> schemas.KafkaMessage:
+    """Rolls new-dispatch notices of one recipient into one digest message."""
+    first = messages[0].payload
+    now = datetime.now(timezone.utc)
+    payload = schemas.KafkaDispatchDigestPayload(
+        user_id=first.user_id,
+        user_type=first.user_type,
+        assignee_name=first.assignee_name,
+        subject=f"Bạn có {len(messages)} công văn mới",
+        count=len(messages),
+        items=[
+            schemas.KafkaDigestItem(
+                document_title=message.payload.document_title,
+                document_url=message.payload.document_url,
+                document_serial_number=message.payload.document_serial_number,
+                assigner_name=message.payload.assigner_name,
+                action_required=message.payload.action_required,
+                date=message.payload.date,
+            )
+            for message in messages
+        ],
+        date=now,
+    )
+    return schemas.KafkaMessage(
+        topic=DIGEST_TOPIC,
+        payload=payload,
+        key=f"dispatch_digest_{first.user_id}_{int(now.timestamp())}",
+    )
+
+
+def create_notification_publisher(client: httpx.AsyncClient) -> NotificationPublisher:
+    """The app's publisher, as configured in settings."""
+    if settings.NOTIFICATION_TRANSPORT == "kafka":
+        publisher = KafkaPublisher(_create_kafka_producer())
+    else:
+        publisher = GatewayPublisher(client)
+    if settings.NOTIFICATION_COALESCE:
+        publisher = CoalescingPublisher(
+            publisher,
+            window_seconds=settings.NOTIFICATION_COALESCE_WINDOW_SECONDS,
+            max_items=settings.NOTIFICATION_COALESCE_MAX_ITEMS,
+            digest=settings.NOTIFICATION_DIGEST,
+        )
+    return publisher
+
+
+# endregion
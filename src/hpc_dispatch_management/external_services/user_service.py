@@ -3,8 +3,6 @@ import logging
 import httpx
 from fastapi import HTTPException, status
 
-from ..core.settings import settings
-
 logger = logging.getLogger(__name__)
 
 
@@ -17,9 +15,8 @@ async def get_lecturer(lecturer_id: int, token: str, client: httpx.AsyncClient)
     """
     Fetches lecturer information from the System Management (User) Service.
     """
-    # settings.HPC_USER_SERVICE_URL is a Pydantic HttpUrl, so we convert it to string
-    base_url = str(settings.HPC_USER_SERVICE_URL).rstrip("/")
-    url = f"{base_url}/lecturers/{lecturer_id}"
+    # The client's base URL is settings.HPC_USER_SERVICE_URL
+    url = f"/lecturers/{lecturer_id}"
 
     headers = _get_auth_header(token)
 
@@ -39,6 +36,13 @@ async def get_lecturer(lecturer_id: int, token: str, client: httpx.AsyncClient)
             status_code=e.response.status_code,
             detail="Error fetching lecturer data from User Service",
         )
+    except httpx.TransportError as e:
+        # Timeouts, unreachable service, or its circuit breaker is open
+        logger.error(f"User Service unavailable in get_lecturer: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="User Service is temporarily unavailable",
+        )
     except Exception as e:
         logger.error(f"Unexpected error in get_lecturer: {e}")
         raise HTTPException(
@@ -54,8 +58,7 @@ async def fetch_lecturer_by_username(
     Fetches a missing lecturer from the System Management Service by username.
     Handles multiple possible JSON structures based on the Laravel database schema.
     """
-    base_url = str(settings.HPC_USER_SERVICE_URL).rstrip("/")
-    url = f"{base_url}/lecturers"
+    url = "/lecturers"
     headers = _get_auth_header(token)
 
     try:
@@ -90,6 +93,13 @@ async def fetch_lecturer_by_username(
             )
 
         return None
+    except httpx.TransportError as e:
+        # Don't report the user as invalid when we simply couldn't ask
+        logger.error(f"User Service unavailable while fetching {username}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="User Service is temporarily unavailable",
+        )
     except Exception as e:
         logger.error(f"Failed to fetch lecturer {username} from User Service: {e}")
         return None
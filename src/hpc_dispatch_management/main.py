@@ -1,13 +1,23 @@
 import logging
 from contextlib import asynccontextmanager
 
-import httpx
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from .core.admission import AdmissionControlMiddleware
+from .core.capture import TrafficCaptureMiddleware
+from .core.metrics import MetricsMiddleware, render_metrics
+from .core.pubsub import create_event_broker
+from .core.ratelimit import create_rate_limiter
 from .core.settings import settings
-from .db.database import create_db_and_tables
-from .routers import dispatches
+from .core.warmup import warm_up
+from .db import crud
+from .db.database import SessionLocal, create_db_and_tables
+from .db.read_receipts import create_read_receipt_buffer
+from .external_services.http_client import create_upstream_clients
+from .external_services.notification_service import create_notification_publisher
+from .routers import diagnostics, dispatches
 
 # Initialize a logger instance for this specific file, naming it after the current module (__name__)
 logger = logging.getLogger(__name__)
@@ -21,7 +31,7 @@ logger = logging.getLogger(__name__)
 async def lifespan(_app: FastAPI):  # adding _ so basedpyright be silient
     """
     Manage application startup and shutdown events.
-    Handles DB creation and shared HTTP client.
+    Handles DB creation and the HTTP clients of the upstream services.
     """
 
     # The code before yield run when the app starts
@@ -46,25 +56,73 @@ async def lifespan(_app: FastAPI):  # adding _ so basedpyright be silient
     if settings.APP_ENV == "local":
         logger.info("Using local development, creating tables now!")
         create_db_and_tables()
+        # Dispatches from before the change log get one entry, so that a
+        # full delta sync returns them (alembic does it in production)
+        with SessionLocal() as db:
+            crud.backfill_change_log(db)
     elif settings.APP_ENV == "production":
         logger.info("Skipped local development settings")
 
-    # This is a shared asynchronous HTTP client that can be reused across the app
-    client = httpx.AsyncClient()
+    # Mappers, pool connections, compiled statements and schemas are ready
+    # before the first request instead of being built by it
+    warm_up(_app)
 
+    # One long-lived HTTP client per upstream service (User, Drive, Notification),
+    # each with its own connection pool, so connections are reused across
+    # requests. Some connections are pre-opened here, before the first request.
+    upstream_clients = await create_upstream_clients()
+
+    # Sends notifications through the gateway client, coalescing them per
+    # recipient when NOTIFICATION_COALESCE is on (flushed again on shutdown).
+    notification_publisher = create_notification_publisher(
+        upstream_clients["notification"]
+    )
+    await notification_publisher.start()
+
+    # Per-user events for the SSE streams (fanned out through Redis if configured)
+    event_broker = create_event_broker()
+    await event_broker.start()
+
+    # Assignees' first views of a dispatch, written in batches every few
+    # seconds instead of one UPDATE per read (flushed again on shutdown)
+    read_receipts = create_read_receipt_buffer()
+    await read_receipts.start()
+
+    # Per-user token buckets (shared through Redis if configured, None if off)
+    rate_limiter = create_rate_limiter()
+
+    # From now on /ready answers 200
+    _app.state.ready = True
     logger.info("Startup complete.")
 
     # Normally, in python, yield used to craete generator—function that return data one piece at a time
     # Though, in this context, it acts as a pause button that split the function
-    yield {"http_client": client}
+    yield {
+        "user_client": upstream_clients["user"],
+        "drive_client": upstream_clients["drive"],
+        "notification_publisher": notification_publisher,
+        "event_broker": event_broker,
+        "rate_limiter": rate_limiter,
+        "read_receipts": read_receipts,
+    }
 
     # Shutdown
     # Once the server receive shutdown signal,
     # execution resume here
     logger.info("Application shutting down...")
+    _app.state.ready = False
+
+    await event_broker.close()
+    await read_receipts.close()
+    if rate_limiter is not None:
+        await rate_limiter.close()
+
+    # Send what is still buffered before the gateway client goes away
+    await notification_publisher.close()
 
-    # Safely close the asynchrounous HTTP client to prevent resource leaks.
-    await client.aclose()
+    # Safely close the asynchrounous HTTP clients to prevent resource leaks.
+    for client in upstream_clients.values():
+        await client.aclose()
     logger.info("Shutdown complete.")
 
 
@@ -75,6 +133,14 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Flipped by lifespan once the warm-up is done (see /ready)
+app.state.ready = False
+
+# Sheds low-priority requests with 503 + Retry-After when the DB pool or the
+# worker is saturated. Added first so that it runs inside CORS and metrics.
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
 # cors
 app.add_middleware(
     CORSMiddleware,
@@ -82,10 +148,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=settings.METHODS,
     allow_headers=settings.HEADERS,
+    # Browsers only let the front-end read these when exposed (If-Match, backoff)
+    expose_headers=[
+        "ETag",
+        "RateLimit-Limit",
+        "RateLimit-Remaining",
+        "RateLimit-Reset",
+        "Retry-After",
+    ],
 )
 
+# Request latency and per-request DB usage, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Sanitized request shapes for benchmarks/replay.py, when TRAFFIC_CAPTURE_PATH
+# is set. Outermost, so it also sees the requests shed by admission control.
+if settings.TRAFFIC_CAPTURE_PATH:
+    app.add_middleware(TrafficCaptureMiddleware)
+
 
 app.include_router(dispatches.router)
+app.include_router(diagnostics.router)
 # app.include_router(folders.router)
 
 
@@ -100,4 +183,24 @@ async def read_root():
     }
 
 
+@app.get("/ready", tags=["Health Check"])
+async def read_ready(request: Request):
+    """
+    Readiness probe: 503 until the startup warm-up is done, and again once
+    shutdown starts, so load balancers only route to warm workers.
+    """
+    if not request.app.state.ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
+
+
+@app.get("/metrics", tags=["Health Check"], include_in_schema=False)
+async def read_metrics():
+    """
+    Prometheus scrape endpoint.
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # uvicorn --app-dir src hpc_dispatch_management.main:app --host 0.0.0.0 --port 8888 --reload
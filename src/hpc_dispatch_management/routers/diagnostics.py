@@ -0,0 +1,63 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from ..core.memory import GroupBy, live_object_counts, memory_profiler
+from ..core.security import get_current_admin
+
+router = APIRouter(
+    prefix="/diagnostics",
+    tags=["Diagnostics"],
+    # Admins only: these endpoints expose the process internals
+    dependencies=[Depends(get_current_admin)],
+)
+
+# Plain `def` endpoints: FastAPI runs them in its thread pool, so the
+# snapshots and heap walks don't block the event loop. Every answer is
+# about the one worker process that served it (see `pid`).
+
+
+@router.post("/memory/start")
+def start_memory_profiling(
+    frames: Annotated[int, Query(ge=1, le=50)] = 10,
+):
+    """
+    Starts tracemalloc in this worker, keeping `frames` frames per
+    allocation. Allocations get slower until it is stopped.
+    """
+    memory_profiler.start(frames)
+    return {"tracing": True}
+
+
+@router.post("/memory/stop")
+def stop_memory_profiling():
+    """Stops tracemalloc and frees what it recorded."""
+    memory_profiler.stop()
+    return {"tracing": False}
+
+
+@router.get("/memory")
+def read_memory_snapshot(
+    limit: Annotated[int, Query(ge=1, le=200)] = 20,
+    group_by: GroupBy = "lineno",
+):
+    """
+    Top allocation sites of the memory traced so far, and what grew since
+    the previous call (or since start). Call it again after some traffic
+    to see what keeps growing.
+    """
+    if not memory_profiler.tracing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Memory profiling is not running, POST /diagnostics/memory/start first.",
+        )
+    return memory_profiler.snapshot(limit, group_by)
+
+
+@router.get("/memory/objects")
+def read_live_objects():
+    """
+    Live ORM instances per model, open Sessions and the instances in
+    their identity maps, and httpx clients. Works without tracemalloc.
+    """
+    return live_object_counts()
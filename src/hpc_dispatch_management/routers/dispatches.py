@@ -1,16 +1,35 @@
+import asyncio
+import json
 import logging
+from datetime import datetime, timezone
 from typing import Annotated
 
 import httpx
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security.http import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
 from .. import schemas
+from ..core.pubsub import EventBroker
+from ..core.ratelimit import rate_limit
 from ..core.security import bearer_scheme, get_current_user
+from ..core.settings import settings
 from ..db import crud, models
-from ..db.database import get_db, get_http_client
+from ..db.database import (
+    get_db,
+    get_drive_client,
+    get_event_broker,
+    get_notification_publisher,
+    get_read_db,
+    get_read_receipts,
+    get_user_client,
+    release_connection,
+)
+from ..db.read_receipts import ReadReceiptBuffer
 from ..external_services import drive_service, notification_service, user_service
+from ..external_services.notification_service import NotificationPublisher
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +41,118 @@ router = APIRouter(
 )
 
 
-@router.post("/", response_model=schemas.Dispatch, status_code=status.HTTP_201_CREATED)
+def _parse_csv_param(raw: str | None, enum_cls: type, param_name: str) -> set | None:
+    """
+    Parses a comma separated query parameter (e.g. `fields=title,status`)
+    into a set of enum members. None means the parameter was not sent.
+    """
+    if raw is None:
+        return None
+
+    values = set()
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            values.add(enum_cls(item))
+        except ValueError:
+            allowed = ", ".join(member.value for member in enum_cls)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid value '{item}' for '{param_name}'. Allowed: {allowed}",
+            )
+    return values
+
+
+def _to_sparse_dispatch(
+    db_dispatch: models.Dispatch,
+    fields: set[schemas.DispatchField] | None,
+    include: set[schemas.DispatchInclude] | None,
+) -> dict:
+    """
+    Serializes only the loaded parts of a dispatch.
+    Touching anything else would hit a raiseload, which is what we want.
+    """
+    field_names = (
+        [field.value for field in schemas.DispatchField]
+        if fields is None
+        else [schemas.DispatchField.ID.value] + [field.value for field in fields]
+    )
+    data = {name: getattr(db_dispatch, name) for name in field_names}
+
+    if include is None or schemas.DispatchInclude.AUTHOR in include:
+        data["author"] = db_dispatch.author
+    if include is None or schemas.DispatchInclude.ASSIGNMENTS in include:
+        data["assignments"] = db_dispatch.assignments
+
+    partial = schemas.DispatchPartial.model_validate(data, from_attributes=True)
+    return partial.model_dump(mode="json", exclude_unset=True)
+
+
+def _etag(db_dispatch: models.Dispatch) -> str:
+    """The ETag of a dispatch is its version (see models.Dispatch.version)."""
+    return f'"{db_dispatch.version}"'
+
+
+def _if_match_versions(if_match: str | None) -> set[int] | None:
+    """
+    The dispatch versions an If-Match header accepts, None for any version
+    (no header, or `*`). Strong comparison (RFC 9110): weak tags never match.
+    """
+    if if_match is None:
+        return None
+    tags = {tag.strip() for tag in if_match.split(",")}
+    if "*" in tags:
+        return None
+    return {
+        int(tag[1:-1])
+        for tag in tags
+        if len(tag) > 2 and tag[0] == tag[-1] == '"' and tag[1:-1].isdigit()
+    }
+
+
+def _check_if_match(if_match: str | None, db_dispatch: models.Dispatch):
+    """
+    Rejects a write based on an outdated copy of the dispatch.
+    Without If-Match the write goes through (older clients), but it is
+    still checked against the version loaded in this request.
+    """
+    versions = _if_match_versions(if_match)
+    if versions is not None and db_dispatch.version not in versions:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="The dispatch was changed by someone else. Reload it and retry.",
+        )
+
+
+async def _publish_dispatch_event(
+    broker: EventBroker,
+    user_id: int,
+    event_type: schemas.DispatchEventType,
+    db_dispatch: models.Dispatch,
+    actor: models.User,
+):
+    """Pushes a dispatch event to the open SSE streams of `user_id`."""
+    event = schemas.DispatchEvent(
+        type=event_type,
+        dispatch_id=db_dispatch.id,
+        title=db_dispatch.title,
+        serial_number=db_dispatch.serial_number,
+        status=db_dispatch.status,
+        actor_id=actor.id,
+        actor_name=actor.full_name,
+        at=datetime.now(timezone.utc),
+    )
+    await broker.publish(user_id, event.model_dump(mode="json"))
+
+
+@router.post(
+    "/",
+    response_model=schemas.Dispatch,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit("write"))],
+)
 async def create_dispatch(
     dispatch: schemas.DispatchCreate,
     db: Annotated[Session, Depends(get_db)],
@@ -33,27 +163,50 @@ async def create_dispatch(
     - The creator is automatically assigned as the author.
     - New dispatches always start with 'DRAFT' status.
     """
-    # Sync user from JWT to local DB to ensure foreign key constraint is met
-    _ = crud.sync_user_from_jwt(db=db, user_jwt_data=current_user)
-    return crud.create_dispatch(db=db, dispatch=dispatch, author_id=current_user.sub)
+    # Sync user from JWT to local DB to ensure foreign key constraint is met.
+    # Retried writes run in the threadpool: their backoff pauses must not
+    # block the event loop (see transactional).
+    _ = await run_in_threadpool(
+        crud.sync_user_from_jwt, db=db, user_jwt_data=current_user
+    )
+    return await run_in_threadpool(
+        crud.create_dispatch, db=db, dispatch=dispatch, author_id=current_user.sub
+    )
 
 
-@router.get("/", response_model=list[schemas.Dispatch])
+@router.get(
+    "/",
+    response_model=list[schemas.Dispatch],
+    dependencies=[Depends(rate_limit("list", search_cost="search"))],
+)
 async def read_dispatches(
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_read_db)],
     current_user: Annotated[schemas.User, Depends(get_current_user)],
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status: schemas.DispatchStatus | None = None,
     dispatch_type: schemas.DispatchTypeSearch = schemas.DispatchTypeSearch.ALL,
     search: str | None = None,
+    fields: str | None = None,
+    include: str | None = None,
 ):
     """
     Retrieve a list of dispatches with advanced filtering:
     - **status**: Filter by dispatch status (e.g., 'PENDING').
     - **dispatch_type**: Filter by user perspective ('incoming', 'outgoing', or 'all').
     - **search**: Search term for title or serial number.
+    - **fields**: Comma separated columns to return (e.g., 'title,serial_number,status').
+    - **include**: Comma separated relations to return ('author', 'assignments').
+      Send it empty (`include=`) to skip every relation.
+
+    When either `fields` or `include` is sent, the response only contains
+    what was asked for (plus `id`), and the skipped columns/relations are
+    never loaded from the database.
     """
+    parsed_fields = _parse_csv_param(fields, schemas.DispatchField, "fields")
+    parsed_include = _parse_csv_param(include, schemas.DispatchInclude, "include")
+
     dispatches = crud.get_dispatches_with_filters(
         db=db,
         user_id=current_user.sub,
@@ -62,32 +215,134 @@ async def read_dispatches(
         search=search,
         skip=skip,
         limit=limit,
+        fields=parsed_fields,
+        include=parsed_include,
+    )
+
+    if parsed_fields is None and parsed_include is None:
+        return dispatches
+
+    # Sparse response: bypass the full `schemas.Dispatch` response model,
+    # which would otherwise require (and load) every column and relation.
+    # Headers set by dependencies (RateLimit-*) are carried over by hand.
+    return JSONResponse(
+        content=[
+            _to_sparse_dispatch(d, parsed_fields, parsed_include) for d in dispatches
+        ],
+        headers=dict(response.headers),
+    )
+
+
+# Declared before "/{dispatch_id}", which would otherwise match "/changes"
+@router.get(
+    "/changes",
+    response_model=schemas.DispatchChanges,
+    dependencies=[Depends(rate_limit("list"))],
+)
+async def read_dispatch_changes(
+    db: Annotated[Session, Depends(get_read_db)],
+    current_user: Annotated[schemas.User, Depends(get_current_user)],
+    since: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=500)] = 100,
+):
+    """
+    Delta sync for clients that keep a local copy of their dispatches:
+    - **since**: the `sync_token` of the previous call (0 for a full sync).
+    - **limit**: max dispatches per page; keep calling while `has_more`.
+
+    Returns the user's dispatches created or updated since the token
+    (with their assignments), and the ids of deleted dispatches.
+    """
+    return crud.get_changes_since(
+        db, user_id=current_user.sub, since=since, limit=limit
     )
-    return dispatches
 
 
-@router.get("/{dispatch_id}", response_model=schemas.Dispatch)
-async def read_dispatch(dispatch_id: int, db: Annotated[Session, Depends(get_db)]):
+# Declared before "/{dispatch_id}", which would otherwise match "/events"
+@router.get("/events", response_class=StreamingResponse)
+async def stream_dispatch_events(
+    current_user: Annotated[schemas.User, Depends(get_current_user)],
+    broker: Annotated[EventBroker, Depends(get_event_broker)],
+):
+    """
+    Server-sent events stream of the current user, so clients don't have to
+    poll `dispatch_type=incoming`:
+    - **dispatch.assigned**: a dispatch was assigned to the user.
+    - **dispatch.reviewed**: a dispatch the user wrote was approved/rejected.
+
+    Idle streams get a comment line every `SSE_HEARTBEAT_SECONDS`.
+    No database session is held while the stream is open.
+    """
+
+    async def event_stream():
+        async with broker.subscribe(current_user.sub) as queue:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=settings.SSE_HEARTBEAT_SECONDS
+                    )
+                except TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                data = json.dumps(event, ensure_ascii=False)
+                yield f"event: {event['type']}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # No caching, and no buffering by nginx-like proxies
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/{dispatch_id}",
+    response_model=schemas.Dispatch,
+    dependencies=[Depends(rate_limit("read"))],
+)
+async def read_dispatch(
+    dispatch_id: int,
+    db: Annotated[Session, Depends(get_read_db)],
+    current_user: Annotated[schemas.User, Depends(get_current_user)],
+    read_receipts: Annotated[ReadReceiptBuffer, Depends(get_read_receipts)],
+    response: Response,
+):
     """
     Retrieve a single dispatch by its ID.
+    The ETag header can be sent back as If-Match when editing it.
+    An assignee's first read is recorded as seen_at of their assignment.
     """
     db_dispatch = crud.get_dispatch(db, dispatch_id=dispatch_id)
     if db_dispatch is None:
         raise HTTPException(status_code=404, detail="Dispatch not found")
+    response.headers["ETag"] = _etag(db_dispatch)
+
+    # Buffered, not written here: this stays a read-only request
+    for assignment in db_dispatch.assignments:
+        if assignment.assignee_id == current_user.sub and assignment.seen_at is None:
+            read_receipts.record(dispatch_id, current_user.sub)
     return db_dispatch
 
 
-@router.put("/{dispatch_id}", response_model=schemas.Dispatch)
+@router.put(
+    "/{dispatch_id}",
+    response_model=schemas.Dispatch,
+    dependencies=[Depends(rate_limit("write"))],
+)
 async def update_dispatch(
     dispatch_id: int,
     dispatch_update: schemas.DispatchUpdate,
     db: Annotated[Session, Depends(get_db)],
     current_user: Annotated[schemas.User, Depends(get_current_user)],
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
 ):
     """
     Update a dispatch.
     - Business Rule: If in DRAFT, only the creator can edit.
     - Business Rule: If sent (not DRAFT), only an admin can edit.
+    - Send the ETag from GET as If-Match: 412 if the dispatch changed since.
     """
     db_dispatch = crud.get_dispatch(db, dispatch_id=dispatch_id)
     if db_dispatch is None:
@@ -109,18 +364,29 @@ async def update_dispatch(
             detail="Only admins can edit a sent dispatch.",
         )
 
-    return crud.update_dispatch(
-        db=db, db_dispatch=db_dispatch, dispatch_update=dispatch_update
+    _check_if_match(if_match, db_dispatch)
+
+    db_dispatch = await run_in_threadpool(
+        crud.update_dispatch,
+        db=db,
+        db_dispatch=db_dispatch,
+        dispatch_update=dispatch_update,
     )
+    response.headers["ETag"] = _etag(db_dispatch)
+    return db_dispatch
 
 
-@router.delete("/{dispatch_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{dispatch_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(rate_limit("write"))],
+)
 async def delete_dispatch(
     dispatch_id: int,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    client: httpx.AsyncClient = Depends(get_http_client),
+    drive_client: httpx.AsyncClient = Depends(get_drive_client),
 ):
     """
     Delete a dispatch and move its associated file to the trash in Drive.
@@ -145,15 +411,16 @@ async def delete_dispatch(
     # 1. Capture the file URL before deleting the DB record
     file_url = db_dispatch.file_url
 
-    # 2. Delete the dispatch from the SQL database
-    _ = crud.delete_dispatch(db=db, dispatch_id=dispatch_id)
+    # 2. Delete the dispatch from the SQL database. The commit gives the
+    # connection back to the pool before the Drive call below.
+    _ = await run_in_threadpool(crud.delete_dispatch, db=db, dispatch_id=dispatch_id)
 
     # 3. Clean up the physical file in the user's Drive
     if file_url:
         try:
             # We must use credentials.credentials to get the raw token string
             await drive_service.trash_dispatch_file(
-                file_url=file_url, token=credentials.credentials, client=client
+                file_url=file_url, token=credentials.credentials, client=drive_client
             )
         except Exception as e:
             logger.exception(
@@ -163,14 +430,21 @@ async def delete_dispatch(
     return
 
 
-@router.post("/{dispatch_id}/assign", status_code=status.HTTP_200_OK)
+@router.post(
+    "/{dispatch_id}/assign",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(rate_limit("write"))],
+)
 async def assign_dispatch(
     dispatch_id: int,
     assignment: schemas.DispatchAssign,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user),
     token: str = Depends(bearer_scheme),
-    client: httpx.AsyncClient = Depends(get_http_client),
+    user_client: httpx.AsyncClient = Depends(get_user_client),
+    drive_client: httpx.AsyncClient = Depends(get_drive_client),
+    publisher: NotificationPublisher = Depends(get_notification_publisher),
+    broker: EventBroker = Depends(get_event_broker),
 ):
     """
     Assign a DRAFT dispatch to users.
@@ -182,7 +456,7 @@ async def assign_dispatch(
         raise HTTPException(
             status_code=403, detail="Only the author can assign this dispatch"
         )
-    if db_dispatch.status != schemas.DispatchStatus.DRAFT:
+    if not crud.can_transition(db_dispatch.status, schemas.DispatchStatus.PENDING):
         raise HTTPException(
             status_code=400, detail="Only draft dispatches can be assigned"
         )
@@ -200,9 +474,14 @@ async def assign_dispatch(
 
     # 3. Fetch and save missing lecturers from the System Management service
     if missing_usernames:
+        # No connection is held while the User Service answers. Should the
+        # dispatch change meanwhile, the version check of the assignment
+        # below turns it into a 412.
+        release_connection(db)
+        fetched = []
         for username in missing_usernames:
             lecturer_data = await user_service.fetch_lecturer_by_username(
-                username, token.credentials, client
+                username, token.credentials, user_client
             )
 
             if not lecturer_data:
@@ -210,35 +489,30 @@ async def assign_dispatch(
                     status_code=400,
                     detail=f"User '{username}' is invalid or does not exist in the system.",
                 )
+            fetched.append(lecturer_data)
 
-            # Cache the new user locally
-            new_user = models.User(
-                id=lecturer_data["id"],
-                username=lecturer_data["username"],
-                email=lecturer_data["email"],
-                full_name=lecturer_data.get(
-                    "full_name", lecturer_data.get("name", username)
-                ),
-                user_type=schemas.UserType.LECTURER,
-                department_id=lecturer_data.get("department_id"),
-                is_admin=lecturer_data.get("is_admin", False),
-            )
-            db.add(new_user)
-
-        db.commit()  # Save all newly fetched users to the DB
+        # Cache the new users locally
+        await run_in_threadpool(crud.cache_lecturers, db, fetched)
 
     # Now the original CRUD function will succeed because all users are guaranteed to be in the local DB
     try:
-        assignees = crud.assign_dispatch_to_users(db, db_dispatch, assignment)
+        assignees = await run_in_threadpool(
+            crud.assign_dispatch_to_users, db, db_dispatch, assignment
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    # Everything the Drive, notification and event calls below read is
+    # loaded now: give the connection back before awaiting them.
+    author = db_dispatch.author
+    release_connection(db)
+
     try:
         await drive_service.organize_dispatch_in_drive(
             dispatch=db_dispatch,
             assignees=assignees,
             token=token.credentials,
-            client=client,
+            client=drive_client,
         )
     except Exception as e:
         logger.exception(f"Failed to organize dispatch in drive: {e}")
@@ -246,9 +520,17 @@ async def assign_dispatch(
     for assignee in assignees:
         await notification_service.send_new_dispatch_notification(
             dispatch=db_dispatch,
-            assigner=db_dispatch.author,
+            assigner=author,
             assignee=assignee,
             action_required=assignment.action_required,
+            publisher=publisher,
+        )
+        await _publish_dispatch_event(
+            broker,
+            assignee.id,
+            schemas.DispatchEventType.ASSIGNED,
+            db_dispatch,
+            actor=author,
         )
 
     return {
@@ -256,61 +538,73 @@ async def assign_dispatch(
     }
 
 
-@router.put("/{dispatch_id}/status", response_model=schemas.Dispatch)
+@router.put(
+    "/{dispatch_id}/status",
+    response_model=schemas.Dispatch,
+    dependencies=[Depends(rate_limit("write"))],
+)
 async def update_dispatch_status(
     dispatch_id: int,
     status_update: schemas.DispatchStatusUpdate,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(get_current_user),
+    publisher: NotificationPublisher = Depends(get_notification_publisher),
+    broker: EventBroker = Depends(get_event_broker),
+    if_match: str | None = Header(None),
 ):
     """
     Update the status of a dispatch (Approve/Reject).
     - Only an assignee can perform this action.
     - Saves the review comment.
     - Sends a notification back to the original author.
+    - Send the ETag from GET as If-Match: 412 if the dispatch changed since.
+    - 409 if the dispatch can't move to that status (see DISPATCH_TRANSITIONS).
     """
-    db_dispatch = crud.get_dispatch(db, dispatch_id=dispatch_id)
-    if not db_dispatch:
-        raise HTTPException(status_code=404, detail="Dispatch not found")
-
-    # 1. Verify if the current user is an assignee and get their assignment record
-    user_assignment = next(
+    # Checks and writes in one conditional UPDATE, see crud.review_dispatch
+    db_dispatch = await run_in_threadpool(
+        crud.review_dispatch,
+        db,
+        dispatch_id=dispatch_id,
+        reviewer_id=current_user.sub,
+        status_update=status_update,
+        expected_versions=_if_match_versions(if_match),
+    )
+    # Loaded along with the assignments, no extra query needed
+    reviewer = next(
         (
-            assign
-            for assign in db_dispatch.assignments
-            if assign.assignee_id == current_user.sub
+            assignment.assignee
+            for assignment in db_dispatch.assignments
+            if assignment.assignee_id == current_user.sub
         ),
         None,
     )
-
-    if not user_assignment:
-        raise HTTPException(
-            status_code=403, detail="You are not an assignee of this dispatch"
+    # The review is committed, don't hold a connection while notifying
+    release_connection(db)
+
+    if reviewer is None:
+        # The assignment went away between the UPDATE and the reload: the
+        # review is saved, but there is no reviewer to name to the author
+        logger.warning(
+            f"Reviewer {current_user.sub} is no longer assigned to dispatch "
+            f"{dispatch_id}, skipping the status notification."
         )
-
-    # 2. Update the dispatch status
-    db_dispatch.status = status_update.status
-
-    # 3. Save the review comment to the user's assignment record
-    if status_update.review_comment is not None:
-        user_assignment.review_comment = status_update.review_comment
-
-    db.commit()
-    db.refresh(db_dispatch)
-
-    reviewer = crud.get_user(db, current_user.sub)
-    if not reviewer:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Reviewer user not found.",
+    else:
+        # Send notification back to the author
+        await notification_service.send_status_update_notification(
+            dispatch=db_dispatch,
+            reviewer=reviewer,
+            status=status_update.status,
+            comment=status_update.review_comment,
+            publisher=publisher,
+        )
+        await _publish_dispatch_event(
+            broker,
+            db_dispatch.author_id,
+            schemas.DispatchEventType.REVIEWED,
+            db_dispatch,
+            actor=reviewer,
         )
 
-    # Send notification back to the author
-    await notification_service.send_status_update_notification(
-        dispatch=db_dispatch,
-        reviewer=reviewer,
-        status=status_update.status,
-        comment=status_update.review_comment,
-    )
-
+    response.headers["ETag"] = _etag(db_dispatch)
     return db_dispatch
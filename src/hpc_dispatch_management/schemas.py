@@ -94,15 +94,65 @@ class KafkaDispatchStatusUpdatePayload(BaseModel):
     model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
 
 
+class KafkaDigestItem(BaseModel):
+    """One new dispatch inside a digest."""
+
+    document_title: str
+    document_url: HttpUrl
+    document_serial_number: str
+    assigner_name: str
+    action_required: str
+    date: AwareDatetime
+
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+
+class KafkaDispatchDigestPayload(BaseModel):
+    """Several new-dispatch notices for one recipient, sent as one message."""
+
+    user_id: int
+    user_type: UserType
+    assignee_name: str
+    subject: str
+    count: int
+    items: list[KafkaDigestItem]
+    date: AwareDatetime
+
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+
 class KafkaMessage(BaseModel):
     topic: str
     payload: (
-        KafkaNewDispatchPayload | KafkaDispatchStatusUpdatePayload
+        KafkaNewDispatchPayload
+        | KafkaDispatchStatusUpdatePayload
+        | KafkaDispatchDigestPayload
     )  # Corrected Union
     priority: Literal["low", "medium", "high"] = "medium"
     key: str
 
 
+# Server-sent events
+
+
+class DispatchEventType(str, Enum):
+    ASSIGNED = "dispatch.assigned"  # A dispatch was assigned to the user
+    REVIEWED = "dispatch.reviewed"  # A dispatch the user wrote was reviewed
+
+
+class DispatchEvent(BaseModel):
+    """Pushed on GET /dispatches/events, instead of polling for changes."""
+
+    type: DispatchEventType
+    dispatch_id: int
+    title: str
+    serial_number: str
+    status: DispatchStatus
+    actor_id: int
+    actor_name: str
+    at: AwareDatetime
+
+
 # 3. Dispatch Document Schemas
 
 
@@ -114,7 +164,10 @@ class DispatchBase(BaseModel):
 
 
 class DispatchCreate(DispatchBase):
-    pass
+    # Left out, the server allocates the next number of `serial_prefix`
+    # for the current year (e.g. "QD-001/2026")
+    serial_number: str | None = Field(None, max_length=100)
+    serial_prefix: str | None = Field(None, pattern=r"^[A-Z0-9]{1,20}$")
 
 
 class DispatchUpdate(BaseModel):
@@ -131,10 +184,13 @@ class DispatchAssignmentResponse(BaseModel):
     action_required: str | None = None
     review_comment: str | None = None
     assigned_at: AwareDatetime
+    # First time the assignee opened the dispatch, None until then. Recorded
+    # a few seconds late (write-behind).
+    seen_at: AwareDatetime | None = None
 
     assignee: UserInfo
 
-    @field_validator("assigned_at", mode="before")
+    @field_validator("assigned_at", "seen_at", mode="before")
     @classmethod
     def ensure_timezone_aware(cls, v: datetime | None) -> datetime | None:
         if isinstance(v, datetime) and v.tzinfo is None:
@@ -151,6 +207,7 @@ class Dispatch(DispatchBase):
     status: DispatchStatus
     created_at: AwareDatetime
     updated_at: AwareDatetime | None = None
+    version: int  # Also sent as the ETag, see If-Match on PUT
     author: UserInfo
 
     assignments: list[DispatchAssignmentResponse] = Field(default_factory=list)
@@ -172,6 +229,85 @@ class DispatchTypeSearch(str, Enum):
     ALL = "all"
 
 
+# 3.1 Sparse Fieldsets (used by `fields=` / `include=` on list endpoints)
+
+
+class DispatchField(str, Enum):
+    """Scalar columns of a dispatch that a client can ask for with `fields=`."""
+
+    ID = "id"
+    TITLE = "title"
+    SERIAL_NUMBER = "serial_number"
+    DESCRIPTION = "description"
+    FILE_URL = "file_url"
+    AUTHOR_ID = "author_id"
+    STATUS = "status"
+    CREATED_AT = "created_at"
+    UPDATED_AT = "updated_at"
+    VERSION = "version"
+
+
+class DispatchInclude(str, Enum):
+    """Relationships of a dispatch that a client can ask for with `include=`."""
+
+    AUTHOR = "author"
+    ASSIGNMENTS = "assignments"
+
+
+class DispatchPartial(BaseModel):
+    """
+    Sparse view of a dispatch.
+    Only the fields that were requested (and loaded) are set, so it should be
+    dumped with `exclude_unset=True`.
+    """
+
+    id: int
+    title: str | None = None
+    serial_number: str | None = None
+    description: str | None = None
+    file_url: HttpUrl | None = None
+    author_id: int | None = None
+    status: DispatchStatus | None = None
+    created_at: AwareDatetime | None = None
+    updated_at: AwareDatetime | None = None
+    version: int | None = None
+    author: UserInfo | None = None
+    assignments: list[DispatchAssignmentResponse] | None = None
+
+    @field_validator("created_at", "updated_at", mode="before")
+    @classmethod
+    def ensure_timezone_aware(cls, v: datetime | None) -> datetime | None:
+        if isinstance(v, datetime) and v.tzinfo is None:
+            return v.replace(tzinfo=timezone.utc)
+        return v
+
+
+# 3.2 Delta Sync (used by GET /dispatches/changes)
+
+
+class ChangeEntity(str, Enum):
+    DISPATCH = "dispatch"
+    ASSIGNMENT = "assignment"
+
+
+class ChangeOperation(str, Enum):
+    UPSERT = "upsert"  # Created or updated
+    DELETE = "delete"  # Tombstone, the row is gone
+
+
+class DispatchChanges(BaseModel):
+    """
+    What changed since a client's sync token. The client replaces its copy
+    of every dispatch in `dispatches`, drops the ones in
+    `deleted_dispatch_ids`, and sends `sync_token` back on the next call.
+    """
+
+    sync_token: int
+    has_more: bool
+    dispatches: list[Dispatch]
+    deleted_dispatch_ids: list[int]
+
+
 # 4. API Action Schemas
 class DispatchAssign(BaseModel):
     """Schema for assigning a dispatch to users."""
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from hpc_dispatch_management.core.admission import (
+    AdmissionController,
+    AdmissionControlMiddleware,
+)
+from hpc_dispatch_management.db.instrumentation import (
+    InstrumentedQueuePool,
+    PoolWaitAverage,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _client(controller: AdmissionController) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/dispatches/")
+    async def search():
+        return []
+
+    @app.put("/dispatches/1/status")
+    async def review():
+        return {"status": "approved"}
+
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        controller=controller,
+        low_priority_routes=["GET /dispatches/"],
+        retry_after_seconds=3,
+    )
+    return TestClient(app)
+
+
+def test_sheds_low_priority_requests_on_pool_wait():
+    clock = FakeClock()
+    pool_wait = PoolWaitAverage(alpha=1.0, half_life_seconds=1.0, clock=clock)
+    controller = AdmissionController(
+        max_in_flight=100, max_pool_wait_seconds=0.05, pool_wait=pool_wait
+    )
+    client = _client(controller)
+
+    assert client.get("/dispatches/").status_code == 200
+
+    pool_wait.observe(0.2)  # Checkouts waited 200 ms
+    response = client.get("/dispatches/")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    # Reviews keep going
+    assert client.put("/dispatches/1/status").status_code == 200
+
+    # Without new waits the average decays and search is admitted again
+    clock.now = 3.0
+    assert client.get("/dispatches/").status_code == 200
+
+
+def test_sheds_low_priority_requests_on_in_flight():
+    controller = AdmissionController(max_in_flight=2, max_pool_wait_seconds=1.0)
+    client = _client(controller)
+
+    controller.in_flight = 2  # As if two requests were being served
+    assert client.get("/dispatches/").status_code == 503
+    assert client.put("/dispatches/1/status").status_code == 200
+    assert controller.in_flight == 2
+
+
+def test_exhausted_pool_is_saturated_while_checkouts_wait(monkeypatch, tmp_path):
+    clock = FakeClock()
+    pool_wait = PoolWaitAverage(alpha=1.0, half_life_seconds=1.0, clock=clock)
+    monkeypatch.setattr(InstrumentedQueuePool, "wait_average", pool_wait)
+    controller = AdmissionController(
+        max_in_flight=100, max_pool_wait_seconds=0.05, pool_wait=pool_wait
+    )
+    db_engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=5,
+    )
+
+    held = db_engine.connect()  # The only connection of the pool
+    waiter = threading.Thread(target=lambda: db_engine.connect().close())
+    waiter.start()
+    while pool_wait.waiting == 0:
+        time.sleep(0.001)
+
+    # Nothing has finished waiting yet, the waiting checkout is enough
+    clock.now = 0.2
+    assert controller.saturation() == "pool_wait"
+
+    held.close()
+    waiter.join(timeout=5)
+    assert pool_wait.waiting == 0
+    db_engine.dispose()
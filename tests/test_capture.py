@@ -0,0 +1,59 @@
+import json
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from hpc_dispatch_management.core.capture import (
+    TrafficCapture,
+    TrafficCaptureMiddleware,
+)
+
+
+def test_captured_requests_are_sanitized(tmp_path):
+    capture = TrafficCapture(str(tmp_path / "traffic.jsonl"), secret="secret")
+    app = FastAPI()
+    app.add_middleware(TrafficCaptureMiddleware, capture=capture)
+
+    def current_user(request: Request):
+        request.state.user_id = 7
+
+    @app.get("/dispatches/", dependencies=[Depends(current_user)])
+    async def read_dispatches():
+        return []
+
+    @app.put("/dispatches/{dispatch_id}")
+    async def update_dispatch(dispatch_id: int, request: Request):
+        return await request.json()
+
+    @app.get("/metrics")
+    async def metrics():
+        return ""
+
+    client = TestClient(app)
+    for search in ("Nguyễn Văn A", "Nguyễn Văn A", "thi"):
+        client.get("/dispatches/", params={"search": search, "skip": 40})
+    body = json.dumps({"title": "Kế hoạch"}, ensure_ascii=False).encode()
+    client.put(
+        "/dispatches/12", content=body, headers={"Content-Type": "application/json"}
+    )
+    client.get("/metrics")
+
+    entries = [json.loads(line) for line in (tmp_path / "traffic.jsonl").open()]
+    assert len(entries) == 4  # /metrics is not captured
+
+    first, repeated, other, update = entries
+    assert first["r"] == "/dispatches/"
+    assert first["q"]["skip"] == "40"
+    # Masked, but the same term gives the same token, of the same length
+    assert first["q"]["search"] != "Nguyễn Văn A"
+    assert first["q"]["search"] == repeated["q"]["search"]
+    assert len(first["q"]["search"]) == len("Nguyễn Văn A")
+    assert len(other["q"]["search"]) == 3
+    assert other["q"]["search"] != first["q"]["search"]
+    assert first["u"] == capture.user_hash(7) and "7" not in first["u"]
+
+    assert update["r"] == "/dispatches/{dispatch_id}"
+    assert update["p"] == {"dispatch_id": "12"}
+    assert update["b"] == len(body)
+    assert update["u"] is None
+    assert "Kế hoạch" not in (tmp_path / "traffic.jsonl").read_text()
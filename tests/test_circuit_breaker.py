@@ -0,0 +1,82 @@
+import pytest
+
+from hpc_dispatch_management.external_services.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(scope="function")
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture(scope="function")
+def breaker(clock: FakeClock) -> CircuitBreaker:
+    return CircuitBreaker(
+        name="test",
+        failure_rate_threshold=0.5,
+        minimum_calls=4,
+        window_seconds=10,
+        open_seconds=5,
+        clock=clock,
+    )
+
+
+def test_opens_when_failure_rate_crosses_threshold(breaker: CircuitBreaker):
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED  # Not enough calls yet
+
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_old_failures_leave_the_window(breaker: CircuitBreaker, clock: FakeClock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now = 20
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_success()
+
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_half_open_probe(breaker: CircuitBreaker, clock: FakeClock):
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+
+    clock.now = 5
+    assert breaker.state == CircuitState.HALF_OPEN
+
+    # Only one probe at a time
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # A failed probe opens it again...
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+
+    # ...and a successful one closes it
+    clock.now = 10
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    breaker.before_call()
@@ -0,0 +1,51 @@
+import tracemalloc
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from hpc_dispatch_management.core.security import get_current_user
+from hpc_dispatch_management.routers import diagnostics
+from hpc_dispatch_management.schemas import User, UserType
+
+
+def _client(is_admin: bool) -> TestClient:
+    app = FastAPI()
+    app.include_router(diagnostics.router)
+    app.dependency_overrides[get_current_user] = lambda: User(
+        sub=1,
+        full_name="Admin",
+        user_type=UserType.LECTURER,
+        username="admin",
+        email="admin@hpc.vn",
+        is_admin=is_admin,
+    )
+    return TestClient(app)
+
+
+def test_diagnostics_are_admin_only():
+    client = _client(is_admin=False)
+    assert client.post("/diagnostics/memory/start").status_code == 403
+    assert client.get("/diagnostics/memory/objects").status_code == 403
+    assert not tracemalloc.is_tracing()
+
+
+def test_memory_snapshots_show_what_grew():
+    client = _client(is_admin=True)
+    assert client.get("/diagnostics/memory").status_code == 409
+
+    try:
+        assert client.post("/diagnostics/memory/start").json() == {"tracing": True}
+        leak = [bytearray(1024) for _ in range(2000)]  # ~2 MB from this line
+        report = client.get("/diagnostics/memory", params={"limit": 5}).json()
+    finally:
+        client.post("/diagnostics/memory/stop")
+
+    assert report["traced_bytes"] > 0
+    grown = report["diff"][0]
+    assert __file__ in grown["site"] and grown["size_diff_bytes"] > 1_000_000
+    assert len(report["top"]) == 5
+    assert not tracemalloc.is_tracing()
+    del leak
+
+    objects = client.get("/diagnostics/memory/objects").json()
+    assert set(objects) >= {"orm_instances", "sessions", "httpx_clients"}
@@ -1,8 +1,17 @@
+import threading
+
 import pytest
 from fastapi.testclient import TestClient
 from httpx import Response
 from pydantic import TypeAdapter
-
+from sqlalchemy.orm import Session
+
+from hpc_dispatch_management.db import crud, models
+from hpc_dispatch_management.external_services import (
+    drive_service,
+    notification_service,
+    user_service,
+)
 from hpc_dispatch_management.schemas import Dispatch, DispatchStatus, DispatchTypeSearch
 
 
@@ -117,6 +126,53 @@ def test_filter_dispatches(
     assert len(dispatches) == 3
 
 
+def test_read_dispatches_sparse_fields(
+    lecturer1_auth_client: TestClient, sample_lecturer1_dispatches: list[Response]
+):
+    response = lecturer1_auth_client.get(
+        "/dispatches/",
+        params={"fields": "title,serial_number,status,created_at", "include": ""},
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+
+    dispatch = response.json()[0]
+    assert set(dispatch) == {"id", "title", "serial_number", "status", "created_at"}
+    # All three usually share a created_at second: their order is unspecified
+    assert {d["title"] for d in response.json()} == {
+        sample.json()["title"] for sample in sample_lecturer1_dispatches
+    }
+
+    response = lecturer1_auth_client.get(
+        "/dispatches/", params={"fields": "title", "include": "author"}
+    )
+    assert response.status_code == 200
+    assert set(response.json()[0]) == {"id", "title", "author"}
+
+    response = lecturer1_auth_client.get("/dispatches/", params={"fields": "content"})
+    assert response.status_code == 400
+
+
+def test_read_dispatches_query_budget(
+    lecturer1_auth_client: TestClient,
+    sample_lecturer1_dispatches: list[Response],
+    query_budget,
+):
+    # Dispatches + authors (joined) and one selectin query for assignments,
+    # no matter how many dispatches are returned.
+    with query_budget(2):
+        response = lecturer1_auth_client.get("/dispatches/")
+    assert response.status_code == 200
+
+    # Compact listing skips the assignments query entirely
+    with query_budget(1):
+        response = lecturer1_auth_client.get(
+            "/dispatches/", params={"fields": "title,status", "include": ""}
+        )
+    assert response.status_code == 200
+
+
 def test_read_dispatch(
     lecturer1_auth_client: TestClient, sample_lecturer1_dispatches: list[Response]
 ):
@@ -188,4 +244,292 @@ def test_update_dispatch_draft_without_permission(
     assert response.status_code == 403
 
 
+def test_update_dispatch_if_match(
+    lecturer1_auth_client: TestClient, sample_lecturer1_dispatches: list[Response]
+):
+    dispatch = Dispatch.model_validate(sample_lecturer1_dispatches[0].json())
+    etag = lecturer1_auth_client.get(f"/dispatches/{dispatch.id}").headers["ETag"]
+    assert etag == f'"{dispatch.version}"'
+
+    response = lecturer1_auth_client.put(
+        f"/dispatches/{dispatch.id}",
+        json={"title": "First Edit"},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    # A second edit based on the same copy would overwrite the first one
+    response = lecturer1_auth_client.put(
+        f"/dispatches/{dispatch.id}",
+        json={"title": "Second Edit"},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 412
+
+    response = lecturer1_auth_client.get(f"/dispatches/{dispatch.id}")
+    assert response.json()["title"] == "First Edit"
+
+
+def test_update_dispatch_status(
+    client: TestClient,
+    sample_lecturer1_dispatches: list[Response],
+    db_session: Session,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    dispatch = Dispatch.model_validate(sample_lecturer1_dispatches[0].json())
+
+    async def fetch_lecturer_by_username(username, token, client):
+        return {"id": 2, "username": username, "email": "lecturer2@hpc.vn"}
+
+    async def notify(**kwargs):
+        pass
+
+    monkeypatch.setattr(
+        user_service, "fetch_lecturer_by_username", fetch_lecturer_by_username
+    )
+    monkeypatch.setattr(drive_service, "organize_dispatch_in_drive", notify)
+    monkeypatch.setattr(notification_service, "send_new_dispatch_notification", notify)
+    monkeypatch.setattr(notification_service, "send_status_update_notification", notify)
+
+    client.headers.update({"Authorization": "Bearer lecturer1"})
+    response = client.post(
+        f"/dispatches/{dispatch.id}/assign",
+        json={"assignee_usernames": ["lecturer2"], "action_required": "Review"},
+    )
+    assert response.status_code == 200
+
+    client.headers.update({"Authorization": "Bearer lecturer2"})
+    etag = client.get(f"/dispatches/{dispatch.id}").headers["ETag"]
+    # The session still holds the dispatch loaded before the review
+    loaded = db_session.get(models.Dispatch, dispatch.id)
+    response = client.put(
+        f"/dispatches/{dispatch.id}/status",
+        json={"status": "approved", "review_comment": "Looks good"},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 200
+
+    # The answer is the reviewed dispatch, not the copy loaded before
+    reviewed = response.json()
+    assert reviewed["status"] == DispatchStatus.APPROVED.value
+    assert reviewed["version"] == dispatch.version + 2  # Assigned, then reviewed
+    assert [a["review_comment"] for a in reviewed["assignments"]] == ["Looks good"]
+    etag_after = response.headers["ETag"]
+    assert etag_after == f'"{reviewed["version"]}"'
+    assert client.get(f"/dispatches/{dispatch.id}").headers["ETag"] == etag_after
+    assert loaded.status == DispatchStatus.APPROVED
+
+
+def test_update_dispatch_status_denied(
+    lecturer1_auth_client: TestClient, sample_lecturer1_dispatches: list[Response]
+):
+    dispatch = Dispatch.model_validate(sample_lecturer1_dispatches[0].json())
+
+    # The author is not an assignee
+    response = lecturer1_auth_client.put(
+        f"/dispatches/{dispatch.id}/status", json={"status": "approved"}
+    )
+    assert response.status_code == 403
+
+    response = lecturer1_auth_client.put(
+        "/dispatches/999999/status", json={"status": "approved"}
+    )
+    assert response.status_code == 404
+
+    # Nothing was written
+    response = lecturer1_auth_client.get(f"/dispatches/{dispatch.id}")
+    assert response.json()["status"] == DispatchStatus.DRAFT.value
+    assert response.json()["version"] == dispatch.version
+
+
+def test_read_dispatch_changes(
+    lecturer1_auth_client: TestClient, sample_lecturer1_dispatches: list[Response]
+):
+    first, second, third = (
+        Dispatch.model_validate(response.json())
+        for response in sample_lecturer1_dispatches
+    )
+
+    # Full sync, two dispatches per page
+    response = lecturer1_auth_client.get("/dispatches/changes", params={"limit": 2})
+    assert response.status_code == 200
+    page = response.json()
+    assert page["has_more"] is True
+    assert [d["id"] for d in page["dispatches"]] == [first.id, second.id]
+
+    response = lecturer1_auth_client.get(
+        "/dispatches/changes", params={"since": page["sync_token"], "limit": 2}
+    )
+    page = response.json()
+    assert page["has_more"] is False
+    assert [d["id"] for d in page["dispatches"]] == [third.id]
+    sync_token = page["sync_token"]
+
+    # Only what changed afterwards is sent, deletes as tombstones
+    lecturer1_auth_client.put(f"/dispatches/{second.id}", json={"title": "Changed"})
+    lecturer1_auth_client.delete(f"/dispatches/{third.id}")
+
+    response = lecturer1_auth_client.get(
+        "/dispatches/changes", params={"since": sync_token}
+    )
+    page = response.json()
+    assert [d["title"] for d in page["dispatches"]] == ["Changed"]
+    assert page["deleted_dispatch_ids"] == [third.id]
+    assert page["sync_token"] > sync_token
+
+
+def test_read_dispatch_changes_tombstones_per_user(
+    client: TestClient, sample_lecturer1_dispatches: list[Response]
+):
+    dispatch = Dispatch.model_validate(sample_lecturer1_dispatches[0].json())
+
+    client.headers.update({"Authorization": "Bearer lecturer2"})
+    sync_token = client.get("/dispatches/changes").json()["sync_token"]
+
+    client.headers.update({"Authorization": "Bearer lecturer1"})
+    client.delete(f"/dispatches/{dispatch.id}")
+    page = client.get("/dispatches/changes", params={"since": sync_token}).json()
+    assert page["deleted_dispatch_ids"] == [dispatch.id]
+
+    # Not a dispatch lecturer2 could see: its deletion is none of their business
+    client.headers.update({"Authorization": "Bearer lecturer2"})
+    page = client.get("/dispatches/changes", params={"since": sync_token}).json()
+    assert page["deleted_dispatch_ids"] == []
+
+
+def test_read_dispatch_changes_after_backfill(
+    lecturer1_auth_client: TestClient,
+    sample_lecturer1_dispatches: list[Response],
+    db_session: Session,
+):
+    author_id = sample_lecturer1_dispatches[0].json()["author"]["id"]
+    # Written around crud, like the dispatches from before the change log
+    db_session.add(
+        models.Dispatch(
+            serial_number="OLD-001",
+            title="Before the change log",
+            description="",
+            author_id=author_id,
+        )
+    )
+    db_session.commit()
+
+    assert crud.backfill_change_log(db_session) == 1
+    assert crud.backfill_change_log(db_session) == 0
+
+    response = lecturer1_auth_client.get("/dispatches/changes")
+    titles = [d["title"] for d in response.json()["dispatches"]]
+    assert titles[-1] == "Before the change log"
+    assert len(titles) == 4
+
+
+def test_changes_commit_in_sync_token_order(
+    sample_lecturer1_dispatches: list[Response], db_session: Session
+):
+    first, second, _ = (response.json() for response in sample_lecturer1_dispatches)
+    author_id = first["author"]["id"]
+    bind = db_session.get_bind()
+    db_session.rollback()  # The test session holds no transaction meanwhile
+
+    def sync(since: int):
+        with Session(bind) as reader:
+            return crud.get_changes_since(reader, author_id, since, limit=100)
+
+    sync_token = sync(0).sync_token
+
+    # The first writer takes a change id and keeps its transaction open
+    first_writer = Session(bind)
+    crud._record_change(first_writer, first["id"])
+
+    # A second writer can't take a later id, and commit it, until then
+    second_done = threading.Event()
+
+    def second_writer():
+        with Session(bind) as db:
+            crud._record_change(db, second["id"])
+            db.commit()
+        second_done.set()
+
+    thread = threading.Thread(target=second_writer)
+    thread.start()
+    assert not second_done.wait(0.5)
+
+    # A sync in between sees neither change, and its token skips neither
+    page = sync(sync_token)
+    assert page.dispatches == []
+    sync_token = page.sync_token
+
+    first_writer.commit()
+    first_writer.close()
+    thread.join(timeout=10)
+    assert second_done.is_set()
+
+    page = sync(sync_token)
+    assert [d.id for d in page.dispatches] == [first["id"], second["id"]]
+
+
+def test_assign_releases_connection_before_upstream_calls(
+    lecturer1_auth_client: TestClient,
+    sample_lecturer1_dispatches: list[Response],
+    db_session: Session,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    dispatch = Dispatch.model_validate(sample_lecturer1_dispatches[0].json())
+    # Whether the session held a transaction (a connection) during each call
+    in_transaction: dict[str, bool] = {}
+
+    async def fetch_lecturer_by_username(username, token, client):
+        in_transaction["user"] = db_session.in_transaction()
+        return {"id": 2, "username": username, "email": "lecturer2@hpc.vn"}
+
+    async def organize_dispatch_in_drive(**kwargs):
+        in_transaction["drive"] = db_session.in_transaction()
+
+    async def send_new_dispatch_notification(**kwargs):
+        in_transaction["notification"] = db_session.in_transaction()
+
+    monkeypatch.setattr(
+        user_service, "fetch_lecturer_by_username", fetch_lecturer_by_username
+    )
+    monkeypatch.setattr(
+        drive_service, "organize_dispatch_in_drive", organize_dispatch_in_drive
+    )
+    monkeypatch.setattr(
+        notification_service,
+        "send_new_dispatch_notification",
+        send_new_dispatch_notification,
+    )
+
+    response = lecturer1_auth_client.post(
+        f"/dispatches/{dispatch.id}/assign",
+        json={"assignee_usernames": ["lecturer2"], "action_required": "Review"},
+    )
+    assert response.status_code == 200
+    assert in_transaction == {"user": False, "drive": False, "notification": False}
+
+
+def test_create_dispatch_allocates_serial_number(
+    lecturer1_auth_client: TestClient,
+):
+    numbers = []
+    for title in ("Quyết định 1", "Quyết định 2"):
+        response = lecturer1_auth_client.post(
+            "/dispatches/",
+            json={"title": title, "description": "", "serial_prefix": "QD"},
+        )
+        assert response.status_code == 201
+        numbers.append(response.json()["serial_number"])
+
+    year = numbers[0].rsplit("/", 1)[1]
+    assert numbers == [f"QD-001/{year}", f"QD-002/{year}"]
+
+    # A number typed in by hand must still be unique
+    response = lecturer1_auth_client.post(
+        "/dispatches/",
+        json={"title": "Copy", "description": "", "serial_number": numbers[0]},
+    )
+    assert response.status_code == 400
+
+
 # WARNING: This currently not working, need to update later
@@ -0,0 +1,151 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+
+from hpc_dispatch_management.core.pubsub import EventBroker, RedisEventBroker
+from hpc_dispatch_management.core.security import get_current_user
+from hpc_dispatch_management.db.database import get_event_broker
+from hpc_dispatch_management.routers import dispatches
+from hpc_dispatch_management.schemas import User, UserType
+
+
+def test_events_reach_only_the_users_streams():
+    async def scenario():
+        broker = EventBroker()
+        async with broker.subscribe(1) as first, broker.subscribe(1) as second:
+            async with broker.subscribe(2) as other:
+                await broker.publish(1, {"type": "dispatch.assigned"})
+                assert other.empty()
+            return first.get_nowait(), second.get_nowait()
+
+    assert asyncio.run(scenario()) == (
+        {"type": "dispatch.assigned"},
+        {"type": "dispatch.assigned"},
+    )
+
+
+def test_slow_stream_drops_oldest_events():
+    async def scenario():
+        broker = EventBroker(queue_size=2)
+        async with broker.subscribe(1) as queue:
+            for dispatch_id in range(3):
+                await broker.publish(1, {"dispatch_id": dispatch_id})
+            return [queue.get_nowait()["dispatch_id"] for _ in range(queue.qsize())]
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_closed_streams_are_forgotten():
+    async def scenario():
+        broker = EventBroker()
+        async with broker.subscribe(1):
+            pass
+        # Nobody listens anymore, publishing is a no-op
+        await broker.publish(1, {"type": "dispatch.reviewed"})
+        return broker._subscribers
+
+    assert asyncio.run(scenario()) == {}
+
+
+class FakePubSub:
+    """Stands in for redis' PubSub, replaying the given raw payloads."""
+
+    def __init__(self, payloads: list[bytes]):
+        self.payloads = payloads
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def subscribe(self, channel: str) -> None:
+        pass
+
+    async def listen(self):
+        yield {"type": "subscribe", "data": 1}
+        for payload in self.payloads:
+            yield {"type": "message", "data": payload}
+        await asyncio.Event().wait()
+
+
+def test_malformed_redis_events_are_skipped(monkeypatch):
+    payloads = [
+        b"not json",
+        json.dumps({"event": {"type": "dispatch.assigned"}}).encode(),
+        json.dumps({"user_id": 1, "event": {"type": "dispatch.reviewed"}}).encode(),
+    ]
+
+    async def scenario():
+        broker = RedisEventBroker("redis://localhost:6379/0", channel="events")
+        monkeypatch.setattr(broker._redis, "pubsub", lambda: FakePubSub(payloads))
+        async with broker.subscribe(1) as queue:
+            await broker.start()
+            event = await asyncio.wait_for(queue.get(), timeout=1)
+            still_listening = not broker._listener.done()
+            await broker.close()
+        return event, still_listening
+
+    assert asyncio.run(scenario()) == ({"type": "dispatch.reviewed"}, True)
+
+
+def test_events_endpoint_streams_the_users_events():
+    broker = EventBroker()
+    app = FastAPI()
+    app.include_router(dispatches.router)
+    app.dependency_overrides[get_current_user] = lambda: User(
+        sub=1,
+        full_name="Lecturer 1",
+        user_type=UserType.LECTURER,
+        username="lecturer1",
+        email="lecturer1@hpc.vn",
+    )
+    app.dependency_overrides[get_event_broker] = lambda: broker
+
+    async def scenario():
+        # Driven over raw ASGI: test clients wait for the end of the body,
+        # and an event stream only ends when the client disconnects
+        disconnected = asyncio.Event()
+        sent: asyncio.Queue = asyncio.Queue()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/dispatches/events",
+            "raw_path": b"/dispatches/events",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [],
+            "client": ("testclient", 50000),
+            "server": ("testserver", 80),
+        }
+        request = asyncio.create_task(app(scope, receive, sent.put))
+
+        start = await asyncio.wait_for(sent.get(), timeout=1)
+        connected = await asyncio.wait_for(sent.get(), timeout=1)
+        await broker.publish(2, {"type": "dispatch.assigned", "dispatch_id": 7})
+        await broker.publish(1, {"type": "dispatch.reviewed", "dispatch_id": 8})
+        event = await asyncio.wait_for(sent.get(), timeout=1)
+
+        disconnected.set()
+        await asyncio.wait_for(request, timeout=1)
+        return start, connected["body"], event["body"], broker._subscribers
+
+    start, connected, event, subscribers = asyncio.run(scenario())
+    assert start["status"] == 200
+    assert (b"content-type", b"text/event-stream; charset=utf-8") in start["headers"]
+    assert connected == b": connected\n\n"
+    assert event == (
+        b"event: dispatch.reviewed\n"
+        b'data: {"type": "dispatch.reviewed", "dispatch_id": 8}\n\n'
+    )
+    # The stream unsubscribed when the client went away
+    assert subscribers == {}
@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+from hpc_dispatch_management.external_services.notification_service import (
+    NEW_DISPATCH_TOPIC,
+    STATUS_UPDATE_TOPIC,
+    KafkaPublisher,
+)
+
+
+def test_messages_are_batched_and_partitioned_by_key(
+    kafka_producer, new_dispatch_message, status_update_message
+):
+    producer = kafka_producer(partitions=4, linger_ms=50)
+
+    async def scenario():
+        publisher = KafkaPublisher(producer)
+        await publisher.start()
+        for status in ("pending", "in_progress", "approved"):
+            await publisher.publish(status_update_message("S-1", status))
+        for serial in ("S-1", "S-2", "S-3"):
+            await publisher.publish(new_dispatch_message(serial))
+        await publisher.close()
+
+    asyncio.run(scenario())
+
+    # Everything was queued within one linger, so one produce request
+    assert len(producer.batches) == 1
+
+    status_updates = producer.topic_records(STATUS_UPDATE_TOPIC)
+    assert {record.partition for record in status_updates} == {
+        status_updates[0].partition
+    }
+    assert [json.loads(record.value)["status"] for record in status_updates] == [
+        "pending",
+        "in_progress",
+        "approved",
+    ]
+    assert status_updates[0].key == b"dispatch_status_S-1"
+    assert status_updates[0].headers == [("priority", b"medium")]
+    assert len(producer.topic_records(NEW_DISPATCH_TOPIC)) == 3
+
+
+def test_full_batch_is_sent_before_the_linger(kafka_producer, new_dispatch_message):
+    producer = kafka_producer(linger_ms=10_000, max_batch_size=1)
+
+    async def scenario():
+        publisher = KafkaPublisher(producer)
+        await publisher.start()
+        await publisher.publish(new_dispatch_message("S-1"))
+        await asyncio.sleep(0.05)
+        sent = len(producer.topic_records(NEW_DISPATCH_TOPIC))
+        await publisher.close()
+        return sent
+
+    assert asyncio.run(scenario()) == 1
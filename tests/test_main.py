@@ -1,4 +1,7 @@
 from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from hpc_dispatch_management.main import app
 
 
 def test_read_root(client: TestClient):
@@ -6,3 +9,30 @@ def test_read_root(client: TestClient):
 
     assert response.status_code == 200
     assert response.json() == {"status": "ok", "service": "HPC Dispatch Management"}
+
+
+def test_read_metrics(client: TestClient):
+    _ = client.get("/")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/",status="200"}'
+        in response.text
+    )
+    assert "db_pool_wait_seconds" in response.text
+
+
+def test_read_ready(db_session: Session):
+    # TestClient only runs the lifespan (and so the warm-up) inside `with`
+    starting = TestClient(app).get("/ready")
+    with TestClient(app) as client:
+        ready = client.get("/ready")
+    stopped = TestClient(app).get("/ready")
+
+    assert starting.status_code == 503
+    assert starting.json() == {"status": "starting"}
+    assert ready.status_code == 200
+    assert ready.json() == {"status": "ready"}
+    assert stopped.status_code == 503
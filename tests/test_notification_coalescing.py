@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from hpc_dispatch_management import schemas
+from hpc_dispatch_management.external_services.notification_service import (
+    DIGEST_TOPIC,
+    NEW_DISPATCH_TOPIC,
+    CoalescingPublisher,
+    NotificationPublisher,
+)
+
+
+class RecordingPublisher(NotificationPublisher):
+    def __init__(self):
+        self.messages: list[schemas.KafkaMessage] = []
+
+    async def publish(self, message: schemas.KafkaMessage) -> None:
+        self.messages.append(message)
+
+
+def test_status_updates_of_a_dispatch_are_merged(status_update_message):
+    async def scenario():
+        inner = RecordingPublisher()
+        publisher = CoalescingPublisher(inner, window_seconds=60, max_items=10)
+        await publisher.publish(status_update_message("S-1", "in_progress"))
+        await publisher.publish(status_update_message("S-1", "approved"))
+        await publisher.publish(status_update_message("S-2", "rejected"))
+        assert inner.messages == []
+
+        await publisher.close()
+        return inner.messages
+
+    messages = asyncio.run(scenario())
+    assert [(m.key, m.payload.status) for m in messages] == [
+        ("dispatch_status_S-1", "approved"),
+        ("dispatch_status_S-2", "rejected"),
+    ]
+
+
+def test_new_dispatches_are_sent_as_digest(new_dispatch_message):
+    async def scenario():
+        inner = RecordingPublisher()
+        publisher = CoalescingPublisher(
+            inner, window_seconds=60, max_items=3, digest=True
+        )
+        for serial in ("S-1", "S-2", "S-3", "S-4"):
+            await publisher.publish(new_dispatch_message(serial))
+        # The first 3 filled the buffer and were sent right away
+        assert len(inner.messages) == 1
+
+        await publisher.close()
+        return inner.messages
+
+    digest, single = asyncio.run(scenario())
+    assert digest.topic == DIGEST_TOPIC
+    assert digest.payload.count == 3
+    assert [item.document_serial_number for item in digest.payload.items] == [
+        "S-1",
+        "S-2",
+        "S-3",
+    ]
+    assert single.topic == NEW_DISPATCH_TOPIC
+
+
+def test_buffer_is_flushed_after_the_window(new_dispatch_message):
+    async def scenario():
+        inner = RecordingPublisher()
+        publisher = CoalescingPublisher(
+            inner, window_seconds=0.05, max_items=10, digest=True
+        )
+        await publisher.start()
+        await publisher.publish(new_dispatch_message("S-1"))
+        await publisher.publish(new_dispatch_message("S-2", user_id=3))
+        await asyncio.sleep(0.2)
+        sent = list(inner.messages)
+        await publisher.close()
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert sorted(m.payload.user_id for m in sent) == [2, 3]
+
+
+def test_publisher_must_implement_publish():
+    class SilentPublisher(NotificationPublisher):
+        pass
+
+    # Fails when created, not on the first notification
+    with pytest.raises(TypeError):
+        SilentPublisher()
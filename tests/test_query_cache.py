@@ -0,0 +1,72 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from hpc_dispatch_management import schemas
+from hpc_dispatch_management.db import crud, models
+from hpc_dispatch_management.db.database import Base
+from hpc_dispatch_management.db.instrumentation import DB_COMPILED_CACHE
+
+
+def _cache_lookups() -> dict[str, float]:
+    return {
+        sample.labels["result"]: sample.value
+        for metric in DB_COMPILED_CACHE.collect()
+        for sample in metric.samples
+        if sample.name.endswith("_total")
+    }
+
+
+def _hot_queries(db: Session, user_id: int, search: str, skip: int) -> None:
+    _ = crud.get_dispatch(db, dispatch_id=user_id)
+    for dispatch_type in schemas.DispatchTypeSearch:
+        _ = crud.get_dispatches_with_filters(
+            db,
+            user_id=user_id,
+            dispatch_type=dispatch_type,
+            status=schemas.DispatchStatus.PENDING,
+            search=search,
+            skip=skip,
+            limit=10 + skip,
+        )
+    db.expunge_all()
+
+
+def test_hot_queries_hit_the_compiled_cache():
+    """
+    Once warmed up, new parameter values reuse the compiled SQL: a value
+    rendered into the SQL (instead of bound) would miss on every call.
+    """
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as db:
+        author = models.User(
+            id=1,
+            username="lecturer1",
+            email="lecturer1@hpc.vn",
+            full_name="Lecturer 1",
+            user_type=schemas.UserType.LECTURER,
+        )
+        db.add(author)
+        db.add(
+            models.Dispatch(
+                title="Kế hoạch thi",
+                serial_number="KH-01/2026",
+                description="",
+                author=author,
+                status=schemas.DispatchStatus.PENDING,
+            )
+        )
+        db.commit()
+
+        _hot_queries(db, user_id=1, search="thi", skip=0)
+        before = _cache_lookups()
+        for user_id, search, skip in [(2, "KH", 5), (1, "2026", 10), (3, "#", 0)]:
+            _hot_queries(db, user_id=user_id, search=search, skip=skip)
+        after = _cache_lookups()
+
+    hits = after.get("hit", 0) - before.get("hit", 0)
+    misses = after.get("miss", 0) - before.get("miss", 0)
+    assert hits > 0
+    assert misses == 0
@@ -0,0 +1,72 @@
+import asyncio
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from hpc_dispatch_management.core.ratelimit import TokenBucketLimiter, rate_limit
+from hpc_dispatch_management.core.security import get_current_user
+from hpc_dispatch_management.core.settings import settings
+from hpc_dispatch_management.schemas import User, UserType
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_bucket_refills_over_time():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(capacity=10, refill_per_second=2, clock=clock)
+
+    async def scenario():
+        first = await limiter.acquire("1", cost=8)
+        denied = await limiter.acquire("1", cost=5)
+        other_user = await limiter.acquire("2", cost=5)
+        clock.now = 2.0  # 4 tokens back
+        later = await limiter.acquire("1", cost=5)
+        return first, denied, other_user, later
+
+    first, denied, other_user, later = asyncio.run(scenario())
+    assert (first.allowed, first.remaining, first.reset_seconds) == (True, 2, 4)
+    assert (denied.allowed, denied.retry_after_seconds) == (False, 2)
+    assert other_user.allowed
+    assert (later.allowed, later.remaining) == (True, 1)
+
+
+def test_search_costs_more_than_listing():
+    app = FastAPI()
+
+    @app.get("/dispatches/", dependencies=[Depends(rate_limit("list", "search"))])
+    async def read_dispatches(search: str | None = None):
+        return []
+
+    app.dependency_overrides[get_current_user] = lambda: User(
+        sub=1,
+        full_name="Lecturer 1",
+        user_type=UserType.LECTURER,
+        username="lecturer1",
+        email="l1@hpc.vn",
+    )
+    capacity = settings.RATE_LIMIT_COSTS["search"] + settings.RATE_LIMIT_COSTS["list"]
+    limiter = TokenBucketLimiter(capacity=capacity, refill_per_second=0.001)
+
+    @app.middleware("http")
+    async def attach_limiter(request, call_next):
+        request.state.rate_limiter = limiter
+        return await call_next(request)
+
+    client = TestClient(app)
+    response = client.get("/dispatches/", params={"search": "thi"})
+    assert response.status_code == 200
+    assert response.headers["RateLimit-Remaining"] == str(
+        int(settings.RATE_LIMIT_COSTS["list"])
+    )
+
+    # A second search doesn't fit anymore, a plain listing still does
+    response = client.get("/dispatches/", params={"search": "thi"})
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    assert client.get("/dispatches/").status_code == 200
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from hpc_dispatch_management import schemas
+from hpc_dispatch_management.db import models
+from hpc_dispatch_management.db.database import Base
+from hpc_dispatch_management.db.read_receipts import ReadReceiptBuffer
+
+T0 = datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc)
+
+
+def _session_factory():
+    # Flushes write from a worker thread
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+
+    with factory() as db:
+        for user_id in (1, 2, 3):
+            db.add(
+                models.User(
+                    id=user_id,
+                    username=f"lecturer{user_id}",
+                    email=f"lecturer{user_id}@hpc.vn",
+                    full_name=f"Lecturer {user_id}",
+                    user_type=schemas.UserType.LECTURER,
+                )
+            )
+        db.add(
+            models.Dispatch(
+                id=1,
+                title="Kế hoạch thi",
+                serial_number="KH-001/2026",
+                description="",
+                author_id=1,
+                assignments=[
+                    models.DispatchAssignment(assignee_id=2),
+                    models.DispatchAssignment(assignee_id=3),
+                ],
+            )
+        )
+        db.commit()
+    return factory
+
+
+def _seen(factory) -> dict[int, datetime | None]:
+    with factory() as db:
+        rows = db.execute(
+            select(
+                models.DispatchAssignment.assignee_id,
+                models.DispatchAssignment.seen_at,
+            )
+        )
+        return {
+            assignee_id: seen_at and seen_at.replace(tzinfo=timezone.utc)
+            for assignee_id, seen_at in rows
+        }
+
+
+def test_repeated_views_collapse_and_the_first_one_is_kept():
+    factory = _session_factory()
+    buffer = ReadReceiptBuffer(factory, flush_seconds=60, max_entries=100)
+
+    async def scenario():
+        buffer.record(1, 2, seen_at=T0)
+        buffer.record(1, 2, seen_at=T0 + timedelta(minutes=1))
+        await buffer.flush()
+        # Already written: a later flush doesn't move it
+        buffer.record(1, 2, seen_at=T0 + timedelta(hours=1))
+        await buffer.flush()
+
+    asyncio.run(scenario())
+    assert _seen(factory) == {2: T0, 3: None}
+
+
+def test_a_full_buffer_is_written_without_waiting_and_close_flushes():
+    factory = _session_factory()
+    buffer = ReadReceiptBuffer(factory, flush_seconds=60, max_entries=1)
+
+    async def scenario():
+        await buffer.start()
+        buffer.record(1, 2, seen_at=T0)
+        for _ in range(50):  # Well below the 60s period
+            await asyncio.sleep(0.01)
+            if _seen(factory)[2] is not None:
+                break
+        written_early = _seen(factory)[2]
+
+        buffer.max_entries = 100
+        buffer.record(1, 3, seen_at=T0)
+        await buffer.close()
+        return written_early
+
+    assert asyncio.run(scenario()) == T0
+    assert _seen(factory) == {2: T0, 3: T0}
@@ -0,0 +1,92 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, select
+
+from hpc_dispatch_management.db import database
+from hpc_dispatch_management.db.database import (
+    Base,
+    ReadYourWrites,
+    RoutingSession,
+    get_read_db,
+)
+from hpc_dispatch_management.db.models import User
+from hpc_dispatch_management.schemas import UserType
+
+
+@pytest.fixture
+def primary_and_replica(tmp_path):
+    """Two separate SQLite databases; nothing replicates between them."""
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        Base.metadata.create_all(bind=engine)
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def _user(user_id: int) -> User:
+    return User(
+        id=user_id,
+        username=f"lecturer{user_id}",
+        email=f"lecturer{user_id}@example.com",
+        full_name=f"Lecturer {user_id}",
+        user_type=UserType.LECTURER,
+    )
+
+
+def test_routing_session_reads_replica_and_writes_primary(primary_and_replica):
+    primary, replica = primary_and_replica
+
+    with RoutingSession(bind=primary) as session:
+        session.info["replica"] = replica
+        session.add(_user(1))
+        session.commit()
+        assert session.info.get("wrote") is None  # Reset by the commit hook
+
+        # The write is on the primary only, and the read goes to the replica
+        assert session.scalars(select(User)).all() == []
+
+    with RoutingSession(bind=primary) as session:
+        assert [user.id for user in session.scalars(select(User))] == [1]
+
+
+def test_read_your_writes_window():
+    now = [0.0]
+    tracker = ReadYourWrites(window_seconds=5.0, clock=lambda: now[0])
+
+    tracker.mark(1)
+    assert tracker.is_sticky(1)
+    assert not tracker.is_sticky(2)
+
+    now[0] = 5.0
+    assert not tracker.is_sticky(1)
+
+
+def test_get_read_db_sticks_to_primary_after_a_write(primary_and_replica, monkeypatch):
+    primary, replica = primary_and_replica
+    tracker = ReadYourWrites(window_seconds=5.0)
+    monkeypatch.setattr(database, "replica_engines", [replica])
+    monkeypatch.setattr(database, "_next_replica", itertools.cycle([replica]))
+    monkeypatch.setattr(database, "read_your_writes", tracker)
+    request = SimpleNamespace(state=SimpleNamespace(user_id=1))
+
+    def read_bind():
+        sessions = get_read_db(request)
+        session = next(sessions)
+        try:
+            return session.get_bind()
+        finally:
+            sessions.close()
+
+    assert read_bind() is replica
+
+    # A committed write of user 1 on the primary
+    with RoutingSession(bind=primary) as session:
+        session.info["request"] = request
+        session.add(_user(1))
+        session.commit()
+
+    assert read_bind() is database.engine  # The app's primary
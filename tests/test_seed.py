@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from sqlalchemy import create_engine, select
+
+from hpc_dispatch_management.db import models
+from hpc_dispatch_management.db.seed import run_seeder
+
+TABLES = [
+    models.User,
+    models.Dispatch,
+    models.DispatchAssignment,
+    models.DispatchChange,
+]
+
+
+def _seed(path: Path) -> dict[str, list[tuple]]:
+    """Seeds a tiny volume into a new SQLite file, returns every row."""
+    db_engine = create_engine(f"sqlite:///{path}")
+    run_seeder(users=5, dispatches=30, batch_size=8, seed=7, db_engine=db_engine)
+    with db_engine.connect() as conn:
+        rows = {
+            model.__tablename__: [
+                tuple(row) for row in conn.execute(select(model).order_by(model.id))
+            ]
+            for model in TABLES
+        }
+    db_engine.dispose()
+    return rows
+
+
+def test_seed_is_deterministic(tmp_path: Path):
+    first = _seed(tmp_path / "first.db")
+    second = _seed(tmp_path / "second.db")
+
+    assert first == second
+    assert len(first["dispatches"]) == 30
+    assert first["dispatch_assignments"]
+
+
+def test_seed_logs_every_dispatch(tmp_path: Path):
+    rows = _seed(tmp_path / "seed.db")
+
+    # One upsert per dispatch, so delta sync sees the seeded data
+    dispatch_ids = [row[0] for row in rows["dispatches"]]
+    logged_ids = [row[1] for row in rows["dispatch_changes"]]
+    assert logged_ids == dispatch_ids
@@ -0,0 +1,83 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from hpc_dispatch_management import schemas
+from hpc_dispatch_management.core.settings import settings
+from hpc_dispatch_management.db import crud, models
+from hpc_dispatch_management.db.crud import SerialAllocator
+from hpc_dispatch_management.db.database import Base
+
+
+def _engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def test_numbers_are_sequential_per_prefix_and_year():
+    engine = _engine()
+    allocator = SerialAllocator()
+
+    assert [allocator.allocate(engine, "QD", 2026) for _ in range(3)] == [1, 2, 3]
+    assert allocator.allocate(engine, "KH", 2026) == 1
+    assert allocator.allocate(engine, "QD", 2027) == 1
+    # A new worker continues from the counter, not from 1
+    assert SerialAllocator().allocate(engine, "QD", 2026) == 4
+
+
+def test_blocks_never_overlap_between_workers():
+    engine = _engine()
+    first, second = SerialAllocator(block_size=5), SerialAllocator(block_size=5)
+
+    numbers = []
+    for _ in range(7):
+        numbers.append(first.allocate(engine, "QD", 2026))
+        numbers.append(second.allocate(engine, "QD", 2026))
+
+    assert len(set(numbers)) == len(numbers)
+    assert numbers[:4] == [1, 6, 2, 7]
+    # Each worker reserved two blocks: the counter went up four times
+    assert SerialAllocator().allocate(engine, "QD", 2026) == 21
+
+
+def test_only_a_taken_serial_number_is_retried():
+    engine = _engine()
+    # SQLite only checks foreign keys when asked to
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+    db = sessionmaker(bind=engine, expire_on_commit=False)()
+    db.add(
+        models.User(
+            id=1,
+            username="lecturer1",
+            email="lecturer1@hpc.vn",
+            full_name="Lecturer 1",
+            user_type=schemas.UserType.LECTURER,
+        )
+    )
+    db.commit()
+    year = datetime.now(ZoneInfo(settings.SERIAL_TIMEZONE)).year
+
+    # Typed in by hand, before the counter got there
+    typed = schemas.DispatchCreate(
+        title="Kế hoạch", serial_number=f"CV-001/{year}", description=""
+    )
+    _ = crud.create_dispatch(db, typed, author_id=1)
+    allocated = schemas.DispatchCreate(title="Thông báo", description="")
+    assert crud.create_dispatch(db, allocated, author_id=1).serial_number == (
+        f"CV-002/{year}"
+    )
+
+    # Not a serial number clash: no retry, and not reported as one
+    with pytest.raises(IntegrityError):
+        crud.create_dispatch(db, allocated, author_id=999)
+    assert crud.create_dispatch(db, allocated, author_id=1).serial_number == (
+        f"CV-004/{year}"
+    )
+    db.close()
@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from hpc_dispatch_management.db import transactions
+from hpc_dispatch_management.db.transactions import RetryBudget, transactional
+
+
+def _mysql_error(code: int, message: str) -> OperationalError:
+    return OperationalError("UPDATE dispatches ...", {}, Exception(code, message))
+
+
+class FlakyWork:
+    """Fails with the given errors, one per call, then succeeds."""
+
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "done"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(transactions, "_backoff_seconds", lambda retry: 0)
+    with Session(create_engine("sqlite://")) as session:
+        yield session
+
+
+def test_deadlocks_and_lock_wait_timeouts_are_retried(db):
+    work = FlakyWork(
+        _mysql_error(1213, "Deadlock found when trying to get lock"),
+        _mysql_error(1205, "Lock wait timeout exceeded"),
+    )
+    assert transactional(db, work, attempts=3, budget=RetryBudget(0.1, 10)) == "done"
+    assert work.calls == 3
+
+
+def test_other_errors_and_spent_retries_propagate(db):
+    work = FlakyWork(_mysql_error(1062, "Duplicate entry"))
+    with pytest.raises(OperationalError):
+        transactional(db, work, attempts=3, budget=RetryBudget(0.1, 10))
+    assert work.calls == 1
+
+    work = FlakyWork(*[_mysql_error(1213, "Deadlock")] * 3)
+    with pytest.raises(OperationalError):
+        transactional(db, work, attempts=3, budget=RetryBudget(0.1, 10))
+    assert work.calls == 3
+
+    # An empty budget stops retries before the attempts run out
+    work = FlakyWork(_mysql_error(1213, "Deadlock"))
+    with pytest.raises(OperationalError):
+        transactional(db, work, attempts=3, budget=RetryBudget(0.1, 0))
+    assert work.calls == 1